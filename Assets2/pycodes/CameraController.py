@@ -1,189 +1,224 @@
 import cv2
 import numpy as np
 import socket
-import threading
-import struct
 import time
 import logging
-import json
-from ultralytics import YOLO
-import torch
+from tracker_pool import TrackerPool
+from frame_ingest import FrameIngest
+from mosaic import FrameSlots, Mosaic
+from mosaic_stream import MosaicStreamer
+from detection_protocol import encode_detections, encode_detections_json, SOURCE_DRONE
+from perf_stats import PipelineStats, PerfMonitor
+from rate_control import RateController, RateSettings
+from detectors import create_detector
 import warnings
+from log_config import configure_logging
 warnings.filterwarnings("ignore", category=FutureWarning)
 
-logging.basicConfig(level=logging.DEBUG)
+configure_logging(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 class AgentVisionReceiver:
-    def __init__(self, num_agents=1, base_port=5123, conf_threshold=0.5, model_type='yolov8n'):
+    def __init__(self, num_agents=1, base_port=5123, conf_threshold=0.5, model_type='yolov8n', backend='torch',
+                 headless=False, stream_port=8081, stream_fps=15.0, detection_format='binary',
+                 perf=None, metrics_port=None, metrics_interval=10.0, rate_control=False):
+        self.startup_start = time.perf_counter()
         self.num_agents = num_agents
         self.base_port = base_port
         self.running = True
-        self.frame_buffer = {}
-        self.lock = threading.Lock()
+        
+        # Headless mode serves the mosaic as MJPEG over HTTP instead of a window
+        self.headless = headless
+        self.stream_port = stream_port
+        self.stream_fps = stream_fps
+        
+        # Optional per-stage timings (PipelineStats); nothing is measured without them.
+        # With metrics_port they are served on /metrics and logged periodically
+        if perf is None and metrics_port is not None:
+            perf = PipelineStats()
+        self.perf = perf
+        self.perf_monitor = None
+        if perf is not None and metrics_port is not None:
+            self.perf_monitor = PerfMonitor(perf, port=metrics_port, log_interval=metrics_interval)
+        
+        # Preallocated 320x240 slot per agent, written in place by the workers
+        self.slots = FrameSlots(num_agents, 240, 320)
         self.conf_threshold = conf_threshold
         
-        # Load YOLOv8 model
+        # Load the detector (PyTorch, ONNX Runtime, OpenVINO or int8 depending on backend)
         logger.info(f"Loading {model_type} model...")
         try:
-            self.model = YOLO(f'{model_type}.pt')
-            self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-            self.model.to(self.device)
-            logger.info(f"Model loaded successfully on {self.device}")
+            self.detector = create_detector(model_type, backend=backend)
         except Exception as e:
             logger.error(f"Error loading model: {e}")
             raise
             
-        # Initialize tracking dictionary
-        self.trackers = {}
+        # One tracker per agent stream, decoupled from the shared detector
+        self.trackers = TrackerPool('bytetrack.yaml')
         
         # Add socket for human detections
         self.human_detection_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.controller_address = ('localhost', 5557)
+        self.encode_detections = encode_detections_json if detection_format == 'json' else encode_detections
+        self.detection_seq = 0
+        
+        # Split receive/process pipeline: frames are reassembled and only the newest per agent is processed
+        self.ingest = FrameIngest(
+            {agent_id: self.base_port + agent_id for agent_id in range(self.num_agents)},
+            self._handle_frame,
+            name="Receiver"
+        )
+        
+        # Optional feedback to the Unity senders: capture rate, JPEG quality and resolution
+        # Frames are shown at 320x240, so the senders never need to capture more than that
+        self.rate_controller = None
+        if rate_control:
+            self.rate_controller = RateController(self.ingest, levels=(
+                RateSettings(0.033, 75, 320, 240),
+                RateSettings(0.1, 60, 320, 240),
+                RateSettings(0.5, 50, 320, 240)
+            ))
         
     def process_frame_yolo(self, frame, agent_id):
         try:
-            results = self.model.track(frame, persist=True, conf=self.conf_threshold, tracker="bytetrack.yaml")
+            start = time.perf_counter()
+            results = self.detector.predict([frame], conf=self.conf_threshold)
+            stage_start = post_start = self._record_stage(agent_id, 'infer', start)
             
             if results and len(results) > 0:
                 result = results[0]
-                annotated_frame = result.plot()
+                tracks = self.trackers.update(agent_id, result, frame)
                 
                 # Process human detections
-                if hasattr(result, 'boxes'):
-                    for i, (box, cls) in enumerate(zip(result.boxes.xyxy, result.boxes.cls)):
-                        if int(cls) == 0:  # Person class
-                            confidence = float(result.boxes.conf[i])
-                            if confidence >= self.conf_threshold:
-                                x1, y1, x2, y2 = box.cpu().numpy()
-                                center_x = (x1 + x2) / 2 / frame.shape[1]
-                                center_y = (y1 + y2) / 2 / frame.shape[0]
-                                
-                                detection_data = {
-                                    'type': 'human',
-                                    'agent_id': agent_id,
-                                    'confidence': float(confidence),
-                                    'position': {
-                                        'x': float(center_x),
-                                        'y': float(center_y)
-                                    },
-                                    'timestamp': time.time()
-                                }
-                                
-                                try:
-                                    self.human_detection_socket.sendto(
-                                        json.dumps(detection_data).encode(),
-                                        self.controller_address
-                                    )
-                                    logger.info(f"Human detection sent for dron {agent_id}")
-                                except Exception as e:
-                                    logger.error(f"Error sending human detection: {e}")
+                human_detections = []
+                for x1, y1, x2, y2, track_id, confidence, cls, _ in tracks:
+                    if int(cls) == 0 and confidence >= self.conf_threshold:  # Person class
+                        center_x = (x1 + x2) / 2 / frame.shape[1]
+                        center_y = (y1 + y2) / 2 / frame.shape[0]
+                        
+                        human_detections.append({
+                            'track_id': int(track_id),
+                            'class_id': 0,
+                            'confidence': float(confidence),
+                            'position': {
+                                'x': float(center_x),
+                                'y': float(center_y)
+                            }
+                        })
                 
-                if hasattr(result, 'boxes') and result.boxes.id is not None:
-                    tracks = result.boxes.id.cpu().numpy().astype(int)
-                    for i, box in enumerate(result.boxes.xyxy):
-                        if i < len(tracks):
-                            track_id = tracks[i]
-                            x1, y1 = box[:2].cpu().numpy().astype(int)
-                            cv2.putText(annotated_frame, f"ID: {track_id}", 
-                                      (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX,
-                                      0.5, (0, 255, 0), 2)
+                stage_start = self._record_stage(agent_id, 'track', stage_start)
+                
+                # All humans seen in this frame go out in a single packet
+                if human_detections:
+                    if self.rate_controller:
+                        self.rate_controller.note_detections(agent_id)
+                    try:
+                        self.detection_seq += 1
+                        self.human_detection_socket.sendto(
+                            self.encode_detections(SOURCE_DRONE, agent_id, human_detections,
+                                                   frame_seq=self.detection_seq),
+                            self.controller_address
+                        )
+                        logger.debug("%d human detections sent for dron %s", len(human_detections), agent_id)
+                    except Exception as e:
+                        logger.error("Error sending human detection: %s", e)
+                    stage_start = self._record_stage(agent_id, 'send', stage_start)
+                
+                annotated_frame = result.plot()
+                for x1, y1, _, _, track_id, _, _, _ in tracks:
+                    cv2.putText(annotated_frame, f"ID: {int(track_id)}", 
+                              (int(x1), int(y1) - 10), cv2.FONT_HERSHEY_SIMPLEX,
+                              0.5, (0, 255, 0), 2)
                 
                 fps = 1000 / (results[0].speed['inference'] + results[0].speed['preprocess'])
                 cv2.putText(annotated_frame, f"FPS: {fps:.1f}", (10, 50),
                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
                 
+                self._record_stage(agent_id, 'annotate', stage_start)
+                self._record_stage(agent_id, 'post', post_start)
                 return annotated_frame
             
             return frame
             
         except Exception as e:
-            logger.error(f"Error in YOLO process: {e}")
+            logger.error("Error in YOLO process: %s", e)
             return frame
     
-    def _receive_stream(self, agent_id):
-        port = self.base_port + agent_id
-        logger.info(f"Starting reception on port {port} for agent {agent_id}")
+    def _record_stage(self, agent_id, stage, start):
+        """Record the stage that began at start and return the start of the next one"""
+        now = time.perf_counter()
+        if self.perf:
+            self.perf.record(agent_id, stage, now - start)
+        return now
+    
+    def _handle_frame(self, agent_id, packet, received_time):
+        if self.perf:
+            # recv: sender timestamp to fully received (only the framed format carries it)
+            if packet.seq is not None:
+                self.perf.record(agent_id, 'recv', received_time - packet.timestamp)
+            self.perf.record(agent_id, 'wait', time.time() - received_time)
+        start = time.perf_counter()
+        nparr = np.frombuffer(packet.payload, np.uint8)
+        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if self.perf:
+            self.perf.record(agent_id, 'decode', time.perf_counter() - start)
         
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        try:
-            sock.bind(('0.0.0.0', port))
-            sock.settimeout(1.0)
-            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)
-        except Exception as e:
-            logger.error(f"Error setting up socket for agent {agent_id}: {e}")
-            return
-            
-        while self.running:
-            try:
-                data, addr = sock.recvfrom(65535)
-                logger.debug(f"Data received from {addr} for agent {agent_id}")
-                
-                if len(data) < 4:
-                    continue
-                
-                received_agent_id = struct.unpack('i', data[:4])[0]
-                if received_agent_id != agent_id:
-                    continue
-                
-                img_data = data[4:]
-                nparr = np.frombuffer(img_data, np.uint8)
-                frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                
-                if frame is None:
-                    frame = np.ones((240, 320, 3), dtype=np.uint8) * 128
-                    cv2.putText(frame, f"Dron {agent_id} - No Data", (10, 120),
-                              cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
-                else:
-                    frame = cv2.resize(frame, (320, 240))
-                    frame = self.process_frame_yolo(frame, agent_id)
-                
-                with self.lock:
-                    self.frame_buffer[agent_id] = frame.copy()
-                    
-            except socket.timeout:
-                continue
-            except Exception as e:
-                logger.error(f"Error in reception for agent {agent_id}: {e}")
-                continue
+        if frame is None:
+            frame = np.ones((240, 320, 3), dtype=np.uint8) * 128
+            cv2.putText(frame, f"Dron {agent_id} - No Data", (10, 120),
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
+        else:
+            start = time.perf_counter()
+            frame = cv2.resize(frame, (320, 240))
+            self._record_stage(agent_id, 'resize', start)
+            frame = self.process_frame_yolo(frame, agent_id)
+        
+        self.slots.write(agent_id, frame)
+        if self.perf:
+            self.perf.frame_done(agent_id, packet.timestamp)
     
     def start_receiving(self):
         logger.info("Starting stream reception")
-        
-        for i in range(self.num_agents):
-            receiver = threading.Thread(
-                target=self._receive_stream,
-                args=(i,),
-                name=f"Receiver-{i}"
-            )
-            receiver.daemon = True
-            receiver.start()
-        
-        self._display_streams()
+        # Warm the detector up at the display size before the first frame arrives
+        warmup_time = self.detector.warmup(shape=(240, 320))
+        logger.info(f"Ready in {time.perf_counter() - self.startup_start:.2f}s "
+                    f"(model load {self.detector.load_time:.2f}s, warm-up {warmup_time:.2f}s)")
+        if self.perf_monitor:
+            self.perf_monitor.start()
+        self.ingest.start()
+        if self.rate_controller:
+            self.rate_controller.start()
+        if self.headless:
+            self._serve_streams()
+        else:
+            self._display_streams()
+    
+    def _serve_streams(self):
+        streamer = MosaicStreamer(
+            Mosaic(self.slots, cols=min(3, self.num_agents)),
+            port=self.stream_port,
+            fps=self.stream_fps
+        )
+        streamer.start()
+        try:
+            while self.running:
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            self.stop()
+        finally:
+            streamer.stop()
+            logger.info(f"Mosaic stream stats: {streamer.stats()}")
     
     def _display_streams(self):
         logger.info("Starting visualization")
         cv2.namedWindow('Agent Vision Streams', cv2.WINDOW_NORMAL)
+        mosaic = Mosaic(self.slots, cols=min(3, self.num_agents))
         
         while self.running:
             try:
-                with self.lock:
-                    current_frames = self.frame_buffer.copy()
-                
-                if current_frames:
-                    rows = (self.num_agents + 2) // 3
-                    cols = min(3, self.num_agents)
-                    cell_height = 240
-                    cell_width = 320
-                    
-                    grid = np.zeros((cell_height * rows, cell_width * cols, 3), dtype=np.uint8)
-                    
-                    for agent_id, frame in current_frames.items():
-                        i = agent_id // cols
-                        j = agent_id % cols
-                        grid[i*cell_height:(i+1)*cell_height, j*cell_width:(j+1)*cell_width] = frame
-                    
-                    cv2.imshow('Agent Vision Streams', grid)
+                # Only redraw when one of the agent slots changed
+                if mosaic.render():
+                    cv2.imshow('Agent Vision Streams', mosaic.grid)
                 
                 key = cv2.waitKey(1) & 0xFF
                 if key == ord('q'):
@@ -191,7 +226,7 @@ class AgentVisionReceiver:
                     break
                 elif key == ord('s'):
                     timestamp = time.strftime("%Y%m%d-%H%M%S")
-                    cv2.imwrite(f'capture_{timestamp}.jpg', grid)
+                    cv2.imwrite(f'capture_{timestamp}.jpg', mosaic.grid)
                 
                 time.sleep(0.01)
                 
@@ -202,6 +237,14 @@ class AgentVisionReceiver:
     def stop(self):
         logger.info("Stopping AgentVisionReceiver")
         self.running = False
+        if self.rate_controller:
+            self.rate_controller.stop()
+            logger.info(f"Rate control stats: {self.rate_controller.stats()}")
+        self.ingest.stop()
+        logger.info(f"Ingest stats: {self.ingest.stats()}")
+        if self.perf_monitor:
+            self.perf_monitor.stop()
+            logger.info(f"Pipeline stats: {self.perf.summary_line()}")
         self.human_detection_socket.close()
         cv2.destroyAllWindows()
 
@@ -209,6 +252,10 @@ if __name__ == "__main__":
     receiver = AgentVisionReceiver(
         num_agents=1,
         model_type='yolov8n',
-        conf_threshold=0.5
+        backend='torch',  # 'torch', 'onnx', 'onnx-int8', 'openvino' or 'openvino-int8'
+        conf_threshold=0.5,
+        headless=False,
+        metrics_port=None,  # Port for /metrics with per-stage timings (None = disabled)
+        rate_control=False  # Adjust the senders' capture rate, quality and resolution
     )
     receiver.start_receiving()
\ No newline at end of file
@@ -1,7 +1,13 @@
 import agentpy as ap
 from flask import Flask, jsonify, request
+import ast
+import os
+import threading
+import time
 import numpy as np
 import random
+from decision_channel import ChannelServer
+from delta_session import DeltaSessions
 
 app = Flask(__name__)
 
@@ -89,27 +95,65 @@ parameters = {
 model = RobotWorld(parameters)
 model.sim_setup()
 
+# The HTTP handlers and the decision channel step the same model
+model_lock = threading.Lock()
+
+def get_setup():
+    return {
+        'robots': model.p.num_robots,
+        'cubes': model.cubes
+    }
+
+def step_model(positions):
+    """Update positions from Unity, run one model step and return the next actions"""
+    with model_lock:
+        for i, pos in enumerate(positions):
+            model.agents[i].position = pos
+        
+        # Execute model step
+        model.sim_step()
+        model.update()
+        return {'actions': model.actions}
+
+def step_agents(agent_states, now):
+    # Robots are indexed by their position in the agent list
+    return step_model([entry['state']['position'] for entry in agent_states])
+
+# Delta protocol: Unity sends only the robots that moved (agentStates entries
+# with 'position'); actions are per step events, so they are returned as is
+sessions = DeltaSessions(step_agents, per_agent=())
+
 @app.route('/setup', methods=['GET'])
 def setup():
     """Initial setup information for Unity"""
-    return jsonify({
-        'robots': model.p.num_robots,
-        'cubes': model.cubes
-    })
+    return jsonify(get_setup())
 
 @app.route('/step', methods=['POST'])
 def step():
     """Process updates from Unity and return next actions"""
-    # Update positions from Unity
-    positions = eval(request.form['positions'])
-    for i, pos in enumerate(positions):
-        model.agents[i].position = pos
-    
-    # Execute model step
-    model.sim_step()
-    model.update()
-    
-    return jsonify({'actions': model.actions})
+    # Positions come as JSON or as the legacy form field with a Python literal list
+    if request.is_json:
+        positions = request.get_json()['positions']
+    else:
+        positions = ast.literal_eval(request.form['positions'])
+    return jsonify(step_model(positions))
+
+@app.route('/session', methods=['POST'])
+def session():
+    return jsonify(sessions.handle(request.get_json(), time.time()))
+
+# Same endpoints over the persistent decision channel (decision_channel.py)
+channel = ChannelServer({
+    'setup': lambda body, now: get_setup(),
+    'step': lambda body, now: step_model(body['positions']),
+    'session': sessions.handle
+}, port=5001)
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # Development server; use serve.py (python serve.py Controller) under load.
+    # FLASK_DEBUG=1 enables the debugger and reloader
+    debug = os.environ.get('FLASK_DEBUG') == '1'
+    # With the debug reloader only the serving child process opens the channel
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        channel.start()
+    app.run(debug=debug, threaded=True)
\ No newline at end of file
@@ -1,17 +1,22 @@
 import agentpy as ap
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-from datetime import datetime
 import logging
-import math
+import os
 import socket
-import json
+from detection_protocol import decode_detections
+from fleet_engine import InvestigationFleet
+from decision_channel import ChannelServer
+from delta_session import DeltaSessions
 import threading
 import time
+from log_config import configure_logging
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+# Queued logging; LOG_LEVEL=DEBUG brings back the old verbosity
+configure_logging(
+    level=logging.INFO,
+    levels={'werkzeug': logging.WARNING},
+    fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     datefmt='%Y-%m-%d %H:%M:%S'
 )
 logger = logging.getLogger(__name__)
@@ -19,154 +24,18 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
-class RobotAgent(ap.Agent):
+class RobotWorld(ap.Model):
     def setup(self):
-        self.id = 0
-        self.start_time = datetime.now()
-        self.total_distance_traveled = 0
-        self.last_position = None
-        self.last_movement_time = None
-        self.MIN_MOVEMENT_THRESHOLD = 1
-        self.current_action = None
-        self.target_position = None
-        self._investigating = False
-        self._investigation_complete = False
-        self._detected_person = None
-        self._last_detection_time = None
-        self.detection_cooldown = 5.0
         self.camera_positions = [
             {'x': -2.833347, 'y': 8.0, 'z': 44.74295},
             {'x': -61.0, 'y': 10.0, 'z': 67.0},
             {'x': 52.0, 'y': 4.0, 'z': -35.0},
             {'x': 28.24, 'y': 4.0, 'z': -104.0}
         ]
-        logger.debug(f"Drone initialized with id: {self.id}")
-
-    @property
-    def investigating(self):
-        return self._investigating
-
-    @investigating.setter
-    def investigating(self, value):
-        self._investigating = value
-        logger.debug(f"Setting investigating to: {value}")
-
-    def handle_person_detection(self, detection_data):
-        current_time = time.time()
-        
-        # Log current state for debugging
-        logger.debug(f"Current state before processing detection:")
-        logger.debug(f"investigating: {self.investigating}")
-        logger.debug(f"last_detection_time: {self._last_detection_time}")
-        logger.debug(f"detected_person: {self._detected_person}")
-        
-        # Check cooldown period
-        if self._last_detection_time:
-            time_since_last = current_time - self._last_detection_time
-            logger.debug(f"Time since last detection: {time_since_last:.2f} seconds")
-            if time_since_last < self.detection_cooldown:
-                logger.debug(f"In cooldown period ({time_since_last:.2f} < {self.detection_cooldown})")
-                return
-        
-        # Check if we're already investigating
-        if self.investigating:
-            if not self._investigation_complete:
-                logger.debug("Currently investigating, cannot start new investigation")
-                return
-            else:
-                logger.debug("Previous investigation complete, can start new one")
-        
-        # Process new detection
-        camera_id = detection_data['camera_id']
-        logger.info(f"Starting new investigation for camera {camera_id}")
-        
-        self._detected_person = {
-            'camera_id': camera_id,
-            'position': self.camera_positions[camera_id],
-            'detection_time': current_time
-        }
-        self._investigating = True
-        self._investigation_complete = False
-        self._last_detection_time = current_time
-        
-        logger.debug("Detection processed - New state:")
-        logger.debug(f"investigating: {self._investigating}")
-        logger.debug(f"detected_person: {self._detected_person}")
-
-    def calculate_distance(self, pos1, pos2):
-        distance = math.sqrt(
-            (pos1['x'] - pos2['x'])**2 +
-            (pos1['y'] - pos2['y'])**2 +
-            (pos1['z'] - pos2['z'])**2
-        )
-        calculated_distance = distance if distance >= self.MIN_MOVEMENT_THRESHOLD else 0
-        return calculated_distance
-
-
-    def step(self, current_state):
-        position = current_state['position']
-        current_time = current_state.get('time', time.time())
-        self.update_metrics(position, current_time)
-
-        logger.debug(f"Step - Current state:")
-        logger.debug(f"Position: {position}")
-        logger.debug(f"Investigating: {self._investigating}")
-        logger.debug(f"Investigation complete: {self._investigation_complete}")
-        logger.debug(f"Detected person: {self._detected_person}")
         
-        if self._investigating and self._detected_person:
-            if self.check_investigation_complete(position):
-                logger.info("Investigation complete, resuming exploration")
-                return {"decision": "explore"}
-            
-            camera_pos = self._detected_person['position']
-            logger.debug(f"Moving to investigation target: {camera_pos}")
-            return {
-                "decision": "move_to_target",
-                "target": camera_pos
-            }
-        
-        return {"decision": "explore"}
-
-    def check_investigation_complete(self, current_position):
-        if not self._detected_person:
-            return False
-            
-        target_pos = self._detected_person['position']
-        distance = self.calculate_distance(current_position, target_pos)
-        
-        logger.debug(f"Checking investigation completion - Distance to target: {distance:.2f}")
-        
-        if distance < 2.0:
-            logger.info(f"Investigation complete - Distance to target: {distance:.2f}")
-            self._investigating = False
-            self._investigation_complete = True
-            self._detected_person = None
-            return True
-            
-        return False
-
-    def update_metrics(self, current_position, current_time):
-        if self.last_position and self.last_movement_time:
-            if isinstance(current_time, datetime):
-                time_diff = (current_time - self.last_movement_time).total_seconds()
-            else:
-                time_diff = current_time - self.last_movement_time
-            
-            if time_diff >= 0.1:
-                distance = self.calculate_distance(current_position, self.last_position)
-                if distance > 0:
-                    self.total_distance_traveled += distance
-                self.last_movement_time = current_time
-        else:
-            self.last_movement_time = current_time
-
-        self.last_position = current_position.copy()
-
-
-class RobotWorld(ap.Model):
-    def setup(self):
-        self.agents = ap.AgentList(self, self.p.num_robots, RobotAgent)
+        # Investigation state of every robot in NumPy arrays, decided in one vectorized pass;
+        # the listener thread only queues detections, the request threads apply them
+        self.fleet = InvestigationFleet(self.p.num_robots, self.camera_positions, detection_cooldown=5.0)
         self.detection_thread = None
         self.detection_socket = None
         self.running = True
@@ -211,41 +80,26 @@ class RobotWorld(ap.Model):
         while self.running:
             try:
                 data, _ = self.detection_socket.recvfrom(65536)
-                detection = json.loads(data.decode())
-                # logger.info(f"Received detection: {detection}")
-                for agent in self.agents:
-                    agent.handle_person_detection(detection)
+                detections = decode_detections(data)
+                current_time = time.time()
+                for detection in detections:
+                    self.fleet.post_detection(detection, current_time)
             except Exception as e:
                 if self.running:  # Solo logear errores si aún estamos ejecutando
-                    logger.error(f"Error processing detection: {e}")
+                    logger.error("Error processing detection: %s", e)
                     time.sleep(0.1)
 
     def get_decisions(self, world_state):
-        logger.debug(f"Getting decisions for world state: {world_state}")
-        decisions = []
-        agent_states = {entry['id']: entry['state'] for entry in world_state['agentStates']}
-        
-        for agent in self.agents:
-            if str(agent.id) in agent_states:
-                agent_state = agent_states[str(agent.id)]
-                decision = agent.step(agent_state)
-                decisions.append(decision)
-                logger.debug(f"Decision for agent {agent.id}: {decision}")
-        
-        return decisions
+        return self.fleet.get_decisions(world_state['agentStates'])
 
     def get_metrics(self, world_state):
-        metrics = []
-        agent_states = {entry['id']: entry['state'] for entry in world_state['agentStates']}
-        for agent in self.agents:
-            if str(agent.id) in agent_states:
-                agent_state = agent_states[str(agent.id)]
-                agent.update_metrics(agent_state['position'], agent_state.get('time', 0))
-                metrics.append({
-                    'agent_id': agent.id,
-                    'total_distance': round(agent.total_distance_traveled, 2)
-                })
-        return metrics
+        return self.fleet.get_metrics(world_state['agentStates'])
+
+    def step_robots(self, agent_states, now=None):
+        """Decisions and metrics from one pass over the state, keyed by robot id"""
+        decisions, metrics = self.fleet.step(agent_states, now)
+        ids = [str(metric['agent_id']) for metric in metrics]
+        return {'decisions': dict(zip(ids, decisions)), 'metrics': dict(zip(ids, metrics))}
 
     def cleanup(self):
         self.running = False
@@ -258,6 +112,9 @@ class RobotWorld(ap.Model):
 model = RobotWorld({'num_robots': 1})
 model.sim_setup()
 
+# Delta protocol: changed robot fields in, changed decisions and metrics out
+sessions = DeltaSessions(model.step_robots, per_agent=('decisions', 'metrics'))
+
 @app.route('/get_decisions', methods=['POST'])
 def get_decisions():
     try:
@@ -265,7 +122,7 @@ def get_decisions():
         decisions = model.get_decisions(world_state)
         return jsonify({'decisions': decisions})
     except Exception as e:
-        logger.error(f"Error processing decisions request: {str(e)}")
+        logger.error("Error processing decisions request: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/get_metrics', methods=['POST'])
@@ -275,12 +132,49 @@ def get_metrics():
         metrics = model.get_metrics(world_state)
         return jsonify({'metrics': metrics})
     except Exception as e:
-        logger.error(f"Error processing metrics request: {str(e)}")
+        logger.error("Error processing metrics request: %s", e)
         return jsonify({'error': str(e)}), 500
 
+@app.route('/step', methods=['POST'])
+def step():
+    """Decisions and metrics for the same world state in one request"""
+    try:
+        world_state = request.json
+        decisions, metrics = model.fleet.step(world_state['agentStates'])
+        return jsonify({'decisions': decisions, 'metrics': metrics})
+    except Exception as e:
+        logger.error("Error processing step request: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/session', methods=['POST'])
+def session():
+    try:
+        return jsonify(sessions.handle(request.json, time.time()))
+    except Exception as e:
+        logger.error("Error processing session request: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+# Same endpoints over the persistent decision channel (decision_channel.py)
+channel = ChannelServer({
+    'get_decisions': lambda world_state, now: {'decisions': model.get_decisions(world_state)},
+    'get_metrics': lambda world_state, now: {'metrics': model.get_metrics(world_state)},
+    'step': lambda world_state, now: dict(zip(('decisions', 'metrics'), model.fleet.step(world_state['agentStates'], now))),
+    'session': sessions.handle
+}, port=5001)
+
+def shutdown():
+    model.cleanup()
+
 if __name__ == '__main__':
+    # Development server; use serve.py (python serve.py Controller2) under load.
+    # FLASK_DEBUG=1 enables the debugger and reloader
+    debug = os.environ.get('FLASK_DEBUG') == '1'
     try:
+        # With the debug reloader only the serving child process opens the channel
+        if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            channel.start()
         logger.info("Starting Flask application")
-        app.run(debug=True)
+        app.run(debug=debug, threaded=True)
     finally:
-        model.cleanup()
\ No newline at end of file
+        channel.stop()
+        shutdown()
\ No newline at end of file
@@ -1,271 +1,436 @@
 import cv2
 import numpy as np
 import socket
-import threading
-import struct
 import time
 import logging
-from ultralytics import YOLO
-import torch
-import json
+from functools import partial
 from collections import defaultdict
+from inference_scheduler import InferenceScheduler
+from tracker_pool import TrackerPool
+from frame_ingest import FrameIngest
+from camera_workers import CameraWorkerPool
+from mosaic import FrameSlots, Mosaic
+from mosaic_stream import MosaicStreamer
+from track_history import TrackHistory
+from motion_gate import MotionGate
+from rate_control import RateController
+from roi import load_rois
+from detectors import create_detector
+from detection_protocol import encode_detections, encode_detections_json, SOURCE_CAMERA
+from perf_stats import PipelineStats, PerfMonitor
+from log_config import configure_logging
 #this code is called staticCameras.py and is in the folder pycodes in the assets folder
 #this code is for the static cameras that are in the environment, they are 4 cameras that are in the corners of the environment
 #this detect the people in the environment and send the data to the unity app
-logging.basicConfig(level=logging.INFO)
+configure_logging(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class SecurityCameraSystem:
-    def __init__(self, num_cameras=4, base_port=5123):
+    def __init__(self, num_cameras=4, base_port=5123, max_batch_size=8, max_wait_ms=10.0,
+                 num_workers=0, camera_ids=None, detection_sink=None, frame_sink=None,
+                 headless=False, stream_port=8080, stream_fps=15.0, detection_format='binary',
+                 perf=None, metrics_port=None, metrics_interval=10.0, motion_gate=False,
+                 rate_control=False, rois=None, model_name='yolov8n', detector_backend='torch'):
+        self.startup_start = time.perf_counter()
         self.num_cameras = num_cameras
         self.base_port = base_port
+        self.camera_ids = list(camera_ids) if camera_ids is not None else list(range(num_cameras))
+        self.num_workers = num_workers
         self.running = True
-        self.frame_buffer = {}
-        self.lock = threading.Lock()
+        
+        # Modo sin ventana: el mosaico se sirve como MJPEG por HTTP
+        self.headless = headless
+        self.stream_port = stream_port
+        self.stream_fps = stream_fps
+        
+        # Celdas del mosaico (640x480 por cámara)
+        self.cell_height = 480
+        self.cell_width = 640
+        
+        # Destino de detecciones y frames anotados (en modo multiproceso los pone el worker)
+        self.detection_sink = detection_sink or self._send_detections_to_unity
+        self.frame_sink = frame_sink
+        
+        # Tiempos por etapa opcionales (PipelineStats); sin ellos no se mide nada.
+        # Con metrics_port se publican en /metrics y en una línea de log periódica
+        if metrics_port is not None and num_workers > 0:
+            # Cada worker mide en su propio proceso; el padre no tiene tiempos que publicar
+            logger.warning("metrics_port %s is ignored with num_workers=%d: per-stage stats are only "
+                           "collected in single-process mode", metrics_port, num_workers)
+            metrics_port = None
+        if perf is None and metrics_port is not None:
+            perf = PipelineStats()
+        self.perf = perf
+        self.perf_monitor = None
+        if perf is not None and metrics_port is not None:
+            self.perf_monitor = PerfMonitor(perf, port=metrics_port, log_interval=metrics_interval)
         
         # Tracking temporal de detecciones
-        self.detection_history = defaultdict(lambda: defaultdict(dict))
         self.MIN_DETECTION_TIME = 0.1 # Tiempo mínimo de detección continua (segundos)
         self.MAX_POSITION_CHANGE = 1000  # Cambio máximo permitido en posición normalizada entre frames
-        self.CLEANUP_INTERVAL = 5.0  # Intervalo para limpiar detecciones antiguas
+        self.TRACK_TIMEOUT = 1.0  # Segundos sin verse antes de olvidar un track (como el buffer de ByteTrack)
+        self.MAX_TRACKS_PER_CAMERA = 256  # Límite de tracks vivos por cámara
         
-        # Cargar modelo YOLOv8
-        self.model = YOLO('yolov8n.pt')
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self.model.to(self.device)
+        # Registro por cámara en arreglos fijos (ring de las últimas 10 posiciones por track)
+        self.detection_history = defaultdict(lambda: TrackHistory(
+            min_detection_time=self.MIN_DETECTION_TIME,
+            max_position_change=self.MAX_POSITION_CHANGE,
+            history_length=10,
+            max_age=self.TRACK_TIMEOUT,
+            max_tracks=self.MAX_TRACKS_PER_CAMERA
+        ))
         
         # Socket para enviar datos de detección
         self.unity_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.unity_detection_port = 5556
         
-        # Último tiempo de limpieza
-        self.last_cleanup_time = time.time()
+        # Un paquete por frame; 'json' queda como alternativa para depurar
+        self.encode_detections = encode_detections_json if detection_format == 'json' else encode_detections
+        self.detection_seq = defaultdict(int)
         
-    def _is_valid_detection(self, camera_id, track_id, position, current_time):
-        """
-        Verifica si una detección es válida basada en su historia temporal y movimiento
-        """
-        history = self.detection_history[camera_id][track_id]
-        
-        # Si es una nueva detección
-        if not history:
-            history['first_seen'] = current_time
-            history['last_seen'] = current_time
-            history['positions'] = [position]
-            history['confirmed'] = False
-            return False
+        # Últimas cajas dibujadas por cámara, para los frames que salta el filtro de movimiento
+        self.last_overlay = {}
         
-        # Actualizar último tiempo visto
-        history['last_seen'] = current_time
+        self.workers = None
+        self.slots = None
+        self.detector = None
+        self.scheduler = None
+        self.ingest = None
+        self.motion_gate = None
+        self.rate_controller = None
         
-        # Verificar si el movimiento es realista
-        if history['positions']:
-            last_position = history['positions'][-1]
-            position_change = np.sqrt(
-                (position['x'] - last_position['x'])**2 + 
-                (position['y'] - last_position['y'])**2
+        if self.num_workers > 0:
+            # Modo multiproceso: las cámaras se reparten entre procesos de trabajo
+            self.workers = CameraWorkerPool(
+                num_cameras,
+                num_workers,
+                config={
+                    'num_cameras': num_cameras,
+                    'base_port': base_port,
+                    'max_batch_size': max_batch_size,
+                    'max_wait_ms': max_wait_ms,
+                    'motion_gate': motion_gate,
+                    'rate_control': rate_control,
+                    'rois': rois,
+                    'model_name': model_name,
+                    'detector_backend': detector_backend
+                },
+                cell_height=self.cell_height,
+                cell_width=self.cell_width
             )
-            
-            # Si el cambio de posición es muy grande, podría ser un falso positivo
-            if position_change > self.MAX_POSITION_CHANGE:
-                history['positions'] = [position]  # Reiniciar tracking
-                history['first_seen'] = current_time
-                history['confirmed'] = False
-                return False
+            # Los workers escriben los frames anotados directo en la memoria compartida
+            self.slots = self.workers.create_slots()
+            return
         
-        # Actualizar historial de posiciones
-        history['positions'].append(position)
-        if len(history['positions']) > 10:  # Mantener solo las últimas 10 posiciones
-            history['positions'].pop(0)
+        if self.frame_sink is None:
+            # Slots preasignados: el frame anotado se escribe ya al tamaño de la celda
+            self.slots = FrameSlots(self.num_cameras, self.cell_height, self.cell_width)
+            self.frame_sink = self.slots.write
         
-        # Verificar tiempo mínimo de detección
-        detection_duration = current_time - history['first_seen']
+        # Regiones de interés por cámara ({camera_id: config} o ruta a un JSON), con mosaicos opcionales
+        self.rois = load_rois(rois)
         
-        # Si ya está confirmada, mantener la confirmación
-        if history['confirmed']:
-            return True
+        # Filtro de movimiento opcional: los frames sin cambios no pasan por YOLO. La
+        # revalidación debe caer antes de TRACK_TIMEOUT o las personas quietas expiran
+        self.motion_gate = MotionGate(refresh_interval=self.TRACK_TIMEOUT / 2) if motion_gate else None
+        
+        # Cargar el detector (YOLOv8 en PyTorch, ONNX Runtime, OpenVINO o int8 según detector_backend)
+        self.detector = create_detector(model_name, backend=detector_backend)
+        
+        # Un tracker por cámara: la detección se hace en batch, la asociación por cámara
+        self.trackers = TrackerPool('bytetrack.yaml')
+        
+        # Planificador que junta los frames de todas las cámaras en un solo batch
+        self.scheduler = InferenceScheduler(
+            self._detect_batch,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            name="CameraInference"
+        )
+        
+        # Recepción UDP con reensamblado de frames y descarte de frames viejos
+        self.ingest = FrameIngest(
+            {camera_id: self.base_port + camera_id for camera_id in self.camera_ids},
+            self._handle_camera_frame,
+            name="Camera"
+        )
+        
+        # Control de tasa opcional: ajusta tasa, calidad y resolución de cada emisor
+        if rate_control:
+            self.rate_controller = RateController(self.ingest, scheduler=self.scheduler)
         
-        # Si cumple el tiempo mínimo, confirmar la detección
-        if detection_duration >= self.MIN_DETECTION_TIME:
-            history['confirmed'] = True
-            return True
-            
-        return False
-    
     def _cleanup_old_detections(self, current_time):
         """
-        Limpia detecciones antiguas que ya no están activas
+        Expira los tracks que ya no están activos; la rueda de tiempo solo
+        revisa las cubetas vencidas, así que se puede llamar en cada frame
         """
-        if current_time - self.last_cleanup_time < self.CLEANUP_INTERVAL:
-            return
-            
-        self.last_cleanup_time = current_time
-        
-        for camera_id in list(self.detection_history.keys()):
-            for track_id in list(self.detection_history[camera_id].keys()):
-                history = self.detection_history[camera_id][track_id]
-                if current_time - history['last_seen'] > self.MIN_DETECTION_TIME:
-                    del self.detection_history[camera_id][track_id]
+        for history in self.detection_history.values():
+            history.expire(current_time)
     
-    def process_frame(self, frame, camera_id):
+    def track_stats(self):
+        """Tracks vivos, expirados y desalojados por cámara"""
+        return {camera_id: history.stats() for camera_id, history in self.detection_history.items()}
+    
+    def _detect_batch(self, frames):
+        """Ejecuta YOLOv8 una sola vez sobre los frames de varias cámaras"""
+        start = time.perf_counter()
+        results = self.detector.predict(frames, classes=[0])
+        if self.perf:
+            # La inferencia es compartida: se registra por batch
+            self.perf.record('batch', 'infer', time.perf_counter() - start)
+        return results
+    
+    def _on_detection_result(self, camera_id, frame, result, source_time=None, roi_offsets=None):
+        """Callback del planificador: post-procesa y publica el frame anotado"""
+        start = time.perf_counter()
+        if roi_offsets is not None and result is not None:
+            # Resultados de la región de interés / mosaicos: se juntan en coordenadas del frame
+            result = self.rois[camera_id].merge(result, roi_offsets, frame.shape)
+        processed_frame = self.process_frame(frame, camera_id, result)
+        sink_start = time.perf_counter()
+        self.frame_sink(camera_id, processed_frame)
+        if self.perf:
+            # El frame_sink escala el frame anotado a la celda del mosaico
+            end = time.perf_counter()
+            self.perf.record(camera_id, 'resize', end - sink_start)
+            self.perf.record(camera_id, 'post', end - start)
+            self.perf.frame_done(camera_id, source_time)
+    
+    def process_frame(self, frame, camera_id, result):
         try:
             current_time = time.time()
             self._cleanup_old_detections(current_time)
             
-            # Ejecutar detección con YOLOv8
-            results = self.model.track(frame, persist=True, classes=[0])
+            if result is None:
+                # Frame saltado por el filtro de movimiento: nada se movió, así que
+                # los tracks confirmados siguen vivos y se redibujan sus últimas cajas
+                if not self.detection_history[camera_id].keep_alive(current_time):
+                    # Sin detecciones reales en TRACK_TIMEOUT: ya no hay nada que mantener
+                    self.last_overlay.pop(camera_id, None)
+                    return frame
+                overlay = self.last_overlay.get(camera_id)
+                if overlay is None:
+                    return frame
+                if self.rate_controller:
+                    self.rate_controller.note_detections(camera_id, current_time)
+                annotated_frame = frame.copy()
+                self._draw_detections(annotated_frame, *overlay)
+                return annotated_frame
+            
+            stage_start = time.perf_counter()
+            tracks = self.trackers.update(camera_id, result, frame)
             
-            if results and len(results) > 0:
-                result = results[0]
+            if len(tracks) > 0:
+                # Umbral de confianza sobre todas las cajas a la vez
+                tracks = tracks[tracks[:, 5] > 0.5]
+                if self.rate_controller and len(tracks):
+                    self.rate_controller.note_detections(camera_id, current_time)
+                boxes = tracks[:, :4].astype(int)
+                track_ids = tracks[:, 4].astype(int)
+                confidences = tracks[:, 5]
                 
-                if hasattr(result, 'boxes') and len(result.boxes) > 0:
-                    # Procesar detecciones
-                    boxes = result.boxes.xyxy.cpu().numpy()
-                    confidences = result.boxes.conf.cpu().numpy()
-                    track_ids = result.boxes.id.cpu().numpy() if result.boxes.id is not None else None
-                    
-                    # Dibujar detecciones
-                    annotated_frame = frame.copy()
-                    
-                    for i, box in enumerate(boxes):
-                        if confidences[i] > 0.5:  # Umbral de confianza
-                            x1, y1, x2, y2 = map(int, box)
-                            track_id = int(track_ids[i]) if track_ids is not None else i
-                            
-                            # Calcular posición central normalizada
-                            position = {
-                                'x': (x1 + x2) / (2 * frame.shape[1]),
-                                'y': (y1 + y2) / (2 * frame.shape[0])
-                            }
-                            
-                            # Verificar si la detección es válida
-                            if self._is_valid_detection(camera_id, track_id, position, current_time):
-                                # Dibujar bbox en verde para detecciones confirmadas
-                                cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                                
-                                # Añadir texto de tiempo de tracking
-                                tracking_time = current_time - self.detection_history[camera_id][track_id]['first_seen']
-                                cv2.putText(annotated_frame, 
-                                          f"ID: {track_id} Time: {tracking_time:.1f}s",
-                                          (x1, y1 - 10),
-                                          cv2.FONT_HERSHEY_SIMPLEX,
-                                          0.5,
-                                          (0, 255, 0),
-                                          2)
-                                
-                                # Enviar datos solo de detecciones confirmadas
-                                detection_data = {
-                                    'camera_id': camera_id,
-                                    'track_id': track_id,
-                                    'position': position,
-                                    'confidence': float(confidences[i]),
-                                    'tracking_time': tracking_time
-                                }
-                                self._send_detection_to_unity(detection_data)
-                            else:
-                                # Dibujar bbox en rojo para detecciones no confirmadas
-                                cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
-                    
-                    return annotated_frame
+                # Posiciones centrales normalizadas
+                height, width = frame.shape[:2]
+                positions = np.column_stack((
+                    (boxes[:, 0] + boxes[:, 2]) / (2 * width),
+                    (boxes[:, 1] + boxes[:, 3]) / (2 * height)
+                ))
+                
+                # Verificar qué detecciones son válidas según su historia
+                valid, tracking_times = self.detection_history[camera_id].update(
+                    track_ids, positions, current_time
+                )
+                stage_start = self._record_stage(camera_id, 'track', stage_start)
+                
+                # Dibujar detecciones
+                annotated_frame = frame.copy()
+                overlay = (boxes, track_ids, tracking_times, valid)
+                self._draw_detections(annotated_frame, *overlay)
+                self.last_overlay[camera_id] = overlay
+                
+                # Enviar datos solo de detecciones confirmadas
+                confirmed_detections = [{
+                    'camera_id': camera_id,
+                    'track_id': int(track_ids[i]),
+                    'position': {'x': float(positions[i, 0]), 'y': float(positions[i, 1])},
+                    'confidence': float(confidences[i]),
+                    'tracking_time': float(tracking_times[i])
+                } for i in np.flatnonzero(valid)]
+                
+                stage_start = self._record_stage(camera_id, 'annotate', stage_start)
+                
+                if confirmed_detections:
+                    self.detection_sink(camera_id, confirmed_detections)
+                    self._record_stage(camera_id, 'send', stage_start)
+                
+                return annotated_frame
+            
+            self.last_overlay.pop(camera_id, None)
+            self._record_stage(camera_id, 'track', stage_start)
             
             return frame
         
         except Exception as e:
-            logger.error(f"Error processing frame: {e}")
+            logger.error("Error processing frame: %s", e)
             return frame
     
-    def _send_detection_to_unity(self, detection_data):
-        try:
-            data_str = json.dumps(detection_data)
-            self.unity_socket.sendto(data_str.encode(), ('127.0.0.1', self.unity_detection_port))
-        except Exception as e:
-            logger.error(f"Error sending detection to Unity: {e}")
+    def _draw_detections(self, annotated_frame, boxes, track_ids, tracking_times, valid):
+        for i, (x1, y1, x2, y2) in enumerate(boxes.tolist()):
+            if valid[i]:
+                # Dibujar bbox en verde para detecciones confirmadas
+                cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                
+                # Añadir texto de tiempo de tracking
+                cv2.putText(annotated_frame, 
+                          f"ID: {track_ids[i]} Time: {tracking_times[i]:.1f}s",
+                          (x1, y1 - 10),
+                          cv2.FONT_HERSHEY_SIMPLEX,
+                          0.5,
+                          (0, 255, 0),
+                          2)
+            else:
+                # Dibujar bbox en rojo para detecciones no confirmadas
+                cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
     
-    def _receive_camera_stream(self, camera_id):
-        port = self.base_port + camera_id
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        
+    def _record_stage(self, camera_id, stage, start):
+        """Registra la etapa que empezó en start y regresa el inicio de la siguiente"""
+        now = time.perf_counter()
+        if self.perf:
+            self.perf.record(camera_id, stage, now - start)
+        return now
+    
+    def _send_detections_to_unity(self, camera_id, detections):
+        """Envía todas las detecciones confirmadas del frame en un solo paquete"""
         try:
-            sock.bind(('0.0.0.0', port))
-            sock.settimeout(1.0)
-            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)
+            self.detection_seq[camera_id] += 1
+            data = self.encode_detections(
+                SOURCE_CAMERA, camera_id, detections, frame_seq=self.detection_seq[camera_id]
+            )
+            self.unity_socket.sendto(data, ('127.0.0.1', self.unity_detection_port))
         except Exception as e:
-            logger.error(f"Error setting up socket for camera {camera_id}: {e}")
-            return
+            logger.error("Error sending detection to Unity: %s", e)
+    
+    def _handle_camera_frame(self, camera_id, packet, received_time):
+        """Decodifica el frame más reciente de la cámara y lo envía al planificador"""
+        if self.perf:
+            # recv: del envío a la llegada completa (solo el formato con timestamp del emisor)
+            if packet.seq is not None:
+                self.perf.record(camera_id, 'recv', received_time - packet.timestamp)
+            self.perf.record(camera_id, 'wait', time.time() - received_time)
+        start = time.perf_counter()
+        nparr = np.frombuffer(packet.payload, np.uint8)
+        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if self.perf:
+            self.perf.record(camera_id, 'decode', time.perf_counter() - start)
         
-        while self.running:
-            try:
-                data, _ = sock.recvfrom(65535)
-                
-                if len(data) < 4:
-                    continue
-                
-                received_camera_id = struct.unpack('i', data[:4])[0]
-                if received_camera_id != camera_id:
-                    continue
-                
-                img_data = data[4:]
-                nparr = np.frombuffer(img_data, np.uint8)
-                frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                
-                if frame is not None:
-                    processed_frame = self.process_frame(frame, camera_id)
-                    with self.lock:
-                        self.frame_buffer[camera_id] = processed_frame
+        if frame is not None:
+            infer = True
+            if self.motion_gate:
+                start = time.perf_counter()
+                infer = self.motion_gate.should_infer(camera_id, frame, time.time())
+                if self.perf:
+                    self.perf.record(camera_id, 'gate', time.perf_counter() - start)
             
-            except socket.timeout:
-                continue
-            except Exception as e:
-                logger.error(f"Error in reception for camera {camera_id}: {e}")
-                continue
+            inputs = offsets = None
+            roi = self.rois.get(camera_id)
+            if roi is not None and infer:
+                inputs, offsets = roi.prepare(frame)
+            
+            # El timestamp del emisor viaja con el frame para medir la latencia
+            self.scheduler.submit(
+                camera_id, frame,
+                partial(self._on_detection_result, source_time=packet.timestamp, roi_offsets=offsets),
+                infer=infer,
+                inputs=inputs
+            )
+    
+    def _start_pipeline(self):
+        if self.workers:
+            self.workers.start(self.detection_sink)
+            return
+        # Calentar el detector con un batch del tamaño real antes de aceptar frames
+        warmup_time = self.detector.warmup(
+            batch_size=min(self.scheduler.max_batch_size, len(self.camera_ids)),
+            shape=(self.cell_height, self.cell_width)
+        )
+        logger.info(f"Ready in {time.perf_counter() - self.startup_start:.2f}s "
+                    f"(model load {self.detector.load_time:.2f}s, warm-up {warmup_time:.2f}s)")
+        self.scheduler.start()
+        if self.perf_monitor:
+            self.perf_monitor.start()
+        # Recepción por cámara: un hilo solo lee el socket, otro procesa el frame más nuevo
+        self.ingest.start()
+        if self.rate_controller:
+            self.rate_controller.start()
+    
+    def _stop_pipeline(self):
+        if self.workers:
+            self.workers.stop()
+            return
+        if self.rate_controller:
+            self.rate_controller.stop()
+        if self.ingest:
+            self.ingest.stop()
+        if self.scheduler:
+            self.scheduler.stop()
+        if self.perf_monitor:
+            self.perf_monitor.stop()
     
     def start(self):
         logger.info("Starting Security Camera System")
+        self._start_pipeline()
         
-        # Iniciar hilos para cada cámara
-        threads = []
-        for i in range(self.num_cameras):
-            thread = threading.Thread(
-                target=self._receive_camera_stream,
-                args=(i,),
-                name=f"Camera-{i}"
-            )
-            thread.daemon = True
-            thread.start()
-            threads.append(thread)
-        
-        # Iniciar visualización
-        self._display_feeds()
+        # Iniciar visualización (ventana local o stream MJPEG en modo headless)
+        if self.headless:
+            self._serve_mosaic()
+        else:
+            self._display_feeds()
         
         # Limpieza
         self.running = False
-        for thread in threads:
-            thread.join()
+        self._stop_pipeline()
+        if self.ingest:
+            logger.info(f"Ingest stats: {self.ingest.stats()}")
+            logger.info(f"Track stats: {self.track_stats()}")
+        if self.motion_gate:
+            logger.info(f"Motion gate stats: {self.motion_gate.stats()}")
+        if self.rate_controller:
+            logger.info(f"Rate control stats: {self.rate_controller.stats()}")
+        if self.perf:
+            logger.info(f"Pipeline stats: {self.perf.summary_line()}")
+    
+    def run_until(self, stop_event):
+        """Ejecuta el pipeline sin ventana hasta que stop_event se active (modo worker)"""
+        self._start_pipeline()
+        while self.running and not stop_event.is_set():
+            stop_event.wait(0.5)
+        self.running = False
+        self._stop_pipeline()
         
+    def _serve_mosaic(self):
+        streamer = MosaicStreamer(
+            Mosaic(self.slots, cols=2),
+            port=self.stream_port,
+            fps=self.stream_fps
+        )
+        streamer.start()
+        try:
+            while self.running:
+                time.sleep(0.5)
+        finally:
+            streamer.stop()
+            logger.info(f"Mosaic stream stats: {streamer.stats()}")
+    
     def _display_feeds(self):
         cv2.namedWindow('Security Camera Feeds', cv2.WINDOW_NORMAL)
         
+        # Grid de 2x2 para las 4 cámaras, preasignado; solo se redibuja si cambió alguna celda
+        mosaic = Mosaic(self.slots, cols=2)
+        
         while self.running:
             try:
-                with self.lock:
-                    frames = self.frame_buffer.copy()
-                
-                if frames:
-                    # Crear grid de 2x2 para las 4 cámaras
-                    rows = 2
-                    cols = 2
-                    cell_height = 480
-                    cell_width = 640
-                    grid = np.zeros((cell_height * rows, cell_width * cols, 3), dtype=np.uint8)
-                    
-                    for camera_id, frame in frames.items():
-                        i = camera_id // cols
-                        j = camera_id % cols
-                        frame_resized = cv2.resize(frame, (cell_width, cell_height))
-                        grid[i*cell_height:(i+1)*cell_height, 
-                             j*cell_width:(j+1)*cell_width] = frame_resized
-                    
-                    cv2.imshow('Security Camera Feeds', grid)
+                if mosaic.render():
+                    cv2.imshow('Security Camera Feeds', mosaic.grid)
                 
                 key = cv2.waitKey(1) & 0xFF
                 if key == ord('q'):
@@ -273,7 +438,7 @@ class SecurityCameraSystem:
                     break
                 elif key == ord('s'):
                     timestamp = time.strftime("%Y%m%d-%H%M%S")
-                    cv2.imwrite(f'security_capture_{timestamp}.jpg', grid)
+                    cv2.imwrite(f'security_capture_{timestamp}.jpg', mosaic.grid)
                 
                 time.sleep(0.01)
                 
@@ -285,6 +450,7 @@ class SecurityCameraSystem:
         """Detener el sistema y limpiar recursos"""
         logger.info("Stopping Security Camera System")
         self.running = False
+        self._stop_pipeline()
         cv2.destroyAllWindows()
         self.unity_socket.close()
 
@@ -292,7 +458,17 @@ if __name__ == "__main__":
     try:
         system = SecurityCameraSystem(
             num_cameras=4,  # Número de cámaras de seguridad
-            base_port=5124  # Puerto base para la comunicación
+            base_port=5124,  # Puerto base para la comunicación
+            max_batch_size=8,  # Máximo de frames por batch de inferencia
+            max_wait_ms=10.0,  # Espera máxima para completar un batch
+            num_workers=0,  # Procesos de trabajo (0 = todo en este proceso)
+            headless=False,  # True para servir el mosaico por HTTP en lugar de abrir ventana
+            stream_port=8080,  # Puerto del stream MJPEG en modo headless
+            metrics_port=None,  # Puerto de /metrics con los tiempos por etapa (None = desactivado)
+            motion_gate=False,  # True para saltar YOLO en los frames sin movimiento
+            rate_control=False,  # True para ajustar tasa, calidad y resolución de los emisores
+            rois=None,  # Regiones de interés por cámara, p. ej. 'rois.json' (None = frame completo)
+            detector_backend='torch'  # 'torch', 'onnx', 'onnx-int8', 'openvino' u 'openvino-int8'
         )
         system.start()
     except KeyboardInterrupt:
@@ -8,13 +8,18 @@ import matplotlib.pyplot as plt
 import numpy as np
 
 # Import os utilities
+import ast
 import os
 import signal
+import threading
 
 # Importing flask module for a WSGI application
 # Additionally, importing json and request utilities
 from flask import Flask, jsonify, request
 
+# Persistent binary channel with the same step/setup calls
+from decision_channel import ChannelServer
+
 #########################################################
 #                   Flask Server                        #
 #########################################################
@@ -23,6 +28,34 @@ from flask import Flask, jsonify, request
 # current module (__name__) as argument.
 app = Flask(__name__)
 
+# Both the HTTP endpoints and the decision channel step the model
+model_lock = threading.Lock()
+
+def step_model(wealth_list):
+
+    """
+    Updates the wealth of all agents (from the client), calls the
+    model step and update, and returns the next actions.
+    """
+
+    with model_lock:
+        # Converts the list of wealths into an AttrIter (list of atributes)
+        # and updates the wealth of all agents
+        model.agents.wealth = ap.AttrIter(wealth_list)
+        # Executes model's step() manually (this is 'model.sim_step()', 
+        # instead of model.step()) (See more in the agentpy's documentation)
+        model.sim_step()
+        # Calls model's update()
+        model.update()
+        # The list of next actions (see the class WealthModel)
+        return {'actions' : model.actions}
+
+def get_setup():
+
+    """ Number of agents and initial wealth, from model parameters (model.p) """
+
+    return {'agents' : model.p.agents, 'wealths' : model.p.wealths}
+
 # Create new POST EndPoint to /step
 @app.route('/step', methods=['POST'])
 def step():
@@ -45,17 +78,15 @@ def step():
     method. Finally, it sends a JSON response with all next 
     actions of the agents.
     """
-    # Converts the list of wealths into an AttrIter (list of atributes)
-    # and updates the wealth of all agents
-    model.agents.wealth = ap.AttrIter(eval(request.form['wealthList']))
-    # Executes model's step() manually (this is 'model.sim_step()', 
-    # instead of model.step()) (See more in the agentpy's documentation)
-    model.sim_step()
-    # Calls model's update()
-    model.update()
+    # The list of wealths comes as JSON or as the form field
+    # with a Python literal list (the original client)
+    if request.is_json:
+        wealth_list = request.get_json()['wealthList']
+    else:
+        wealth_list = ast.literal_eval(request.form['wealthList'])
     # Send a JSON response with the list of next actions 
     # (see the class WealthModel)
-    return jsonify({'actions' : model.actions})
+    return jsonify(step_model(wealth_list))
     # else:
     """
     If the simulation is not running, then kill the server.
@@ -81,7 +112,7 @@ def setup():
     """
     # Send JSON response about number of agents, and initial wealth,
     # taken from model parameters (model.p)
-    return jsonify({'agents' : model.p.agents, 'wealths' : model.p.wealths})
+    return jsonify(get_setup())
 
 
 
@@ -214,6 +245,39 @@ def simStop():
 
 
 
+#########################################################
+#                         Model                         #
+#########################################################
+
+# Definition of Model's parameters
+# Note: if you take out 'steps', the simulation will
+# run indefinitely 
+parameters = {
+    'agents' : 100,
+    'steps' : 100,
+    'wealths' : 1
+}
+
+# Create model with parameters (at import, so that serve.py
+# can run this module: python serve.py WealthTransfer_Flask)
+model = WealthModel(parameters)
+
+# Run the manual setup of the model 
+# (model.sim_setup(), instead of model.setup())
+model.sim_setup()
+
+# Same step/setup calls over the persistent decision channel
+# (tcp://localhost:5001, see decision_channel.py)
+channel = ChannelServer({
+    'setup' : lambda body, now: get_setup(),
+    'step' : lambda body, now: step_model(body['wealthList'])
+}, port=5001)
+
+# When the server stops, execute the stop procedure.
+shutdown = simStop
+
+
+
 #########################################################
 #                          Main                         #
 #########################################################
@@ -221,26 +285,13 @@ def simStop():
 # main driver function
 if __name__ == '__main__':
 
-    # Definition of Model's parameters
-    # Note: if you take out 'steps', the simulation will
-    # run indefinitely 
-    parameters = {
-        'agents' : 100,
-        'steps' : 100,
-        'wealths' : 1
-    }
-
-    # Create model with parameters
-    model = WealthModel(parameters)
-
-    # Run the manual setup of the model 
-    # (model.sim_setup(), instead of model.setup())
-    model.sim_setup()
+    channel.start()
 
     # run() method of Flask class runs the application 
     # on the local development server.
+    # (python serve.py WealthTransfer_Flask serves it for real)
     app.run() # http://localhost:5000
+    channel.stop()
 
     # When the server stops, execute the stop procedure.
     simStop()
-    
\ No newline at end of file
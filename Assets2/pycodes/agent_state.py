@@ -0,0 +1,93 @@
+import threading
+import logging
+from collections import deque, namedtuple
+
+logger = logging.getLogger(__name__)
+
+Snapshot = namedtuple('Snapshot', 'version states')
+
+class AgentStateStore:
+    """
+    Agent state with a single writer and lock-free readers.
+
+    Producers (detection sockets, security commands) never touch agent state:
+    they post events to a queue, which is safe from any thread. The decision
+    path drains the queue, applies the events in arrival order and commits
+    the new state by swapping one reference, so snapshot() never blocks and
+    never sees a half-applied update. Committed states are never modified
+    afterwards; updates work on states.copy() (see fleet_engine).
+
+    Only one decider may drain and commit at a time; update_lock serializes
+    deciders if the store is driven from several threads.
+    """
+
+    def __init__(self, states):
+        self.events = deque()
+        self.update_lock = threading.Lock()
+        self._snapshot = Snapshot(0, states)
+
+        # Stats
+        self.events_posted = 0
+        self.events_applied = 0
+        self.events_dropped = 0
+
+    def post(self, event):
+        """Queue an event for the next update; safe from any thread"""
+        self.events.append(event)
+        self.events_posted += 1
+
+    def snapshot(self):
+        """Latest committed (version, states); never blocks"""
+        return self._snapshot
+
+    def drain(self):
+        """Pop every queued event in arrival order (decider only)"""
+        events = []
+        while True:
+            try:
+                events.append(self.events.popleft())
+            except IndexError:
+                return events
+
+    def commit(self, states):
+        """Publish new states as the next snapshot (decider only)"""
+        self._snapshot = Snapshot(self._snapshot.version + 1, states)
+        return self._snapshot
+
+    def update(self, apply_event, decide):
+        """
+        Apply the queued events one by one with apply_event(states, event) to
+        a copy of the committed states, then decide(states) -> (states, result);
+        commit the states and return result. An event that raises is logged
+        and dropped (apply_event should raise before changing anything); if
+        decide raises, the applied events go back to the queue for the next update
+        """
+        with self.update_lock:
+            states = self._snapshot.states.copy()
+            applied = []
+            for event in self.drain():
+                try:
+                    apply_event(states, event)
+                except Exception:
+                    self.events_dropped += 1
+                    logger.exception("Dropped event %r", event)
+                    continue
+                applied.append(event)
+            try:
+                states, result = decide(states)
+            except BaseException:
+                # Nothing was committed: requeue the events ahead of newer ones
+                self.events.extendleft(reversed(applied))
+                raise
+            self.events_applied += len(applied)
+            self.commit(states)
+            return result
+
+    def stats(self):
+        return {
+            'version': self._snapshot.version,
+            'pending_events': len(self.events),
+            'events_posted': self.events_posted,
+            'events_applied': self.events_applied,
+            'events_dropped': self.events_dropped
+        }
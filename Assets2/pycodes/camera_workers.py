@@ -0,0 +1,156 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import queue
+import threading
+import logging
+from mosaic import FrameSlots
+
+logger = logging.getLogger(__name__)
+
+class SharedFrameSlots(FrameSlots):
+    """
+    FrameSlots sobre un bloque de memoria compartida, para que los procesos de
+    trabajo escriban los frames anotados directamente en la celda de la cámara.
+    """
+
+    def __init__(self, num_slots, height, width, name=None, create=True):
+        size = FrameSlots.nbytes(num_slots, height, width)
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.owner = create
+
+        super().__init__(num_slots, height, width, buffer=self.shm.buf)
+        if create:
+            self.clear()
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        self.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+def _worker_main(worker_index, camera_ids, config, slots_info, detection_queue, stop_event):
+    """Proceso de trabajo: recibe, decodifica, infiere y anota un subconjunto de cámaras"""
+    # Importación diferida: StaticCameras usa este módulo para el modo multiproceso
+    from StaticCameras import SecurityCameraSystem
+
+    logging.basicConfig(level=logging.INFO)
+    slots = SharedFrameSlots(*slots_info, create=False)
+    slot_index = {camera_id: camera_id for camera_id in camera_ids}
+
+    def detection_sink(camera_id, detections):
+        try:
+            detection_queue.put_nowait((camera_id, detections))
+        except queue.Full:
+            pass
+
+    def frame_sink(camera_id, frame):
+        slots.write(slot_index[camera_id], frame)
+
+    system = SecurityCameraSystem(
+        camera_ids=camera_ids,
+        detection_sink=detection_sink,
+        frame_sink=frame_sink,
+        **config
+    )
+    logger.info(f"Worker {worker_index} handling cameras {camera_ids}")
+    try:
+        system.run_until(stop_event)
+    finally:
+        system.stop()
+        slots.close()
+
+class CameraWorkerPool:
+    """
+    Reparte las cámaras entre varios procesos de trabajo. Los frames anotados
+    regresan por memoria compartida y las detecciones por una cola que el
+    proceso padre agrega antes de enviarlas a Unity.
+    """
+
+    def __init__(self, num_cameras, num_workers, config, cell_height=480, cell_width=640):
+        self.num_cameras = num_cameras
+        self.num_workers = max(1, min(num_workers, num_cameras))
+        self.config = config
+        self.cell_height = cell_height
+        self.cell_width = cell_width
+
+        # Las cámaras se reparten de forma intercalada entre los procesos
+        self.shards = [
+            list(range(num_cameras))[i::self.num_workers] for i in range(self.num_workers)
+        ]
+
+        # spawn evita heredar el estado de torch/hilos del proceso padre
+        self.ctx = mp.get_context('spawn')
+        self.slots = None
+        self.detection_queue = self.ctx.Queue(maxsize=1024)
+        self.stop_event = self.ctx.Event()
+        self.processes = []
+        self.collector = None
+        self.running = False
+
+    def create_slots(self):
+        """Crea la memoria compartida de frames; el padre la lee para la visualización"""
+        if self.slots is None:
+            self.slots = SharedFrameSlots(self.num_cameras, self.cell_height, self.cell_width)
+        return self.slots
+
+    def start(self, on_detections):
+        """Arranca los procesos; on_detections(camera_id, detections) corre en el padre"""
+        self.create_slots()
+        slots_info = (self.num_cameras, self.cell_height, self.cell_width, self.slots.name)
+
+        self.running = True
+        for worker_index, camera_ids in enumerate(self.shards):
+            process = self.ctx.Process(
+                target=_worker_main,
+                args=(worker_index, camera_ids, self.config, slots_info,
+                      self.detection_queue, self.stop_event),
+                name=f"CameraWorker-{worker_index}",
+                daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+
+        self.collector = threading.Thread(
+            target=self._collect_detections,
+            args=(on_detections,),
+            name="DetectionCollector"
+        )
+        self.collector.daemon = True
+        self.collector.start()
+        logger.info(f"Started {self.num_workers} camera workers with shards {self.shards}")
+
+    def _collect_detections(self, on_detections):
+        while self.running:
+            try:
+                camera_id, detections = self.detection_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            try:
+                on_detections(camera_id, detections)
+            except Exception as e:
+                logger.error("Error forwarding detections from camera %s: %s", camera_id, e)
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self.stop_event.set()
+        for process in self.processes:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        if self.collector:
+            self.collector.join(timeout=2.0)
+        if self.slots:
+            self.slots.close()
+            self.slots = None
@@ -1,159 +1,13 @@
 import agentpy as ap
-from flask import Flask, request, jsonify
-import socket
-import json
-import threading
+from controller_core import ControllerCore
+from fleet_engine import DroneFleet
+from delta_session import DeltaSessions
 import logging
-import time
+from log_config import configure_logging
 
-logging.basicConfig(level=logging.INFO)
+configure_logging(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-
-class DroneAgent(ap.Agent):
-    """Individual drone agent with sensing and decision-making capabilities"""
-
-
-
-    def setup(self):
-        # Agent state variables
-        self.security_socket = None
-        self.connect_to_security_server()
-
-        self.landing_commanded_executed = False
-        self.position = {'x': 0, 'y': 0, 'z': 0}
-        self.current_target = None
-        self.last_target_time = 0
-        self.target_timeout = 10.0
-        self.wait_because_see_human = False
-        self.last_human_detection_time = 0
-        self.human_detection_timeout = 5.0
-        self.exploring = False
-        self.last_explore_time = 0
-        self.explore_cooldown = 10.0
-        self.starting = True
-        
-        self.landing_commanded = False
-
-        # Detection timing
-        self.last_detection_time = 0
-        self.detection_cooldown = 3.0
-
-    def connect_to_security_server(self):
-        try:
-            self.security_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.security_socket.connect(('127.0.0.1', 5782))
-            self.security_socket.send("DRONE_AGENT".encode('utf-8'))
-            logger.info("Connected to security agent server")
-        except Exception as e:
-            logger.error(f"Could not connect to security agent: {e}")
-            self.security_socket = None
-
-    def update_position(self, new_position):
-        """Update the agent's position"""
-        self.position = new_position
-
-    def process_detection(self, detection, current_time, camera_positions=None):
-        """Process incoming detection data"""
-        if current_time - self.last_detection_time < self.detection_cooldown:
-            return False
-
-        if 'confidence' in detection and detection['confidence'] > 0.9 and detection.get('type') == 'human':
-            # Enviar alerta al servidor de seguridad
-            if self.security_socket:
-                try:
-                    alert_msg = f"HUMAN_DETECTED:confidence={detection['confidence']}"
-                    self.security_socket.send(alert_msg.encode('utf-8'))
-                except Exception as e:
-                    logger.error(f"Error sending human detection alert: {e}")
-                    # Intentar reconectar si falla el envío
-                    self.connect_to_security_server()
-
-        if 'confidence' in detection and detection['confidence'] > 0.8:
-            if 'camera_id' in detection and camera_positions:
-                self.current_target = camera_positions[detection['camera_id']]
-                logger.info(f"new detection in camera {detection['camera_id']} with confidence {detection['confidence']}")
-            elif 'position' in detection:
-                self.current_target = detection['position']
-            self.last_target_time = current_time
-            self.last_detection_time = current_time
-            self.exploring = False
-            
-            if detection.get('type') == 'human':
-                self.wait_because_see_human = True
-                self.last_human_detection_time = current_time
-                logger.info(f"Human detection with confidence {detection['confidence']}")
-            return True
-        return False
-
-    def make_decision(self, current_time):
-        """Determine next action based on current state"""
-        # Check human detection timeout
-
-        if self.starting:
-            self.starting = False
-            logger.info("Starting")
-            return {
-                "decision": "takeoff",
-                "target": None
-            }
-
-        if self.landing_commanded:
-            self.landing_commanded_executed = True
-            self.landing_commanded = False
-            logger.info("Executing landing command")
-            return {
-                "decision": "land",
-                "target": None
-            }
-
-        if self.landing_commanded_executed:
-            logger.info("Landed or so, doing nothing")
-            return {
-                "decision": "do_nothing_aterrizing",
-                "target": None
-            }
-
-
-
-        if self.wait_because_see_human:
-            if (current_time - self.last_human_detection_time) >= self.human_detection_timeout:
-                logger.info("Human detection timeout reached, resuming normal operation")
-                self.wait_because_see_human = False
-            else:
-                logger.info("Waiting because of human detection")
-                return {
-                    "decision": "move_to_target_human",
-                    "target": self.position
-                }
-
-        # Handle active target
-        if self.current_target and (current_time - self.last_target_time) < self.target_timeout:
-            self.exploring = False
-            logger.info(f"Moving to camera target {self.current_target}")
-            return {
-                "decision": "move_to_target",
-                "target": self.current_target
-            }
-
-        # Handle exploration
-        self.current_target = None
-        if not self.exploring or (current_time - self.last_explore_time) >= self.explore_cooldown:
-            self.exploring = True
-            self.last_explore_time = current_time
-            logger.info("Exploring")
-            return {
-                "decision": "explore",
-                "target": None
-            }
-        
-        logger.info("Continuing exploration")
-        return {
-            "decision": "continue",
-            "target": None
-        }
-
 class DroneModel(ap.Model):
     """Main model coordinating the drone system"""
     
@@ -166,117 +20,54 @@ class DroneModel(ap.Model):
             3: {'x': 28.24, 'y': 4.0, 'z': -104.0}
         }
         
-        # Create agents
+        # Fleet state for every drone in NumPy arrays; detections and commands are
+        # queued and applied at decision time, and all decisions come from one vectorized pass
         n_drones = self.p.get('n_drones', 1)
-        self.agents = ap.AgentList(self, n_drones, DroneAgent)
+        self.fleet = DroneFleet(n_drones, self.camera_positions, target_confidence=0.8)
         
-        # Setup communication sockets
-        self.detection_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.detection_socket.bind(('0.0.0.0', 5556))
-        self.detection_socket.settimeout(1.0)
-
-        self.dron_detection_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.dron_detection_socket.bind(('0.0.0.0', 5557))
-        self.dron_detection_socket.settimeout(1.0)
-
-        # New command socket for receiving landing commands
-        self.command_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.command_socket.bind(('0.0.0.0', 5782))
-        self.command_socket.listen(1)
-        self.command_socket.settimeout(1.0)
-
-        # Modificar la conexión al servidor de seguridad
-        self.security_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        try:
-            self.security_socket.connect(('127.0.0.1', 5782))
-            # Identificarse como DroneAgent
-            self.security_socket.send("DRONE_AGENT".encode('utf-8'))
-            logger.info("Connected to security agent server")
-        except Exception as e:
-            logger.error(f"Could not connect to security agent: {e}")
-            self.security_socket = None
-
-
-
-        # Start detection threads
-        self.running = True
-        self.start_detection_threads()
-        self.start_security_thread()
+        # Human alerts go out as soon as the detection arrives, at most one per cooldown
+        self.alert_cooldown = 3.0
+        self.last_alert_time = 0
+        
+        # All I/O (detection sockets, security link, decision API) lives in the
+        # ControllerCore event loop, which is the only caller of the methods below
+        self.core = None
 
+        # /session: Unity sends only changed agent fields and gets only changed decisions
+        self.sessions = DeltaSessions(
+            lambda agent_states, current_time: {"decisions": self.fleet.get_decisions(agent_states, current_time)})
 
-    def start_security_thread(self):
-        """Start thread for receiving from security agent"""
-        self.security_thread = threading.Thread(target=self._handle_security_commands)
-        self.security_thread.daemon = True
-        self.security_thread.start()
+    def send_security(self, message):
+        """Send a message to the security agent server"""
+        return self.core is not None and self.core.send_security(message)
 
-    def _handle_security_commands(self):
+    def handle_security_message(self, message):
         """Handle incoming commands from security agent"""
-        while self.running and self.security_socket:
-            try:
-                data = self.security_socket.recv(1024).decode('utf-8')
-                if not data:
-                    continue
-                
-                if data.strip() == "LAND":
-                    logger.info("Received landing command from security server")
-                    for agent in self.agents:
-                        agent.landing_commanded = True
-                
-            except Exception as e:
-                logger.error(f"Security command handling error: {e}")
-                # Try to reconnect
-                try:
-                    self.security_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    self.security_socket.connect(('127.0.0.1', 5782))
-                    # Re-identificarse como DroneAgent
-                    self.security_socket.send("DRONE_AGENT".encode('utf-8'))
-                    logger.info("Reconnected to security agent server")
-                except Exception as e:
-                    logger.error(f"Reconnection failed: {e}")
-                    time.sleep(5)
-
-    def start_detection_threads(self):
-        """Initialize and start detection handling threads"""
-        self.detection_thread = threading.Thread(target=self._handle_detections)
-        self.detection_thread.daemon = True
-        self.detection_thread.start()
-
-        self.dron_detection_thread = threading.Thread(target=self._handle_dron_detections)
-        self.dron_detection_thread.daemon = True
-        self.dron_detection_thread.start()
-
-    def _handle_detections(self):
-        """Handle incoming detections from fixed cameras"""
-        while self.running:
-            try:
-                data, _ = self.detection_socket.recvfrom(65535)
-                detection = json.loads(data.decode())
-                current_time = time.time()
-                
-                for agent in self.agents:
-                    agent.process_detection(detection, current_time, self.camera_positions)
-                    
-            except socket.timeout:
-                continue
-            except Exception as e:
-                logger.error(f"Detection processing error: {e}")
-
-    def _handle_dron_detections(self):
-        """Handle incoming detections from drones"""
-        while self.running:
-            try:
-                data, _ = self.dron_detection_socket.recvfrom(65535)
-                detection = json.loads(data.decode())
-                current_time = time.time()
-                
-                for agent in self.agents:
-                    agent.process_detection(detection, current_time)
-                    
-            except socket.timeout:
-                continue
-            except Exception as e:
-                logger.error(f"Drone detection processing error: {e}")
+        if message == "LAND":
+            logger.info("Received landing command from security server")
+            self.fleet.post_land()
+
+    def handle_detections(self, source, detections, current_time):
+        """Queue incoming detections from fixed cameras and drones"""
+        for detection in detections:
+            if (detection.get('confidence', 0) > 0.9 and detection.get('type') == 'human'
+                    and current_time - self.last_alert_time >= self.alert_cooldown):
+                # Enviar alerta al servidor de seguridad (el core reconecta si se cae el enlace)
+                self.last_alert_time = current_time
+                alert_msg = f"HUMAN_DETECTED:confidence={detection['confidence']}"
+                if not self.send_security(alert_msg):
+                    logger.error("Security agent not connected, human detection alert dropped")
+            self.fleet.post_detection(source, detection, current_time)
+
+    def get_decisions(self, world_state, current_time):
+        return {"decisions": self.fleet.get_decisions(world_state['agentStates'], current_time)}
+
+    def session(self, request, current_time):
+        return self.sessions.handle(request, current_time)
+
+    def snapshot(self):
+        """Latest committed fleet state, without blocking the decision path"""
+        return self.fleet.store.snapshot()
 
     def step(self):
         """Model step - not used in this real-time system"""
@@ -284,42 +75,24 @@ class DroneModel(ap.Model):
 
     def end(self):
         """Clean shutdown"""
-        self.running = False
-        self.detection_socket.close()
-        self.dron_detection_socket.close()
-        if self.security_socket:
-            self.security_socket.close()
+        if self.core:
+            self.core.stop()
+            logger.info(f"Fleet state stats: {self.fleet.store.stats()}")
+            logger.info(f"Delta session stats: {self.sessions.stats()}")
 
 # Global model instance
 drone_model = DroneModel({'n_drones': 1})
 drone_model.setup()
 
-@app.route('/get_decisions', methods=['POST'])
-def get_decisions():
-    try:
-        world_state = request.get_json()
-        decisions = []
-        current_time = time.time()
-        
-        for idx, agent_state in enumerate(world_state['agentStates']):
-            if idx < len(drone_model.agents):
-                agent = drone_model.agents[idx]
-                agent.update_position(agent_state['state']['position'])
-                decision = agent.make_decision(current_time)
-                decisions.append(decision)
-        
-        return jsonify({"decisions": decisions})
-    
-    except Exception as e:
-        logger.error(f"Decision processing error: {e}")
-        return jsonify({"error": str(e)}), 500
-
 if __name__ == "__main__":
+    # /get_decisions and /session over HTTP on 5000 and over the persistent decision channel on 5001
+    core = ControllerCore(drone_model, routes={'/get_decisions': drone_model.get_decisions,
+                                               '/session': drone_model.session},
+                          channel_address=('0.0.0.0', 5001))
+    drone_model.core = core
     try:
-        app.run(host='0.0.0.0', port=5000)
-    except KeyboardInterrupt:
-        drone_model.end()
-        logger.info("System stopped by user")
+        core.run()
     except Exception as e:
         logger.error(f"System error: {e}")
-        drone_model.end()
\ No newline at end of file
+    finally:
+        drone_model.end()
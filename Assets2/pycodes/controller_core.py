@@ -0,0 +1,245 @@
+import asyncio
+import json
+import time
+import logging
+from detection_protocol import decode_detections
+from decision_channel import serve_connection
+
+logger = logging.getLogger(__name__)
+
+REASONS = {100: 'Continue', 200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           500: 'Internal Server Error'}
+
+class DetectionProtocol(asyncio.DatagramProtocol):
+    """Decodes detection packets on one UDP port and hands them to the core"""
+
+    def __init__(self, core, source):
+        self.core = core
+        self.source = source
+
+    def datagram_received(self, data, address):
+        self.core.datagrams[self.source] += 1
+        try:
+            detections = decode_detections(data)
+        except Exception as e:
+            logger.error("Error decoding %s detections from %s: %s", self.source, address, e)
+            return
+        try:
+            self.core.handler.handle_detections(self.source, detections, time.time())
+        except Exception as e:
+            logger.error("%s detection processing error: %s", self.source, e)
+
+class ControllerCore:
+    """
+    Single event loop for all controller I/O.
+
+    The detection UDP ports, the security server link and the decision HTTP
+    API are multiplexed on one asyncio loop, and the handler (the drone
+    model) is only ever called from that loop, so the model state has a
+    single owner and needs no locks. Nothing polls: every socket wakes the
+    loop only when data arrives.
+
+    The handler provides:
+        handle_detections(source, detections, now)  for each detection packet
+        handle_security_message(message)            for each security server message
+    and routes maps HTTP paths to callables taking (payload, now) and
+    returning a JSON-serializable response. With channel_address the same
+    routes are also served over the persistent decision channel
+    (decision_channel.py), one length-prefixed frame per call.
+    """
+
+    def __init__(self, handler, routes, detection_ports=None, security_address=('127.0.0.1', 5782),
+                 security_hello='DRONE_AGENT', api_address=('0.0.0.0', 5000), channel_address=None,
+                 reconnect_delay=5.0):
+        self.handler = handler
+        self.routes = routes
+        self.channel_routes = {path.lstrip('/'): route for path, route in routes.items()}
+        self.detection_ports = {'camera': 5556, 'drone': 5557} if detection_ports is None else detection_ports
+        self.security_address = security_address
+        self.security_hello = security_hello
+        self.api_address = api_address
+        self.channel_address = channel_address
+        self.reconnect_delay = reconnect_delay
+
+        self.loop = None
+        self.stop_event = None
+        self.security_writer = None
+
+        # Stats
+        self.datagrams = {source: 0 for source in self.detection_ports}
+        self.requests = 0
+        self.channel_connections = 0
+        self.security_reconnects = 0
+
+    def send_security(self, message):
+        """Send a message to the security server; must be called from the loop"""
+        if self.security_writer is None or self.security_writer.is_closing():
+            return False
+        self.security_writer.write(message.encode('utf-8'))
+        return True
+
+    def call(self, fn, *args, timeout=5.0):
+        """Run fn(*args) on the loop from another thread and return its result"""
+        async def run():
+            return fn(*args)
+        return asyncio.run_coroutine_threadsafe(run(), self.loop).result(timeout)
+
+    async def _security_link(self):
+        while not self.stop_event.is_set():
+            try:
+                reader, writer = await asyncio.open_connection(*self.security_address)
+            except OSError as e:
+                logger.error(f"Could not connect to security agent: {e}")
+                await self._wait_or_stop(self.reconnect_delay)
+                continue
+
+            writer.write(self.security_hello.encode('utf-8'))
+            self.security_writer = writer
+            logger.info("Connected to security agent server")
+            try:
+                while True:
+                    data = await reader.read(1024)
+                    if not data:
+                        break
+                    message = data.decode('utf-8', errors='replace').strip()
+                    try:
+                        self.handler.handle_security_message(message)
+                    except Exception as e:
+                        logger.error("Security message processing error: %s", e)
+            except (ConnectionError, OSError) as e:
+                logger.error(f"Security link error: {e}")
+            finally:
+                self.security_writer = None
+                writer.close()
+
+            if not self.stop_event.is_set():
+                logger.warning("Security agent link lost, reconnecting")
+                self.security_reconnects += 1
+                await self._wait_or_stop(self.reconnect_delay)
+
+    async def _wait_or_stop(self, delay):
+        try:
+            await asyncio.wait_for(self.stop_event.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+    def _dispatch(self, method, path, body):
+        route = self.routes.get(path)
+        if route is None:
+            return 404, {"error": f"Unknown path {path}"}
+        if method != 'POST':
+            return 405, {"error": "Only POST is supported"}
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError as e:
+            return 400, {"error": f"Invalid JSON: {e}"}
+        try:
+            return 200, route(payload, time.time())
+        except Exception as e:
+            logger.error("Error handling %s: %s", path, e)
+            return 500, {"error": str(e)}
+
+    async def _handle_http(self, reader, writer):
+        """Minimal HTTP/1.1 with keep-alive: one JSON body in, one JSON body out"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                if headers.get('expect', '').lower() == '100-continue':
+                    writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                self.requests += 1
+                status, response = self._dispatch(method, target.split('?')[0], body)
+                data = json.dumps(response).encode()
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            logger.debug("HTTP connection closed: %s", e)
+        except asyncio.CancelledError:
+            # Idle keep-alive connection at shutdown
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_channel(self, reader, writer):
+        self.channel_connections += 1
+        await serve_connection(self.channel_routes, reader, writer)
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+
+        transports = []
+        for source, port in self.detection_ports.items():
+            transport, _ = await self.loop.create_datagram_endpoint(
+                lambda source=source: DetectionProtocol(self, source),
+                local_addr=('0.0.0.0', port)
+            )
+            transports.append(transport)
+            logger.info(f"Listening for {source} detections on UDP {port}")
+
+        server = await asyncio.start_server(self._handle_http, *self.api_address)
+        logger.info(f"Decision API on http://{self.api_address[0]}:{self.api_address[1]}")
+
+        servers = [server]
+        if self.channel_address is not None:
+            servers.append(await asyncio.start_server(self._handle_channel, *self.channel_address))
+            logger.info(f"Decision channel on tcp://{self.channel_address[0]}:{self.channel_address[1]}")
+
+        security_task = None
+        if self.security_address is not None:
+            security_task = asyncio.ensure_future(self._security_link())
+
+        try:
+            await self.stop_event.wait()
+        finally:
+            for server in servers:
+                server.close()
+                await server.wait_closed()
+            for transport in transports:
+                transport.close()
+            if security_task:
+                security_task.cancel()
+            if self.security_writer:
+                self.security_writer.close()
+            logger.info(f"Controller core stats: {self.stats()}")
+
+    def run(self):
+        """Run the loop in this thread until stop() or Ctrl+C"""
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            logger.info("System stopped by user")
+
+    def stop(self):
+        """Thread-safe shutdown"""
+        if self.loop is not None and self.stop_event is not None:
+            self.loop.call_soon_threadsafe(self.stop_event.set)
+
+    def stats(self):
+        return {
+            'datagrams': dict(self.datagrams),
+            'requests': self.requests,
+            'channel_connections': self.channel_connections,
+            'security_connected': self.security_writer is not None,
+            'security_reconnects': self.security_reconnects
+        }
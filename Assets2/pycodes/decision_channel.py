@@ -0,0 +1,303 @@
+import argparse
+import asyncio
+import json
+import socket
+import socketserver
+import struct
+import threading
+import time
+import logging
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Persistent decision channel frame (version 1), little-endian:
+#   magic 'DM' | version u8 | codec u8 | kind u8 | method u8 | seq u32 | length u32 | body
+# The body is the same JSON (or msgpack) document the HTTP endpoints take and return.
+# Must match Codes/DecisionChannel.cs
+MAGIC = b'DM'
+VERSION = 1
+HEADER = struct.Struct('<2sBBBBII')
+MAX_BODY = 16 * 1024 * 1024
+
+CODEC_JSON = 0
+CODEC_MSGPACK = 1
+CODECS = {'json': CODEC_JSON, 'msgpack': CODEC_MSGPACK}
+
+REQUEST = 0
+RESPONSE = 1
+ERROR = 2
+
+# Method ids; the name is the HTTP endpoint without the slash
+METHODS = ('get_decisions', 'step', 'get_metrics', 'setup', 'session')
+
+class ChannelError(Exception):
+    pass
+
+def encode_body(codec, body):
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise ChannelError("msgpack is not installed")
+        return msgpack.packb(body, use_bin_type=True)
+    return json.dumps(body, separators=(',', ':')).encode()
+
+def decode_body(codec, data):
+    if not data:
+        return None
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise ChannelError("msgpack is not installed")
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data)
+
+def encode_frame(kind, method, seq, body, codec=CODEC_JSON):
+    data = encode_body(codec, body)
+    return HEADER.pack(MAGIC, VERSION, codec, kind, method, seq, len(data)) + data
+
+def decode_header(data):
+    """Returns (codec, kind, method, seq, length)"""
+    magic, version, codec, kind, method, seq, length = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise ChannelError("Not a decision channel frame")
+    if version != VERSION:
+        raise ChannelError(f"Unsupported decision channel version: {version}")
+    if length > MAX_BODY:
+        raise ChannelError(f"Frame too large: {length} bytes")
+    return codec, kind, method, seq, length
+
+def handle_request(routes, codec, method, body):
+    """
+    Run the route for one request frame; routes maps method names to
+    callables taking (payload, now). Returns (kind, response body)
+    """
+    name = METHODS[method] if method < len(METHODS) else None
+    route = routes.get(name)
+    if route is None:
+        return ERROR, {"error": f"Unknown method {method}"}
+    try:
+        payload = decode_body(codec, body)
+    except (ValueError, ChannelError) as e:
+        return ERROR, {"error": f"Invalid body: {e}"}
+    try:
+        return RESPONSE, route(payload, time.time())
+    except Exception as e:
+        logger.error("Error handling %s: %s", name, e)
+        return ERROR, {"error": str(e)}
+
+async def serve_connection(routes, reader, writer):
+    """Serve request frames on one asyncio connection until the client closes it"""
+    sock = writer.get_extra_info('socket')
+    if sock is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    try:
+        while True:
+            codec, kind, method, seq, length = decode_header(await reader.readexactly(HEADER.size))
+            body = await reader.readexactly(length)
+            if kind != REQUEST:
+                continue
+            kind, response = handle_request(routes, codec, method, body)
+            writer.write(encode_frame(kind, method, seq, response, codec))
+            await writer.drain()
+    except asyncio.IncompleteReadError:
+        pass
+    except (ConnectionError, ChannelError) as e:
+        logger.warning("Decision channel connection closed: %s", e)
+    except asyncio.CancelledError:
+        pass
+    finally:
+        writer.close()
+
+def _recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Connection closed")
+        data += chunk
+    return bytes(data)
+
+class _ChannelHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        server = self.server
+        try:
+            while True:
+                codec, kind, method, seq, length = decode_header(_recv_exactly(self.request, HEADER.size))
+                body = _recv_exactly(self.request, length)
+                if kind != REQUEST:
+                    continue
+                with server.lock:
+                    kind, response = handle_request(server.routes, codec, method, body)
+                self.request.sendall(encode_frame(kind, method, seq, response, codec))
+        except ConnectionError:
+            pass
+        except ChannelError as e:
+            logger.warning("Decision channel connection closed: %s", e)
+
+class ChannelServer:
+    """
+    Threaded decision channel server for the Flask apps: one thread per
+    persistent client, routes called under lock (pass the same lock the
+    HTTP handlers use so the model is never stepped concurrently)
+    """
+
+    def __init__(self, routes, host='0.0.0.0', port=5001, lock=None):
+        self.routes = routes
+        self.host = host
+        self.port = port
+        self.lock = lock or threading.Lock()
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((self.host, self.port), _ChannelHandler)
+        self.server.daemon_threads = True
+        self.server.routes = self.routes
+        self.server.lock = self.lock
+        self.thread = threading.Thread(target=self.server.serve_forever, name="DecisionChannel")
+        self.thread.daemon = True
+        self.thread.start()
+        logger.info(f"Decision channel on tcp://{self.host}:{self.port}")
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+class DecisionClient:
+    """Blocking client with one persistent connection"""
+
+    def __init__(self, host='127.0.0.1', port=5001, codec='json', timeout=5.0):
+        self.codec = CODECS[codec]
+        self.seq = 0
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def call(self, method, body):
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        self.sock.sendall(encode_frame(REQUEST, METHODS.index(method), self.seq, body, self.codec))
+        codec, kind, _, seq, length = decode_header(_recv_exactly(self.sock, HEADER.size))
+        response = decode_body(codec, _recv_exactly(self.sock, length))
+        if seq != self.seq:
+            raise ChannelError(f"Out of order response {seq} != {self.seq}")
+        if kind == ERROR:
+            raise ChannelError(response.get('error') if isinstance(response, dict) else response)
+        return response
+
+    def close(self):
+        self.sock.close()
+
+def world_state(num_agents, tick=0):
+    """World state with the same shape Unity sends (RobotWorld2.cs)"""
+    return {'agentStates': [
+        {'id': str(i), 'state': {'position': {'x': float(i), 'y': 1.0, 'z': float(tick % 100)}}}
+        for i in range(num_agents)
+    ]}
+
+def _describe(times):
+    times_ms = np.array(times) * 1000.0
+    return {
+        'ticks': len(times),
+        'mean_ms': float(times_ms.mean()),
+        'p50_ms': float(np.percentile(times_ms, 50)),
+        'p95_ms': float(np.percentile(times_ms, 95)),
+        'p99_ms': float(np.percentile(times_ms, 99))
+    }
+
+def bench_http(url, num_agents, ticks, keep_alive=True):
+    """Round trip per tick of POST url with a JSON world state"""
+    import http.client
+    from urllib.parse import urlsplit
+    parts = urlsplit(url)
+    times = []
+    conn = None
+    for tick in range(ticks):
+        body = json.dumps(world_state(num_agents, tick))
+        start = time.perf_counter()
+        if conn is None:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80)
+        conn.request('POST', parts.path, body=body, headers={'Content-Type': 'application/json'})
+        json.loads(conn.getresponse().read())
+        if not keep_alive:
+            conn.close()
+            conn = None
+        times.append(time.perf_counter() - start)
+    if conn is not None:
+        conn.close()
+    return _describe(times)
+
+def bench_channel(host, port, num_agents, ticks, codec='json', method='get_decisions'):
+    """Round trip per tick over the persistent channel"""
+    client = DecisionClient(host, port, codec=codec)
+    times = []
+    try:
+        for tick in range(ticks):
+            state = world_state(num_agents, tick)
+            start = time.perf_counter()
+            client.call(method, state)
+            times.append(time.perf_counter() - start)
+    finally:
+        client.close()
+    return _describe(times)
+
+def _start_local_controller(num_agents, api_port, channel_port):
+    """ControllerCore + DroneFleet in a background thread, for benchmarking without Unity"""
+    from controller_core import ControllerCore
+    from fleet_engine import DroneFleet
+    fleet = DroneFleet(num_agents, {})
+    routes = {'/get_decisions': lambda payload, now: {"decisions": fleet.get_decisions(payload['agentStates'], now)}}
+    core = ControllerCore(None, routes, detection_ports={}, security_address=None,
+                          api_address=('127.0.0.1', api_port), channel_address=('127.0.0.1', channel_port))
+    thread = threading.Thread(target=core.run, name="LocalController")
+    thread.daemon = True
+    thread.start()
+    time.sleep(0.5)
+    return core, thread
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-tick round trip of the decision HTTP endpoint vs the persistent channel")
+    parser.add_argument('--http', default='http://127.0.0.1:5000/get_decisions')
+    parser.add_argument('--channel', default='127.0.0.1:5001')
+    parser.add_argument('--agents', type=int, default=1)
+    parser.add_argument('--ticks', type=int, default=1000)
+    parser.add_argument('--local', action='store_true', help="Start an in-process controller to benchmark against")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    host, port = args.channel.rsplit(':', 1)
+    core = None
+    if args.local:
+        from urllib.parse import urlsplit
+        core, thread = _start_local_controller(args.agents, urlsplit(args.http).port, int(port))
+
+    reports = [
+        ('http (new connection)', lambda: bench_http(args.http, args.agents, args.ticks, keep_alive=False)),
+        ('http (keep-alive)', lambda: bench_http(args.http, args.agents, args.ticks)),
+        ('channel json', lambda: bench_channel(host, int(port), args.agents, args.ticks, 'json')),
+    ]
+    if msgpack is not None:
+        reports.append(('channel msgpack', lambda: bench_channel(host, int(port), args.agents, args.ticks, 'msgpack')))
+
+    try:
+        for name, run in reports:
+            try:
+                report = run()
+            except (OSError, ChannelError) as e:
+                print(f"{name:22s} unavailable: {e}")
+                continue
+            print(f"{name:22s} mean {report['mean_ms']:7.3f} ms  p50 {report['p50_ms']:7.3f} ms  "
+                  f"p95 {report['p95_ms']:7.3f} ms  p99 {report['p99_ms']:7.3f} ms")
+    finally:
+        if core:
+            core.stop()
+            thread.join(timeout=2.0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import threading
+import logging
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+# Delta session protocol (POST /session or the 'session' channel method)
+#
+# Request:
+#   {"session": "unity", "seq": 42, "ack": 41, "full": false,
+#    "agentStates": [{"id": "0", "state": {"position": {...}}}, ...],   changed agents/fields only
+#    "removed": ["3"]}
+# Response:
+#   {"session": "unity", "seq": 42, "full": false, "resync": false,
+#    "decisions": [{"id": "0", "decision": ..., "target": ...}, ...]}   changed decisions only
+#
+# A full request replaces the whole session state and every response to it
+# is full too. A delta is only applied on top of seq - 1; anything else gets
+# {"resync": true} and the client must send a full snapshot. The server also
+# answers with a full response every full_every ticks.
+#
+# ack is the seq of the last response the client received. Decisions are
+# diffed against what the client has acknowledged, not against what was
+# last sent, so changes carried by a lost response are sent again.
+
+class DeltaSession:
+    """World state of one client, kept between ticks"""
+
+    def __init__(self, session_id):
+        self.id = session_id
+        self.seq = None
+        self.agents = OrderedDict()
+        self.agent_states = []
+        self.acked = {}  # output -> {agent id -> value} the client acknowledged
+        self.unacked = deque()  # (seq, full, {output -> {agent id -> value}}) sent but not acknowledged
+        self.ticks_since_full = 0
+
+    def reset(self):
+        self.agents.clear()
+        self.agent_states = []
+        self.acked = {}
+        self.unacked.clear()
+
+    def acknowledge(self, ack):
+        """
+        Apply the changes of the responses up to ack; later ones were lost
+        (the client answers each response before sending the next request)
+        """
+        while self.unacked and self.unacked[0][0] <= ack:
+            _, full, changes = self.unacked.popleft()
+            for name, values in changes.items():
+                if full:
+                    self.acked[name] = dict(values)
+                else:
+                    self.acked.setdefault(name, {}).update(values)
+        self.unacked.clear()
+
+    def apply(self, entries, removed):
+        """Merge changed fields into the stored states; returns the agentStates list"""
+        changed_membership = False
+        for agent_id in removed:
+            if self.agents.pop(str(agent_id), None) is not None:
+                changed_membership = True
+                for outputs in self.acked.values():
+                    outputs.pop(str(agent_id), None)
+        for entry in entries:
+            agent_id = str(entry['id'])
+            state = self.agents.get(agent_id)
+            if state is None:
+                self.agents[agent_id] = dict(entry.get('state') or {})
+                changed_membership = True
+            else:
+                state.update(entry.get('state') or {})
+        if changed_membership:
+            # Entries share the state dicts, so field updates alone need no rebuild
+            self.agent_states = [{'id': agent_id, 'state': state} for agent_id, state in self.agents.items()]
+        return self.agent_states
+
+    def diff(self, name, values, full, sent):
+        """
+        Per-agent values with their id; unless full, only the ones that differ
+        from what the client acknowledged. sent collects them until the ack
+        """
+        acked = self.acked.get(name, {})
+        changed = []
+        sent_values = sent[name] = {}
+        for agent_id, value in values:
+            if full or acked.get(agent_id) != value:
+                changed.append(dict(value, id=agent_id) if isinstance(value, dict) else {'id': agent_id, 'value': value})
+                sent_values[agent_id] = value
+        return changed
+
+class DeltaSessions:
+    """
+    Serves the delta protocol on top of a full-state decide function.
+
+    decide(agent_states, now) receives the usual world_state['agentStates']
+    list (rebuilt from the stored session state) and returns a dict of
+    outputs. Outputs named in per_agent are lists aligned with agent_states,
+    or dicts keyed by agent id, and are sent as deltas; every other output is
+    returned as is.
+    """
+
+    def __init__(self, decide, per_agent=('decisions',), full_every=50, max_sessions=8):
+        self.decide = decide
+        self.per_agent = per_agent
+        self.full_every = full_every
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+        # Stats
+        self.ticks = 0
+        self.full_ticks = 0
+        self.resyncs = 0
+
+    def _session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = DeltaSession(session_id)
+            while len(self.sessions) > self.max_sessions:
+                evicted, _ = self.sessions.popitem(last=False)
+                logger.info(f"Dropped delta session {evicted}")
+        self.sessions.move_to_end(session_id)
+        return session
+
+    def handle(self, payload, now):
+        session_id = str(payload.get('session', 'default'))
+        seq = int(payload['seq'])
+        # Clients without ack are assumed to have received the previous response
+        ack = int(payload.get('ack', seq - 1))
+        full = bool(payload.get('full', False))
+
+        with self.lock:
+            session = self._session(session_id)
+            if not full and (session.seq is None or seq != session.seq + 1):
+                self.resyncs += 1
+                logger.warning("Delta session %s out of sync at seq %d (last %s), requesting a full snapshot",
+                               session_id, seq, session.seq)
+                return {'session': session_id, 'seq': session.seq, 'full': False, 'resync': True}
+
+            if full:
+                session.reset()
+            else:
+                session.acknowledge(ack)
+            session.seq = seq
+            agent_states = session.apply(payload.get('agentStates', []), payload.get('removed', []))
+
+            outputs = self.decide(agent_states, now)
+            session.ticks_since_full += 1
+            full = full or session.ticks_since_full >= self.full_every
+            if full:
+                session.ticks_since_full = 0
+                self.full_ticks += 1
+            self.ticks += 1
+
+            response = {'session': session_id, 'seq': seq, 'full': full, 'resync': False}
+            sent = {}
+            for name, value in outputs.items():
+                if name in self.per_agent:
+                    if isinstance(value, dict):
+                        values = value.items()
+                    else:
+                        values = zip((entry['id'] for entry in agent_states), value)
+                    value = session.diff(name, values, full, sent)
+                response[name] = value
+            session.unacked.append((seq, full, sent))
+            return response
+
+    def stats(self):
+        return {
+            'sessions': len(self.sessions),
+            'ticks': self.ticks,
+            'full_ticks': self.full_ticks,
+            'resyncs': self.resyncs
+        }
+
+class DeltaEncoder:
+    """
+    Client side of the protocol: keeps the last acknowledged state and turns
+    a full agentStates list into a delta request (reference for Unity)
+    """
+
+    def __init__(self, session_id='default', full_every=100):
+        self.session_id = session_id
+        self.full_every = full_every
+        self.seq = 0
+        self.acked = None
+        self.acked_seq = 0
+        self.pending = None
+        self.ticks_since_full = 0
+
+    def encode(self, agent_states):
+        self.seq += 1
+        current = {str(entry['id']): entry['state'] for entry in agent_states}
+        full = self.acked is None or self.ticks_since_full >= self.full_every
+        if full:
+            changed = [{'id': agent_id, 'state': state} for agent_id, state in current.items()]
+            removed = []
+            self.ticks_since_full = 0
+        else:
+            changed = []
+            for agent_id, state in current.items():
+                previous = self.acked.get(agent_id)
+                if previous is None:
+                    changed.append({'id': agent_id, 'state': state})
+                    continue
+                fields = {key: value for key, value in state.items() if previous.get(key) != value}
+                if fields:
+                    changed.append({'id': agent_id, 'state': fields})
+            removed = [agent_id for agent_id in self.acked if agent_id not in current]
+        self.ticks_since_full += 1
+        self.pending = current
+        request = {'session': self.session_id, 'seq': self.seq, 'ack': self.acked_seq, 'full': full,
+                   'agentStates': changed}
+        if removed:
+            request['removed'] = removed
+        return request
+
+    def acknowledge(self, response):
+        """Returns False when the server asked for a resync (the next encode is full)"""
+        if response.get('resync'):
+            self.acked = None
+            return False
+        if response.get('seq') == self.seq:
+            self.acked = self.pending
+            self.acked_seq = self.seq
+        return True
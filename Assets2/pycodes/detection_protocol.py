@@ -0,0 +1,106 @@
+import json
+import struct
+import time
+
+# Paquete binario de detecciones (versión 1), un paquete por frame, little-endian:
+#   encabezado: magic 'DP' | version u8 | source u8 | sender_id i32 | frame_seq u32 |
+#               timestamp f64 | count u16
+#   por caja:   track_id i32 | class_id i16 | confidence f32 | x f32 | y f32 | tracking_time f32
+MAGIC = b'DP'
+VERSION = 1
+HEADER = struct.Struct('<2sBBiIdH')
+BOX = struct.Struct('<ihffff')
+
+# El paquete cabe en un datagrama UDP
+MAX_BOXES = (65507 - HEADER.size) // BOX.size
+
+# Origen del paquete
+SOURCE_CAMERA = 0  # Cámaras fijas (StaticCameras -> puerto 5556)
+SOURCE_DRONE = 1  # Cámara del dron (CameraController -> puerto 5557)
+
+PERSON_CLASS = 0
+
+def encode_detections(source, sender_id, detections, frame_seq=0, timestamp=None):
+    """
+    Codifica todas las detecciones de un frame en un solo paquete binario.
+    detections es una lista de dicts con 'position', 'confidence' y
+    opcionalmente 'track_id', 'class_id' y 'tracking_time'.
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    detections = detections[:MAX_BOXES]
+
+    parts = [HEADER.pack(MAGIC, VERSION, source, sender_id, frame_seq & 0xFFFFFFFF,
+                         timestamp, len(detections))]
+    for detection in detections:
+        position = detection['position']
+        parts.append(BOX.pack(
+            int(detection.get('track_id', -1)),
+            int(detection.get('class_id', PERSON_CLASS)),
+            float(detection['confidence']),
+            float(position['x']),
+            float(position['y']),
+            float(detection.get('tracking_time', 0.0))
+        ))
+    return b''.join(parts)
+
+def encode_detections_json(source, sender_id, detections, frame_seq=0, timestamp=None):
+    """Alternativa JSON: un mensaje por frame con la lista de detecciones"""
+    if timestamp is None:
+        timestamp = time.time()
+    return json.dumps({
+        'source': source,
+        'sender_id': sender_id,
+        'frame_seq': frame_seq,
+        'timestamp': timestamp,
+        'detections': detections
+    }).encode()
+
+def _with_legacy_fields(source, sender_id, timestamp, detection):
+    """Completa los campos que traían los mensajes JSON de una sola detección"""
+    detection.setdefault('timestamp', timestamp)
+    if source == SOURCE_CAMERA:
+        detection['camera_id'] = sender_id
+    else:
+        detection['agent_id'] = sender_id
+        if detection.get('class_id', PERSON_CLASS) == PERSON_CLASS:
+            detection['type'] = 'human'
+    return detection
+
+def _box_to_dict(source, sender_id, timestamp, box):
+    track_id, class_id, confidence, x, y, tracking_time = box
+    detection = {
+        'track_id': track_id,
+        'class_id': class_id,
+        'confidence': confidence,
+        'position': {'x': x, 'y': y}
+    }
+    if source == SOURCE_CAMERA:
+        detection['tracking_time'] = tracking_time
+    return _with_legacy_fields(source, sender_id, timestamp, detection)
+
+def decode_detections(data):
+    """
+    Decodifica un datagrama de detecciones a una lista de dicts con el formato
+    de los mensajes JSON anteriores. Acepta el paquete binario, el JSON por
+    frame y el JSON de una sola detección.
+    """
+    if data[:2] == MAGIC:
+        magic, version, source, sender_id, frame_seq, timestamp, count = HEADER.unpack_from(data)
+        if version != VERSION:
+            raise ValueError(f"Unsupported detection packet version: {version}")
+        expected = HEADER.size + count * BOX.size
+        if len(data) < expected:
+            raise ValueError(f"Truncated detection packet: {len(data)} < {expected} bytes")
+        return [
+            _box_to_dict(source, sender_id, timestamp, box)
+            for box in BOX.iter_unpack(data[HEADER.size:expected])
+        ]
+
+    message = json.loads(data.decode())
+    if isinstance(message, dict) and 'detections' in message:
+        return [
+            _with_legacy_fields(message['source'], message['sender_id'], message['timestamp'], detection)
+            for detection in message['detections']
+        ]
+    return [message]
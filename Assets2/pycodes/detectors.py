@@ -0,0 +1,253 @@
+import abc
+import argparse
+import glob
+import os
+import time
+import logging
+import cv2
+import numpy as np
+import torch
+from ultralytics import YOLO
+from ultralytics.engine.results import Results
+from model_store import ModelStore
+
+logger = logging.getLogger(__name__)
+
+# torch: pesos .pt de ultralytics; onnx/openvino: modelo exportado corriendo en CPU;
+# *-int8: variante cuantizada; torch-hub: YOLOv5 original vía torch.hub.
+# onnx* necesita onnx y onnxruntime, openvino* openvino, openvino-dev y nncf
+# (pip install -r requirements-export.txt)
+BACKENDS = ('torch', 'onnx', 'onnx-int8', 'openvino', 'openvino-int8', 'torch-hub')
+
+# Con VISION_OFFLINE=1 los modelos solo se cargan del almacén local (nunca se descargan)
+OFFLINE = os.environ.get('VISION_OFFLINE', '0') == '1'
+
+def default_device():
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
+
+class Detector(abc.ABC):
+    """
+    Interfaz común de los detectores: predict(frames, classes, conf) regresa
+    una lista de ultralytics Results (con .boxes y .plot()) en el orden de los
+    frames, sin importar el backend.
+    """
+
+    backend = None
+    names = {}
+    imgsz = 640
+    load_time = 0.0
+
+    @abc.abstractmethod
+    def predict(self, frames, classes=None, conf=0.25):
+        """Detecciones de un batch de frames BGR, una por frame"""
+
+    def warmup(self, batch_size=1, shape=None, runs=2):
+        """
+        Inferencias con un batch de frames negros para que la inicialización
+        perezosa (kernels CUDA, sesión ONNX, compilación OpenVINO) no caiga en
+        el primer frame real; regresa los segundos que tomó
+        """
+        height, width = shape or (self.imgsz, self.imgsz)
+        frames = [np.zeros((height, width, 3), dtype=np.uint8) for _ in range(max(1, batch_size))]
+        start = time.perf_counter()
+        for _ in range(runs):
+            self.predict(frames)
+        elapsed = time.perf_counter() - start
+        logger.info(f"Warm-up of {self.backend} with batch {len(frames)}x{height}x{width} took {elapsed:.2f}s")
+        return elapsed
+
+class UltralyticsDetector(Detector):
+    """YOLOv8 de ultralytics con pesos .pt o un modelo exportado (ONNX, OpenVINO)"""
+
+    def __init__(self, weights, backend='torch', device=None, imgsz=640):
+        self.backend = backend
+        self.weights = weights
+        self.imgsz = imgsz
+        # Los modelos exportados se usan en CPU; los .pt en GPU si hay
+        self.device = device or (default_device() if backend == 'torch' else 'cpu')
+        self.model = YOLO(weights, task='detect')
+        if backend == 'torch':
+            self.model.to(self.device)
+        self.names = self.model.names
+
+    def predict(self, frames, classes=None, conf=0.25):
+        return self.model.predict(frames, classes=classes, conf=conf, imgsz=self.imgsz,
+                                  device=self.device, verbose=False)
+
+class TorchHubDetector(Detector):
+    """
+    YOLOv5 cargado con torch.hub; sus detecciones se envuelven en Results.
+    Con weights y un repo local se carga con source='local', sin red
+    """
+
+    def __init__(self, model_name='yolov5s', repo='ultralytics/yolov5', device=None, weights=None):
+        self.backend = 'torch-hub'
+        self.model_name = model_name
+        self.weights = weights
+        self.device = device or default_device()
+        if os.path.isdir(repo):
+            if weights is not None:
+                self.model = torch.hub.load(repo, 'custom', path=weights, source='local')
+            else:
+                self.model = torch.hub.load(repo, model_name, source='local')
+        else:
+            self.model = torch.hub.load(repo, model_name)
+        self.model.to(self.device)
+        self.names = self.model.names
+
+    def predict(self, frames, classes=None, conf=0.25):
+        self.model.classes = classes
+        self.model.conf = conf
+        # AutoShape toma los arreglos numpy como RGB; Results conserva el frame BGR para plot()
+        results = self.model([frame[..., ::-1] for frame in frames])
+        return [
+            Results(orig_img=frame, path=None, names=self.names, boxes=detections)
+            for frame, detections in zip(frames, results.xyxy)
+        ]
+
+def resolve_weights(model_name, store=None, offline=OFFLINE):
+    """
+    Ruta de los pesos .pt: la del almacén si están fijados ahí; si no, el
+    nombre tal cual (ultralytics los descarga), salvo en modo offline
+    """
+    store = store or ModelStore()
+    filename = f'{model_name}.pt'
+    if offline or store.has(filename):
+        return store.path(filename)
+    logger.warning(f"{filename} is not pinned in {store.root}; it may be downloaded")
+    return filename
+
+def export_model(model_name, backend, imgsz=640, store=None, offline=OFFLINE):
+    """
+    Exporta (una sola vez) los pesos .pt al formato del backend y regresa la
+    ruta; las exportaciones quedan en el almacén aunque los pesos no vengan de ahí
+    """
+    store = store or ModelStore()
+    weights = resolve_weights(model_name, store, offline)
+    base = store.derived_path(model_name)
+
+    if backend in ('onnx', 'onnx-int8'):
+        onnx_path = f'{base}.onnx'
+        if not os.path.exists(onnx_path):
+            logger.info(f"Exporting {weights} to ONNX")
+            exported = YOLO(weights).export(format='onnx', dynamic=True, imgsz=imgsz)
+            if os.path.abspath(exported) != os.path.abspath(onnx_path):
+                os.replace(exported, onnx_path)
+        if backend == 'onnx':
+            return onnx_path
+
+        int8_path = f'{base}_int8.onnx'
+        if not os.path.exists(int8_path):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            logger.info(f"Quantizing {onnx_path} to int8")
+            quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+        return int8_path
+
+    if backend in ('openvino', 'openvino-int8'):
+        int8 = backend == 'openvino-int8'
+        path = f'{base}{"_int8" if int8 else ""}_openvino_model'
+        if not os.path.exists(path):
+            logger.info(f"Exporting {weights} to OpenVINO (int8={int8})")
+            exported = YOLO(weights).export(format='openvino', int8=int8, imgsz=imgsz)
+            if os.path.abspath(exported) != os.path.abspath(path):
+                os.replace(exported, path)
+        return path
+
+    return weights
+
+def create_detector(model='yolov8n', backend='torch', device=None, imgsz=640, store=None, offline=OFFLINE):
+    """Crea el detector del backend indicado (ver BACKENDS) a partir del almacén local"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown detector backend '{backend}', expected one of {BACKENDS}")
+
+    start = time.perf_counter()
+    store = store or ModelStore()
+    if backend == 'torch-hub':
+        # Repo de YOLOv5 y pesos desde el almacén; sin ellos se resuelve en GitHub
+        repo = store.path('yolov5') if offline or store.has('yolov5') else 'ultralytics/yolov5'
+        weights = resolve_weights(model, store, offline) if offline or store.has(f'{model}.pt') else None
+        detector = TorchHubDetector(model, repo=repo, device=device, weights=weights)
+    else:
+        detector = UltralyticsDetector(export_model(model, backend, imgsz, store, offline), backend=backend,
+                                       device=device, imgsz=imgsz)
+    detector.load_time = time.perf_counter() - start
+    logger.info(f"Loaded {model} with backend {backend} on {detector.device} "
+                f"in {detector.load_time:.2f}s")
+    return detector
+
+def load_frames(source, limit=200):
+    """Frames BGR de un directorio de imágenes o de una grabación de udp_replay"""
+    if os.path.isdir(source):
+        paths = sorted(p for ext in ('*.jpg', '*.jpeg', '*.png') for p in glob.glob(os.path.join(source, ext)))
+        frames = [cv2.imread(path) for path in paths[:limit]]
+        return [frame for frame in frames if frame is not None]
+
+    from udp_replay import read_recording
+    from frame_transport import FrameReassembler
+    reassemblers = {}
+    frames = []
+    for timestamp, port, datagram in read_recording(source):
+        reassembler = reassemblers.setdefault(port, FrameReassembler())
+        packet = reassembler.add(datagram, now=timestamp)
+        if packet is None:
+            continue
+        frame = cv2.imdecode(np.frombuffer(packet.payload, np.uint8), cv2.IMREAD_COLOR)
+        if frame is not None:
+            frames.append(frame)
+            if len(frames) >= limit:
+                break
+    return frames
+
+def benchmark(detector, frames, batch_size=4, classes=None, conf=0.25, warmup=2):
+    """Latencia por batch, frames por segundo y detecciones promedio de un detector"""
+    batches = [frames[i:i + batch_size] for i in range(0, len(frames), batch_size)]
+    for batch in batches[:warmup]:
+        detector.predict(batch, classes=classes, conf=conf)
+
+    times, detections = [], 0
+    for batch in batches:
+        start = time.perf_counter()
+        results = detector.predict(batch, classes=classes, conf=conf)
+        times.append(time.perf_counter() - start)
+        detections += sum(len(result.boxes) for result in results)
+
+    times_ms = np.array(times) * 1000.0
+    return {
+        'backend': detector.backend,
+        'batches': len(batches),
+        'batch_p50_ms': float(np.percentile(times_ms, 50)),
+        'batch_p95_ms': float(np.percentile(times_ms, 95)),
+        'fps': len(frames) / max(sum(times), 1e-9),
+        'detections_per_frame': detections / max(len(frames), 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare detector backends on recorded frames")
+    parser.add_argument('source', help="Image directory or udp_replay recording")
+    parser.add_argument('--model', default='yolov8n')
+    parser.add_argument('--backends', nargs='+', default=['torch', 'onnx', 'onnx-int8'], choices=BACKENDS)
+    parser.add_argument('--batch-size', type=int, default=4)
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--limit', type=int, default=200)
+    parser.add_argument('--person-only', action='store_true')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    frames = load_frames(args.source, limit=args.limit)
+    if not frames:
+        raise SystemExit(f"No frames found in {args.source}")
+    logger.info(f"Benchmarking {len(frames)} frames")
+
+    classes = [0] if args.person_only else None
+    for backend in args.backends:
+        try:
+            detector = create_detector(args.model, backend=backend, imgsz=args.imgsz)
+        except Exception as e:
+            logger.error(f"Backend {backend} unavailable: {e}")
+            continue
+        report = benchmark(detector, frames, batch_size=args.batch_size, classes=classes)
+        print(f"{backend:14s} p50 {report['batch_p50_ms']:8.1f} ms  p95 {report['batch_p95_ms']:8.1f} ms  "
+              f"{report['fps']:7.1f} fps  {report['detections_per_frame']:.2f} det/frame")
+
+if __name__ == "__main__":
+    main()
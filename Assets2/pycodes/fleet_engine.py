@@ -0,0 +1,348 @@
+import logging
+import time
+from collections import Counter
+import numpy as np
+from agent_state import AgentStateStore
+
+logger = logging.getLogger(__name__)
+
+DECISIONS = ('takeoff', 'land', 'do_nothing_aterrizing', 'move_to_target_human', 'move_to_target', 'explore',
+             'continue')
+TAKEOFF, LAND, LANDED, WAIT_HUMAN, MOVE_TO_TARGET, EXPLORE, CONTINUE = range(len(DECISIONS))
+WITH_TARGET = (WAIT_HUMAN, MOVE_TO_TARGET)
+
+def to_vector(point):
+    return (point.get('x', 0.0), point.get('y', 0.0), point.get('z', 0.0))
+
+def to_point(vector):
+    return {'x': vector[0], 'y': vector[1], 'z': vector[2]}
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def detection_error(detection):
+    """Why a detection from the network cannot be applied (wrong field types), or None"""
+    if not isinstance(detection, dict):
+        return "not an object"
+    if 'confidence' in detection and not is_number(detection['confidence']):
+        return "confidence is not a number"
+    camera_id = detection.get('camera_id')
+    if camera_id is not None and (not isinstance(camera_id, int) or isinstance(camera_id, bool)):
+        return "camera_id is not an integer"
+    position = detection.get('position')
+    if position is not None and not (isinstance(position, dict)
+                                     and all(is_number(position.get(axis, 0.0)) for axis in 'xyz')):
+        return "position is not an {x, y, z} object"
+    return None
+
+def positions_array(states):
+    """(n, 3) array from a list of agent state dicts with a 'position'"""
+    return np.array([to_vector(state['position']) for state in states], dtype=np.float64).reshape(-1, 3)
+
+class ArrayState:
+    """Fleet state as one NumPy array per field; copy() gives an independent state"""
+
+    FIELDS = ()
+
+    def copy(self):
+        state = object.__new__(type(self))
+        for field in self.FIELDS:
+            setattr(state, field, getattr(self, field).copy())
+        return state
+
+    def __len__(self):
+        return len(getattr(self, self.FIELDS[0]))
+
+class DroneFleetState(ArrayState):
+    FIELDS = ('position', 'target', 'has_target', 'last_target_time', 'last_detection_time', 'waiting_human',
+              'last_human_time', 'exploring', 'last_explore_time', 'starting', 'landing_commanded',
+              'landing_executed')
+
+    def __init__(self, num_drones, starting=True):
+        self.position = np.zeros((num_drones, 3))
+        self.target = np.zeros((num_drones, 3))
+        self.has_target = np.zeros(num_drones, dtype=bool)
+        self.last_target_time = np.zeros(num_drones)
+        self.last_detection_time = np.zeros(num_drones)
+        self.waiting_human = np.zeros(num_drones, dtype=bool)
+        self.last_human_time = np.zeros(num_drones)
+        self.exploring = np.zeros(num_drones, dtype=bool)
+        self.last_explore_time = np.zeros(num_drones)
+        self.starting = np.full(num_drones, starting, dtype=bool)
+        self.landing_commanded = np.zeros(num_drones, dtype=bool)
+        self.landing_executed = np.zeros(num_drones, dtype=bool)
+
+class DroneFleet:
+    """
+    Decision engine for a whole drone fleet.
+
+    Positions, timers and targets of every drone live in NumPy arrays and a
+    decision request is a single vectorized pass: takeoff, landing, waiting
+    after a human detection, following a recent target and exploring, in
+    that priority order. Detections and landing commands are queued in an
+    AgentStateStore and applied at decision time, one array operation per
+    detection for all drones.
+
+    With replace_target (controller3) every detection replaces the target:
+    a camera_id from either source names a fixed camera (an unknown one drops
+    the detection) and a detection with neither camera_id nor position clears
+    the target. Otherwise (controller4) only fixed camera detections resolve
+    camera_id and a detection without a target keeps the current one.
+    """
+
+    def __init__(self, num_drones, camera_positions, target_confidence=0.8, takeoff_and_landing=True,
+                 target_timeout=10.0, human_detection_timeout=5.0, explore_cooldown=10.0, detection_cooldown=3.0,
+                 replace_target=False):
+        self.camera_positions = {camera_id: to_vector(position) for camera_id, position in camera_positions.items()}
+        self.target_confidence = target_confidence
+        self.target_timeout = target_timeout
+        self.human_detection_timeout = human_detection_timeout
+        self.explore_cooldown = explore_cooldown
+        self.detection_cooldown = detection_cooldown
+        self.replace_target = replace_target
+        self.store = AgentStateStore(states=DroneFleetState(num_drones, starting=takeoff_and_landing))
+
+    def __len__(self):
+        return len(self.store.snapshot().states)
+
+    def post_detection(self, source, detection, current_time):
+        self.store.post(('detection', source, detection, current_time))
+
+    def post_land(self):
+        self.store.post(('land',))
+
+    def _apply_event(self, state, event):
+        if event[0] == 'land':
+            state.landing_commanded[:] = True
+        else:
+            self._apply_detection(state, *event[1:])
+
+    def _apply_detection(self, state, source, detection, current_time):
+        error = detection_error(detection)
+        if error:
+            logger.debug("Skipped detection %r: %s", detection, error)
+            return
+        if detection.get('confidence', 0) <= self.target_confidence:
+            return
+        eligible = current_time - state.last_detection_time >= self.detection_cooldown
+        if not eligible.any():
+            return
+
+        target = None
+        if self.replace_target:
+            if 'camera_id' in detection:
+                target = self.camera_positions.get(detection['camera_id'])
+                if target is None:
+                    return
+            elif detection.get('position'):
+                target = to_vector(detection['position'])
+            state.has_target[eligible] = target is not None
+        elif 'camera_id' in detection and source == 'camera':
+            target = self.camera_positions.get(detection['camera_id'])
+        elif 'position' in detection:
+            target = to_vector(detection['position'])
+        if target is not None:
+            state.target[eligible] = target
+            state.has_target[eligible] = True
+        state.last_target_time[eligible] = current_time
+        state.last_detection_time[eligible] = current_time
+        state.exploring[eligible] = False
+
+        if detection.get('type') == 'human':
+            state.waiting_human[eligible] = True
+            state.last_human_time[eligible] = current_time
+
+    def _decide(self, state, count, current_time):
+        """Decision code and target row for the first count drones; updates state in place"""
+        codes = np.full(len(state), CONTINUE, dtype=np.int8)
+        targets = np.zeros((len(state), 3))
+        undecided = np.arange(len(state)) < count
+
+        def assign(mask, code, target=None):
+            codes[mask] = code
+            if target is not None:
+                targets[mask] = target[mask]
+            undecided[mask] = False
+
+        mask = undecided & state.starting
+        state.starting[mask] = False
+        assign(mask, TAKEOFF)
+
+        mask = undecided & state.landing_commanded
+        state.landing_executed[mask] = True
+        state.landing_commanded[mask] = False
+        assign(mask, LAND)
+
+        assign(undecided & state.landing_executed, LANDED)
+
+        timed_out = undecided & state.waiting_human & (current_time - state.last_human_time >= self.human_detection_timeout)
+        state.waiting_human[timed_out] = False
+        assign(undecided & state.waiting_human, WAIT_HUMAN, state.position)
+
+        mask = undecided & state.has_target & (current_time - state.last_target_time < self.target_timeout)
+        state.exploring[mask] = False
+        assign(mask, MOVE_TO_TARGET, state.target)
+
+        state.has_target[undecided] = False
+        mask = undecided & (~state.exploring | (current_time - state.last_explore_time >= self.explore_cooldown))
+        state.exploring[mask] = True
+        state.last_explore_time[mask] = current_time
+        assign(mask, EXPLORE)
+
+        return codes[:count], targets[:count]
+
+    def get_decisions(self, agent_states, current_time):
+        """Decisions for the first len(fleet) entries of world_state['agentStates'], in order"""
+        # Parsed before the store is touched, so a malformed request loses no queued events
+        positions = positions_array([entry['state'] for entry in agent_states[:len(self)]])
+
+        def decide(state):
+            count = min(len(positions), len(state))
+            state.position[:count] = positions[:count]
+            codes, targets = self._decide(state, count, current_time)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Decisions: %s", dict(Counter(DECISIONS[code] for code in codes.tolist())))
+            return state, [
+                {"decision": DECISIONS[code], "target": to_point(target) if code in WITH_TARGET else None}
+                for code, target in zip(codes.tolist(), targets.tolist())
+            ]
+
+        return self.store.update(self._apply_event, decide)
+
+class InvestigationFleetState(ArrayState):
+    FIELDS = ('investigating', 'investigation_complete', 'has_person', 'target', 'last_detection_time',
+              'last_position', 'has_last_position', 'last_movement_time', 'total_distance')
+
+    def __init__(self, num_robots):
+        self.investigating = np.zeros(num_robots, dtype=bool)
+        self.investigation_complete = np.zeros(num_robots, dtype=bool)
+        self.has_person = np.zeros(num_robots, dtype=bool)
+        self.target = np.zeros((num_robots, 3))
+        self.last_detection_time = np.full(num_robots, np.nan)
+        self.last_position = np.zeros((num_robots, 3))
+        self.has_last_position = np.zeros(num_robots, dtype=bool)
+        self.last_movement_time = np.full(num_robots, np.nan)
+        self.total_distance = np.zeros(num_robots)
+
+class InvestigationFleet:
+    """
+    Vectorized engine for the investigation robots (Controller2): a camera
+    detection sends every idle robot to that camera until it gets within
+    arrival_distance, and the distance each robot travels is accumulated.
+    Robots are matched to world_state['agentStates'] by id (their index).
+    """
+
+    def __init__(self, num_robots, camera_positions, detection_cooldown=5.0, arrival_distance=2.0,
+                 min_movement=1.0, metrics_interval=0.1):
+        self.camera_positions = [to_vector(position) for position in camera_positions]
+        self.detection_cooldown = detection_cooldown
+        self.arrival_distance = arrival_distance
+        self.min_movement = min_movement
+        self.metrics_interval = metrics_interval
+        self.store = AgentStateStore(states=InvestigationFleetState(num_robots))
+
+    def post_detection(self, detection, current_time):
+        self.store.post(('detection', detection, current_time))
+
+    def _apply_event(self, state, event):
+        _, detection, current_time = event
+        error = detection_error(detection)
+        if error:
+            logger.debug("Skipped detection %r: %s", detection, error)
+            return
+        camera_id = detection.get('camera_id')
+        if camera_id is None or not 0 <= camera_id < len(self.camera_positions):
+            return
+        cooled_down = np.isnan(state.last_detection_time) | (
+            current_time - state.last_detection_time >= self.detection_cooldown)
+        eligible = cooled_down & (~state.investigating | state.investigation_complete)
+        if not eligible.any():
+            return
+        logger.info("Starting new investigation for camera %s (%d robots)", camera_id, eligible.sum())
+        state.target[eligible] = self.camera_positions[camera_id]
+        state.has_person[eligible] = True
+        state.investigating[eligible] = True
+        state.investigation_complete[eligible] = False
+        state.last_detection_time[eligible] = current_time
+
+    def _distance(self, a, b):
+        """Euclidean distance per row; moves under min_movement count as 0"""
+        distance = np.linalg.norm(a - b, axis=1)
+        return np.where(distance >= self.min_movement, distance, 0.0)
+
+    def _parse(self, agent_states, now):
+        """Index by id, positions and times of every entry; raises on a malformed entry"""
+        entries = [entry['state'] for entry in agent_states]
+        index = {str(entry['id']): i for i, entry in enumerate(agent_states)}
+        positions = positions_array(entries)
+        times = np.array([entry.get('time', now) for entry in entries], dtype=np.float64)
+        return index, positions, times
+
+    def _update_metrics(self, state, rows, positions, times):
+        known = state.has_last_position[rows] & ~np.isnan(state.last_movement_time[rows])
+        moved = known & (times - state.last_movement_time[rows] >= self.metrics_interval)
+        distance = self._distance(positions, state.last_position[rows])
+        state.total_distance[rows[moved]] += distance[moved]
+        state.last_movement_time[rows[moved | ~known]] = times[moved | ~known]
+        state.last_position[rows] = positions
+        state.has_last_position[rows] = True
+
+    def _observe(self, state, parsed):
+        """Indices of the robots present in the request and their positions"""
+        index, positions, times = parsed
+        rows = [row for row in range(len(state)) if str(row) in index]
+        picks = [index[str(row)] for row in rows]
+        rows = np.array(rows, dtype=np.int64)
+        positions = positions[picks].reshape(-1, 3)
+        self._update_metrics(state, rows, positions, times[picks])
+        return rows, positions
+
+    def _decide(self, state, rows, positions):
+        active = state.investigating[rows] & state.has_person[rows]
+        arrived = active & (self._distance(positions, state.target[rows]) < self.arrival_distance)
+        if arrived.any():
+            logger.info("Investigation complete for %d robots, resuming exploration", arrived.sum())
+            state.investigating[rows[arrived]] = False
+            state.investigation_complete[rows[arrived]] = True
+            state.has_person[rows[arrived]] = False
+
+        moving = active & ~arrived
+        targets = state.target[rows].tolist()
+        return [
+            {"decision": "move_to_target", "target": to_point(target)} if move else {"decision": "explore"}
+            for move, target in zip(moving.tolist(), targets)
+        ]
+
+    def _metrics(self, state, rows):
+        return [
+            {'agent_id': row, 'total_distance': round(distance, 2)}
+            for row, distance in zip(rows.tolist(), state.total_distance[rows].tolist())
+        ]
+
+    def get_decisions(self, agent_states, now=None):
+        parsed = self._parse(agent_states, time.time() if now is None else now)
+
+        def decide(state):
+            rows, positions = self._observe(state, parsed)
+            return state, self._decide(state, rows, positions)
+
+        return self.store.update(self._apply_event, decide)
+
+    def get_metrics(self, agent_states, now=None):
+        parsed = self._parse(agent_states, time.time() if now is None else now)
+
+        def measure(state):
+            rows, _ = self._observe(state, parsed)
+            return state, self._metrics(state, rows)
+
+        return self.store.update(self._apply_event, measure)
+
+    def step(self, agent_states, now=None):
+        """Decisions and metrics from a single pass over agent_states, both in robot order"""
+        parsed = self._parse(agent_states, time.time() if now is None else now)
+
+        def decide(state):
+            rows, positions = self._observe(state, parsed)
+            return state, (self._decide(state, rows, positions), self._metrics(state, rows))
+
+        return self.store.update(self._apply_event, decide)
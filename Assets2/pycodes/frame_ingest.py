@@ -0,0 +1,178 @@
+import socket
+import threading
+import time
+import logging
+from frame_transport import FrameReassembler
+
+logger = logging.getLogger(__name__)
+
+class LatestFrameSlot:
+    """
+    Slot acotado de un solo elemento: el dato más nuevo reemplaza al anterior.
+    El consumidor siempre toma el frame más fresco disponible.
+    """
+
+    def __init__(self):
+        self.item = None
+        self.condition = threading.Condition()
+
+    def put(self, item):
+        """Guarda el elemento; regresa True si se descartó uno sin procesar"""
+        with self.condition:
+            replaced = self.item is not None
+            self.item = item
+            self.condition.notify()
+            return replaced
+
+    def take(self, timeout=None):
+        with self.condition:
+            if self.item is None:
+                self.condition.wait(timeout=timeout)
+            item = self.item
+            self.item = None
+            return item
+
+    def wake(self):
+        with self.condition:
+            self.condition.notify_all()
+
+class StreamCounters:
+    def __init__(self):
+        self.received = 0
+        self.dropped = 0
+        self.processed = 0
+        self.last_received_time = 0.0
+
+    def as_dict(self):
+        return {
+            'received': self.received,
+            'dropped': self.dropped,
+            'processed': self.processed,
+            'last_received_time': self.last_received_time
+        }
+
+class FrameIngest:
+    """
+    Pipeline de recepción dividido: un hilo receptor ligero por puerto que solo
+    lee datagramas, reensambla los frames fragmentados y deja el frame completo
+    en un slot, y un hilo de trabajo por stream que procesa siempre el frame
+    más reciente (latest-frame-wins).
+
+    handler(stream_id, frame, received_time) recibe un AssembledFrame con el
+    JPEG completo y hace la decodificación y el procesamiento.
+    """
+
+    def __init__(self, ports, handler, rcvbuf=1 << 20, reassembly_timeout=0.5, name="FrameIngest"):
+        # ports: {stream_id: puerto UDP}
+        # rcvbuf debe alcanzar para los trozos de al menos un frame completo
+        self.ports = dict(ports)
+        self.handler = handler
+        self.rcvbuf = rcvbuf
+        self.name = name
+        self.running = False
+
+        self.slots = {stream_id: LatestFrameSlot() for stream_id in self.ports}
+        self.counters = {stream_id: StreamCounters() for stream_id in self.ports}
+        self.reassemblers = {
+            stream_id: FrameReassembler(camera_id=stream_id, timeout=reassembly_timeout)
+            for stream_id in self.ports
+        }
+        # Última dirección desde la que llegaron frames por stream (para el control de tasa)
+        self.senders = {}
+        self.threads = []
+
+    def _open_socket(self, stream_id, port):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+            sock.bind(('0.0.0.0', port))
+            sock.settimeout(1.0)
+        except Exception as e:
+            logger.error(f"Error setting up socket for stream {stream_id} on port {port}: {e}")
+            sock.close()
+            return None
+        return sock
+
+    def _receive_loop(self, stream_id, port):
+        sock = self._open_socket(stream_id, port)
+        if sock is None:
+            return
+
+        slot = self.slots[stream_id]
+        counters = self.counters[stream_id]
+        reassembler = self.reassemblers[stream_id]
+        try:
+            while self.running:
+                try:
+                    data, address = sock.recvfrom(65535)
+                except socket.timeout:
+                    continue
+                except OSError as e:
+                    if self.running:
+                        logger.error("Error in reception for stream %s: %s", stream_id, e)
+                    continue
+
+                received_time = time.time()
+                try:
+                    frame = reassembler.add(data, received_time)
+                except ValueError as e:
+                    logger.warning("Invalid datagram for stream %s: %s", stream_id, e)
+                    continue
+                if frame is None:
+                    continue
+
+                counters.received += 1
+                counters.last_received_time = received_time
+                self.senders[stream_id] = address
+                if slot.put((frame, received_time)):
+                    counters.dropped += 1
+        finally:
+            sock.close()
+
+    def _process_loop(self, stream_id):
+        slot = self.slots[stream_id]
+        counters = self.counters[stream_id]
+        while self.running:
+            item = slot.take(timeout=0.5)
+            if item is None:
+                continue
+            frame, received_time = item
+            try:
+                self.handler(stream_id, frame, received_time)
+                counters.processed += 1
+            except Exception as e:
+                logger.error("Error processing stream %s: %s", stream_id, e)
+
+    def start(self):
+        self.running = True
+        for stream_id, port in self.ports.items():
+            logger.info(f"Starting reception on port {port} for stream {stream_id}")
+            for target, role in ((self._receive_loop, "Receiver"), (self._process_loop, "Worker")):
+                args = (stream_id, port) if role == "Receiver" else (stream_id,)
+                thread = threading.Thread(
+                    target=target,
+                    args=args,
+                    name=f"{self.name}-{role}-{stream_id}"
+                )
+                thread.daemon = True
+                thread.start()
+                self.threads.append(thread)
+
+    def stop(self):
+        self.running = False
+        for slot in self.slots.values():
+            slot.wake()
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=2.0)
+        self.threads = []
+
+    def sender_address(self, stream_id):
+        return self.senders.get(stream_id)
+
+    def stats(self):
+        stats = {}
+        for stream_id, counters in self.counters.items():
+            stats[stream_id] = counters.as_dict()
+            stats[stream_id]['transport'] = self.reassemblers[stream_id].stats()
+        return stats
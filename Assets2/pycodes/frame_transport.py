@@ -0,0 +1,213 @@
+import struct
+import time
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Formato de transporte de frames (versión 1), little-endian:
+#   magic 'VF' | version u8 | flags u8 | camera_id i32 | frame_seq u32 |
+#   chunk_index u16 | chunk_count u16 | timestamp f64 | payload (trozo del JPEG)
+# Debe coincidir con Codes/FramePacketizer.cs
+MAGIC = b'VF'
+VERSION = 1
+HEADER = struct.Struct('<2sBBiIHHd')
+MAX_CHUNK_PAYLOAD = 60000
+
+# Formato anterior: int32 con el id de cámara + JPEG completo en un datagrama
+LEGACY_HEADER = struct.Struct('i')
+
+ChunkHeader = namedtuple('ChunkHeader', 'version flags camera_id seq chunk_index chunk_count timestamp')
+AssembledFrame = namedtuple('AssembledFrame', 'camera_id seq timestamp payload')
+
+def encode_frame(camera_id, seq, payload, timestamp=None, chunk_size=MAX_CHUNK_PAYLOAD):
+    """Divide un frame codificado en datagramas con el encabezado versionado"""
+    if timestamp is None:
+        timestamp = time.time()
+    chunk_count = max(1, (len(payload) + chunk_size - 1) // chunk_size)
+    if chunk_count > 0xFFFF:
+        raise ValueError(f"Frame too large: {len(payload)} bytes")
+
+    seq &= 0xFFFFFFFF
+    datagrams = []
+    for index in range(chunk_count):
+        chunk = payload[index * chunk_size:(index + 1) * chunk_size]
+        header = HEADER.pack(MAGIC, VERSION, 0, camera_id, seq, index, chunk_count, timestamp)
+        datagrams.append(header + chunk)
+    return datagrams
+
+def parse_datagram(data):
+    """
+    Regresa (ChunkHeader, payload). Los datagramas del formato anterior se
+    regresan como un único trozo sin número de secuencia.
+    """
+    if len(data) >= HEADER.size and data[:2] == MAGIC:
+        magic, version, flags, camera_id, seq, index, count, timestamp = HEADER.unpack_from(data)
+        if version != VERSION:
+            raise ValueError(f"Unsupported frame transport version: {version}")
+        if count == 0 or index >= count:
+            raise ValueError(f"Invalid chunk {index}/{count}")
+        return ChunkHeader(version, flags, camera_id, seq, index, count, timestamp), data[HEADER.size:]
+
+    if len(data) < LEGACY_HEADER.size:
+        raise ValueError(f"Datagram too short: {len(data)} bytes")
+    camera_id = LEGACY_HEADER.unpack_from(data)[0]
+    return ChunkHeader(0, 0, camera_id, None, 0, 1, None), data[LEGACY_HEADER.size:]
+
+def restamp_datagram(data, timestamp=None, seq_offset=0):
+    """
+    Copia del datagrama con otro timestamp (None lo conserva) y la secuencia
+    desplazada seq_offset frames; el formato anterior no lleva ninguno
+    """
+    if len(data) < HEADER.size or data[:2] != MAGIC:
+        return data
+    fields = list(HEADER.unpack_from(data))
+    if timestamp is not None:
+        fields[-1] = timestamp
+    fields[4] = (fields[4] + seq_offset) & 0xFFFFFFFF
+    return HEADER.pack(*fields) + data[HEADER.size:]
+
+class _PendingFrame:
+    __slots__ = ('chunks', 'chunk_count', 'received', 'timestamp', 'first_seen')
+
+    def __init__(self, chunk_count, timestamp, now):
+        self.chunks = [None] * chunk_count
+        self.chunk_count = chunk_count
+        self.received = 0
+        self.timestamp = timestamp
+        self.first_seen = now
+
+def _seq_newer(a, b):
+    """True si la secuencia a es posterior a b (tolera el desborde de u32)"""
+    return 0 < ((a - b) & 0xFFFFFFFF) < 0x80000000
+
+class FrameReassembler:
+    """
+    Reensambla los frames de una cámara a partir de sus trozos.
+    Tolera pérdida y desorden; los frames incompletos expiran después de
+    timeout segundos o cuando llega un frame más nuevo completo.
+
+    Si el emisor se reinicia su secuencia vuelve a 0: un salto hacia atrás
+    de más de reset_gap frames, o reset_after frames atrasados seguidos, se
+    toman como un emisor nuevo y se olvida la secuencia anterior.
+    """
+
+    def __init__(self, camera_id=None, timeout=0.5, max_pending=8, reset_gap=64, reset_after=8):
+        self.camera_id = camera_id
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.reset_gap = reset_gap
+        self.reset_after = reset_after
+        self.pending = {}
+        self.last_completed_seq = None
+        self.late_frames_in_row = 0
+
+        # Estadísticas
+        self.chunks_received = 0
+        self.foreign_chunks = 0
+        self.duplicate_chunks = 0
+        self.late_chunks = 0
+        self.sender_resets = 0
+        self.frames_completed = 0
+        self.frames_expired = 0
+        self.frames_lost = 0
+        self.legacy_frames = 0
+
+    def add(self, data, now=None):
+        """Agrega un datagrama; regresa un AssembledFrame cuando se completa uno"""
+        if now is None:
+            now = time.time()
+        header, payload = parse_datagram(data)
+        if self.camera_id is not None and header.camera_id != self.camera_id:
+            self.foreign_chunks += 1
+            return None
+        self.chunks_received += 1
+
+        if header.seq is None:
+            self.legacy_frames += 1
+            self.frames_completed += 1
+            return AssembledFrame(header.camera_id, None, now, payload)
+
+        seq = header.seq
+        if self.last_completed_seq is not None and not _seq_newer(seq, self.last_completed_seq):
+            if header.chunk_index == 0:
+                self.late_frames_in_row += 1
+            behind = (self.last_completed_seq - seq) & 0xFFFFFFFF
+            if behind > self.reset_gap or self.late_frames_in_row >= self.reset_after:
+                self._reset_sender(header.camera_id, seq)
+            else:
+                # Trozo de un frame que ya se entregó o se dio por perdido
+                self.late_chunks += 1
+                return None
+        else:
+            self.late_frames_in_row = 0
+
+        self._expire(now)
+
+        pending = self.pending.get(seq)
+        if pending is None:
+            if len(self.pending) >= self.max_pending:
+                self._drop_oldest()
+            pending = _PendingFrame(header.chunk_count, header.timestamp, now)
+            self.pending[seq] = pending
+        elif pending.chunk_count != header.chunk_count:
+            logger.warning(f"Chunk count mismatch for camera {header.camera_id} frame {seq}")
+            return None
+
+        if pending.chunks[header.chunk_index] is not None:
+            self.duplicate_chunks += 1
+            return None
+
+        pending.chunks[header.chunk_index] = bytes(payload)
+        pending.received += 1
+        if pending.received < pending.chunk_count:
+            return None
+
+        return self._complete(header.camera_id, seq, pending)
+
+    def _complete(self, camera_id, seq, pending):
+        del self.pending[seq]
+
+        if self.last_completed_seq is not None:
+            self.frames_lost += ((seq - self.last_completed_seq) & 0xFFFFFFFF) - 1
+        self.last_completed_seq = seq
+        self.frames_completed += 1
+
+        # Los frames incompletos más viejos ya no sirven
+        for stale_seq in [s for s in self.pending if not _seq_newer(s, seq)]:
+            del self.pending[stale_seq]
+            self.frames_expired += 1
+
+        return AssembledFrame(camera_id, seq, pending.timestamp, b''.join(pending.chunks))
+
+    def _reset_sender(self, camera_id, seq):
+        logger.info("Camera %s frame sequence restarted at %d (last %d), resetting reassembly",
+                    camera_id, seq, self.last_completed_seq)
+        self.last_completed_seq = None
+        self.late_frames_in_row = 0
+        self.pending.clear()
+        self.sender_resets += 1
+
+    def _expire(self, now):
+        for seq in [s for s, p in self.pending.items() if now - p.first_seen > self.timeout]:
+            del self.pending[seq]
+            self.frames_expired += 1
+
+    def _drop_oldest(self):
+        oldest = min(self.pending, key=lambda s: self.pending[s].first_seen)
+        del self.pending[oldest]
+        self.frames_expired += 1
+
+    def stats(self):
+        return {
+            'chunks_received': self.chunks_received,
+            'foreign_chunks': self.foreign_chunks,
+            'duplicate_chunks': self.duplicate_chunks,
+            'late_chunks': self.late_chunks,
+            'sender_resets': self.sender_resets,
+            'frames_completed': self.frames_completed,
+            'frames_expired': self.frames_expired,
+            'frames_lost': self.frames_lost,
+            'legacy_frames': self.legacy_frames,
+            'pending': len(self.pending)
+        }
@@ -0,0 +1,147 @@
+import threading
+import time
+import logging
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+class InferenceScheduler:
+    """
+    Planificador central de inferencia: junta el último frame decodificado de
+    cada cámara y los ejecuta como un solo batch en el detector.
+
+    detect_fn recibe una lista de frames y regresa una lista de resultados en el
+    mismo orden. Cada resultado se entrega al callback registrado con el frame.
+    Los frames enviados con infer=False no pasan por el detector: su callback
+    recibe None en el mismo hilo, para que el post-proceso de cada stream siga
+    siendo de un solo hilo. Con inputs (por ejemplo recortes o mosaicos del
+    frame) el detector corre sobre esas imágenes y el callback recibe la lista
+    de sus resultados en el mismo orden.
+    """
+
+    def __init__(self, detect_fn, max_batch_size=8, max_wait_ms=10.0, name="InferenceScheduler"):
+        self.detect_fn = detect_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self.running = False
+
+        # Último frame pendiente por stream (el más nuevo reemplaza al anterior)
+        self.pending = {}
+        self.condition = threading.Condition()
+        self.thread = None
+
+        # Estadísticas
+        self.frames_submitted = 0
+        self.frames_replaced = 0
+        self.batches_run = 0
+        self.frames_inferred = 0
+        self.frames_skipped = 0
+        self.stream_submitted = defaultdict(int)
+        self.stream_replaced = defaultdict(int)
+
+    def submit(self, stream_id, frame, callback, infer=True, inputs=None):
+        """Encola el frame más reciente de un stream; descarta el pendiente si existe"""
+        with self.condition:
+            if stream_id in self.pending:
+                self.frames_replaced += 1
+                self.stream_replaced[stream_id] += 1
+            self.pending[stream_id] = (frame, callback, time.time(), infer, inputs)
+            self.frames_submitted += 1
+            self.stream_submitted[stream_id] += 1
+            self.condition.notify()
+
+    def _collect_batch(self):
+        with self.condition:
+            while self.running and not self.pending:
+                self.condition.wait(timeout=0.5)
+            if not self.running:
+                return []
+
+            # Esperar un poco a que lleguen frames de otras cámaras
+            deadline = time.time() + self.max_wait
+            while self.running and len(self.pending) < self.max_batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self.condition.wait(timeout=remaining)
+
+            # Los streams que llevan más tiempo esperando van primero
+            ordered = sorted(self.pending.items(), key=lambda item: item[1][2])
+            batch = ordered[:self.max_batch_size]
+            for stream_id, _ in batch:
+                del self.pending[stream_id]
+            return batch
+
+    def _run(self):
+        while self.running:
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            # max_batch_size cuenta streams; con inputs un stream aporta varias imágenes
+            frames = []
+            for _, (frame, _, _, infer, inputs) in batch:
+                if infer:
+                    frames.extend(inputs if inputs is not None else [frame])
+            results = []
+            if frames:
+                try:
+                    results = self.detect_fn(frames)
+                except Exception as e:
+                    logger.error("Error in batched inference: %s", e)
+                    continue
+
+                self.batches_run += 1
+                self.frames_inferred += len(frames)
+
+            # Los resultados vienen en el orden de las imágenes inferidas
+            position = 0
+            for stream_id, (frame, callback, _, infer, inputs) in batch:
+                result = None
+                if not infer:
+                    self.frames_skipped += 1
+                elif inputs is None:
+                    result = results[position]
+                    position += 1
+                else:
+                    result = results[position:position + len(inputs)]
+                    position += len(inputs)
+                try:
+                    callback(stream_id, frame, result)
+                except Exception as e:
+                    logger.error("Error handling result for stream %s: %s", stream_id, e)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=self.name)
+        self.thread.daemon = True
+        self.thread.start()
+        logger.info(f"{self.name} started (max_batch_size={self.max_batch_size}, "
+                    f"max_wait_ms={self.max_wait * 1000:.1f})")
+
+    def stop(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+
+    def stream_counters(self, stream_id):
+        """(frames enviados, frames reemplazados antes de inferirse) de un stream"""
+        with self.condition:
+            return self.stream_submitted.get(stream_id, 0), self.stream_replaced.get(stream_id, 0)
+
+    def stats(self):
+        with self.condition:
+            return {
+                'frames_submitted': self.frames_submitted,
+                'frames_replaced': self.frames_replaced,
+                'batches_run': self.batches_run,
+                'frames_inferred': self.frames_inferred,
+                'frames_skipped': self.frames_skipped,
+                'avg_batch_size': self.frames_inferred / self.batches_run if self.batches_run else 0.0,
+                'pending': len(self.pending)
+            }
@@ -0,0 +1,209 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+# Logging setup for the controllers and receivers.
+#
+# Request threads only filter and enqueue records: message formatting, JSON
+# encoding and stream/file I/O happen on one QueueListener thread. Hot paths
+# log with lazy %-style arguments (logger.debug("x %s", x)) so nothing is
+# formatted when the level is disabled or the record is sampled out.
+#
+# Environment overrides, read by configure_logging():
+#   LOG_LEVEL=DEBUG                               root level
+#   LOG_LEVELS=fleet_engine=DEBUG,werkzeug=WARNING per module levels
+#   LOG_FORMAT=json                               JSON lines instead of text
+#   LOG_FILE=controller.log                       also write to a file
+#   LOG_SAMPLE_RATE=20                            records per message type per second (0 = no sampling)
+
+DEFAULT_FORMAT = '%(levelname)s:%(name)s:%(message)s'
+
+# LogRecord attributes that are not user supplied extra fields
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'sampled'}
+
+# Argument types that cannot change between the log call and the listener thread
+_IMMUTABLE = (str, int, float, bool, bytes, type(None))
+
+_listener = None
+
+class SamplingFilter(logging.Filter):
+    """
+    At most rate records per interval seconds for each message type, the
+    logger name plus the unformatted message template. The first record let
+    through after a suppressed burst carries the count in record.sampled.
+    rates overrides the rate per template; records at always_level or above
+    are never sampled. Expired windows are pruned once there are more than
+    max_windows, so one-off (f-string) messages do not accumulate
+    """
+
+    def __init__(self, rate=20, interval=1.0, rates=None, always_level=logging.CRITICAL, max_windows=1024):
+        super().__init__()
+        self.rate = rate
+        self.interval = interval
+        self.rates = rates or {}
+        self.always_level = always_level
+        self.max_windows = max_windows
+        self.windows = {}
+        self.lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record):
+        if record.levelno >= self.always_level:
+            return True
+        template = record.msg if isinstance(record.msg, str) else type(record.msg).__name__
+        rate = self.rates.get(template, self.rate)
+        if not rate:
+            return True
+
+        key = (record.name, template)
+        now = record.created
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                # [window start, records let through, records suppressed]
+                suppressed = window[2] if window else 0
+                if window is None and len(self.windows) >= self.max_windows:
+                    self._prune(now)
+                window = self.windows[key] = [now, 0, 0]
+            else:
+                suppressed = 0
+            if window[1] >= rate:
+                window[2] += 1
+                self.suppressed += 1
+                return False
+            window[1] += 1
+        record.sampled = suppressed
+        return True
+
+    def _prune(self, now):
+        """Drop expired windows (their suppressed counts are lost); all of them if none expired"""
+        expired = [key for key, window in self.windows.items() if now - window[0] >= self.interval]
+        for key in expired:
+            del self.windows[key]
+        if not expired:
+            self.windows.clear()
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        text = super().format(record)
+        sampled = getattr(record, 'sampled', 0)
+        if sampled:
+            text += f" [{sampled} similar suppressed]"
+        return text
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; extra= fields are added as keys"""
+
+    def format(self, record):
+        entry = {
+            'time': record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName
+        }
+        if isinstance(record.msg, str) and record.args:
+            entry['template'] = record.msg
+        sampled = getattr(record, 'sampled', 0)
+        if sampled:
+            entry['sampled'] = sampled
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread and drops
+    records instead of blocking when the queue is full. Records whose args
+    are all immutable (numbers, strings, None) stay lazy; any other argument
+    could change before the listener formats it, so those are formatted here
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The stock handler always formats here, on the logging thread
+        # (a single dict argument becomes record.args itself, so mappings are always formatted)
+        args = record.args
+        if args and (not isinstance(args, tuple) or not all(isinstance(arg, _IMMUTABLE) for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def parse_levels(spec):
+    """'fleet_engine=DEBUG,werkzeug=WARNING' -> {'fleet_engine': 'DEBUG', 'werkzeug': 'WARNING'}"""
+    levels = {}
+    for item in (spec or '').split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def configure_logging(level=logging.INFO, levels=None, json_lines=None, path=None, sample_rate=None,
+                      sample_interval=1.0, sample_rates=None, fmt=DEFAULT_FORMAT, datefmt=None,
+                      queue_size=10000):
+    """
+    Route all logging through a background QueueListener; replaces
+    logging.basicConfig in the entry points. Arguments are the defaults of
+    each program, the LOG_* environment variables override them
+    """
+    global _listener
+
+    level = os.environ.get('LOG_LEVEL', level)
+    levels = dict(levels or {}, **parse_levels(os.environ.get('LOG_LEVELS')))
+    if 'LOG_FORMAT' in os.environ:
+        json_lines = os.environ['LOG_FORMAT'].lower() == 'json'
+    path = os.environ.get('LOG_FILE', path)
+    sample_rate = int(os.environ.get('LOG_SAMPLE_RATE', 20 if sample_rate is None else sample_rate))
+
+    formatter = JsonFormatter() if json_lines else TextFormatter(fmt, datefmt)
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if path:
+        handlers.append(logging.FileHandler(path))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    if _listener is not None:
+        _listener.stop()
+    else:
+        atexit.register(stop_logging)
+    log_queue = queue.Queue(maxsize=queue_size)
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+
+    queue_handler = DeferredQueueHandler(log_queue)
+    if sample_rate:
+        queue_handler.addFilter(SamplingFilter(sample_rate, sample_interval, sample_rates))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    for name, module_level in levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener.start()
+    return _listener
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,131 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Directorio del almacén local de modelos; los nodos sin internet solo leen de aquí
+DEFAULT_ROOT = os.environ.get('VISION_MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+MANIFEST = 'models.json'
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ModelStore:
+    """
+    Almacén local de pesos fijados: models.json guarda el sha256 de cada
+    archivo y path() verifica el hash antes de regresar la ruta, así un nodo
+    siempre arranca con exactamente los mismos pesos y sin tocar la red.
+    También puede guardar una copia del repositorio de YOLOv5 para
+    torch.hub.load(..., source='local').
+    """
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST)
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        self._verified = set()
+
+    def _save(self):
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.manifest_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+
+    def has(self, name):
+        return name in self.manifest and os.path.exists(os.path.join(self.root, name))
+
+    def path(self, name):
+        """Ruta local del archivo fijado; falla si falta o si su hash no coincide"""
+        if name not in self.manifest:
+            raise FileNotFoundError(f"{name} is not pinned in {self.manifest_path}; "
+                                    f"run 'python model_store.py add <file>' on a machine that has it")
+        path = os.path.join(self.root, name)
+        if name not in self._verified:
+            expected = self.manifest[name].get('sha256')
+            if expected is not None:
+                if not os.path.exists(path):
+                    raise FileNotFoundError(f"Pinned model file missing: {path}")
+                actual = file_sha256(path)
+                if actual != expected:
+                    raise ValueError(f"Checksum mismatch for {name}: {actual} != {expected}")
+            self._verified.add(name)
+        return path
+
+    def add(self, source, name=None):
+        """Copia un archivo de pesos al almacén y fija su hash"""
+        name = name or os.path.basename(source)
+        target = os.path.join(self.root, name)
+        os.makedirs(self.root, exist_ok=True)
+        if os.path.abspath(source) != os.path.abspath(target):
+            shutil.copy2(source, target)
+        self.manifest[name] = {'sha256': file_sha256(target)}
+        self._save()
+        logger.info(f"Pinned {name} ({self.manifest[name]['sha256'][:12]})")
+        return target
+
+    def add_repo(self, source_dir, name='yolov5'):
+        """Copia un repositorio de torch.hub (p. ej. un clon de ultralytics/yolov5) al almacén"""
+        target = os.path.join(self.root, name)
+        if os.path.abspath(source_dir) != os.path.abspath(target):
+            shutil.copytree(source_dir, target, dirs_exist_ok=True)
+        if not os.path.exists(os.path.join(target, 'hubconf.py')):
+            raise ValueError(f"{source_dir} is not a torch.hub repository (no hubconf.py)")
+        self.manifest[name] = {'repo': True}
+        self._save()
+        return target
+
+    def derived_path(self, name):
+        """Ruta para archivos generados (exportaciones ONNX/OpenVINO), que no se fijan"""
+        os.makedirs(self.root, exist_ok=True)
+        return os.path.join(self.root, name)
+
+    def verify(self):
+        """Regresa {nombre: error o None} para todo el manifiesto"""
+        report = {}
+        for name in self.manifest:
+            self._verified.discard(name)
+            try:
+                self.path(name)
+                report[name] = None
+            except (FileNotFoundError, ValueError) as e:
+                report[name] = str(e)
+        return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local pinned model store")
+    parser.add_argument('--root', default=DEFAULT_ROOT)
+    commands = parser.add_subparsers(dest='command', required=True)
+    add_parser = commands.add_parser('add', help="Pin a weights file")
+    add_parser.add_argument('source')
+    add_parser.add_argument('--name', default=None)
+    repo_parser = commands.add_parser('add-repo', help="Store a torch.hub repository for offline loading")
+    repo_parser.add_argument('source_dir')
+    repo_parser.add_argument('--name', default='yolov5')
+    commands.add_parser('verify', help="Check every pinned file against its checksum")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    store = ModelStore(args.root)
+    if args.command == 'add':
+        store.add(args.source, name=args.name)
+    elif args.command == 'add-repo':
+        store.add_repo(args.source_dir, name=args.name)
+    else:
+        report = store.verify()
+        for name, error in sorted(report.items()):
+            print(f"{name}: {error or 'ok'}")
+        if any(report.values()):
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import time
+import numpy as np
+import cv2
+
+class FrameSlots:
+    """
+    Slots preasignados para los frames de cada cámara, con doble buffer.
+
+    El productor escribe directamente al tamaño de celda en el buffer inactivo
+    de su slot y luego lo activa e incrementa el número de secuencia. El lector
+    copia el buffer activo y verifica que la secuencia no cambió mientras copiaba.
+    Los arreglos pueden vivir en memoria propia o en un bloque compartido (buffer).
+    """
+
+    def __init__(self, num_slots, cell_height, cell_width, buffer=None):
+        self.num_slots = num_slots
+        self.cell_height = cell_height
+        self.cell_width = cell_width
+
+        if buffer is None:
+            buffer = bytearray(self.nbytes(num_slots, cell_height, cell_width))
+
+        cells_size = num_slots * 2 * cell_height * cell_width * 3
+        self.cells = np.ndarray((num_slots, 2, cell_height, cell_width, 3), dtype=np.uint8, buffer=buffer)
+        self.seq = np.ndarray((num_slots,), dtype=np.int64, buffer=buffer, offset=cells_size)
+        self.active = np.ndarray((num_slots,), dtype=np.int64, buffer=buffer, offset=cells_size + num_slots * 8)
+
+    @staticmethod
+    def nbytes(num_slots, cell_height, cell_width):
+        return num_slots * 2 * cell_height * cell_width * 3 + num_slots * 16
+
+    def clear(self):
+        self.cells.fill(0)
+        self.seq.fill(0)
+        self.active.fill(0)
+
+    def write(self, slot, frame):
+        """Escribe el frame en el buffer inactivo del slot, redimensionando en el lugar"""
+        index = 1 - int(self.active[slot])
+        target = self.cells[slot, index]
+        if frame.shape[:2] == (self.cell_height, self.cell_width):
+            np.copyto(target, frame)
+        else:
+            cv2.resize(frame, (self.cell_width, self.cell_height), dst=target)
+        self.active[slot] = index
+        self.seq[slot] += 1
+
+    def read_into(self, slot, out, last_seq=0, retries=3):
+        """Copia el frame activo en out si cambió desde last_seq; regresa la nueva secuencia o None"""
+        for _ in range(retries):
+            seq = int(self.seq[slot])
+            if seq == last_seq:
+                return None
+            np.copyto(out, self.cells[slot, int(self.active[slot])])
+            if int(self.seq[slot]) == seq:
+                return seq
+            time.sleep(0.0005)
+        return None
+
+    def release(self):
+        # Soltar las vistas para poder cerrar un bloque compartido
+        self.cells = None
+        self.seq = None
+        self.active = None
+
+class Mosaic:
+    """
+    Cuadrícula de visualización preasignada que solo vuelve a copiar las celdas
+    cuyo slot cambió desde el último render.
+    """
+
+    def __init__(self, slots, cols):
+        self.slots = slots
+        self.cols = cols
+        self.rows = (slots.num_slots + cols - 1) // cols
+        height, width = slots.cell_height, slots.cell_width
+        self.grid = np.zeros((height * self.rows, width * cols, 3), dtype=np.uint8)
+        self.rendered_seq = [0] * slots.num_slots
+        self.seq = 0
+
+        # Vistas fijas de cada celda dentro de la cuadrícula
+        self.cells = []
+        for slot in range(slots.num_slots):
+            i, j = slot // cols, slot % cols
+            self.cells.append(self.grid[i*height:(i+1)*height, j*width:(j+1)*width])
+
+    def render(self):
+        """Actualiza las celdas que cambiaron; regresa True si la cuadrícula cambió"""
+        changed = False
+        for slot, cell in enumerate(self.cells):
+            seq = self.slots.read_into(slot, cell, self.rendered_seq[slot])
+            if seq is not None:
+                self.rendered_seq[slot] = seq
+                changed = True
+        if changed:
+            self.seq += 1
+        return changed
+
+    @property
+    def has_frames(self):
+        return any(self.rendered_seq)
@@ -0,0 +1,179 @@
+import threading
+import time
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import cv2
+
+logger = logging.getLogger(__name__)
+
+BOUNDARY = b'mosaicframe'
+
+INDEX_PAGE = b"""<html><head><title>Camera Mosaic</title></head>
+<body style="margin:0;background:#111">
+<img src="/stream" style="width:100%">
+</body></html>"""
+
+class MosaicStreamer:
+    """
+    Sirve el mosaico anotado como MJPEG por HTTP para el modo sin ventana.
+
+    Un solo hilo renderiza el mosaico y lo codifica a JPEG una vez por tick,
+    y solo si alguna celda cambió; todos los visores comparten ese mismo JPEG.
+    Cada visor tiene su propio límite de cuadros por segundo.
+    """
+
+    def __init__(self, mosaic, host='0.0.0.0', port=8080, fps=15.0, quality=80, max_viewer_fps=15.0):
+        self.mosaic = mosaic
+        self.host = host
+        self.port = port
+        self.interval = 1.0 / fps
+        self.quality = quality
+        self.max_viewer_fps = max_viewer_fps
+        self.running = False
+
+        # Último JPEG codificado y su número de secuencia
+        self.jpeg = None
+        self.jpeg_seq = 0
+        self.condition = threading.Condition()
+
+        # Estadísticas
+        self.frames_encoded = 0
+        self.ticks_skipped = 0
+        self.viewers = 0
+
+        self.server = None
+        self.threads = []
+
+    def _encode_loop(self):
+        while self.running:
+            start = time.time()
+            try:
+                if self.mosaic.render():
+                    ok, buffer = cv2.imencode('.jpg', self.mosaic.grid,
+                                              [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                    if ok:
+                        with self.condition:
+                            self.jpeg = buffer.tobytes()
+                            self.jpeg_seq += 1
+                            self.frames_encoded += 1
+                            self.condition.notify_all()
+                else:
+                    self.ticks_skipped += 1
+            except Exception as e:
+                logger.error(f"Error encoding mosaic: {e}")
+
+            elapsed = time.time() - start
+            time.sleep(max(0.0, self.interval - elapsed))
+
+    def wait_for_frame(self, last_seq, timeout=1.0):
+        """Bloquea hasta que haya un JPEG más nuevo que last_seq; regresa (seq, jpeg)"""
+        with self.condition:
+            if self.jpeg_seq == last_seq:
+                self.condition.wait(timeout=timeout)
+            return self.jpeg_seq, self.jpeg
+
+    def _make_handler(self):
+        streamer = self
+
+        class MosaicRequestHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logger.debug("%s - %s", self.address_string(), format % args)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == '/':
+                    self._send_bytes(INDEX_PAGE, 'text/html')
+                elif url.path == '/snapshot.jpg':
+                    _, jpeg = streamer.wait_for_frame(-1, timeout=0)
+                    if jpeg is None:
+                        self.send_error(503, "No frame available yet")
+                    else:
+                        self._send_bytes(jpeg, 'image/jpeg')
+                elif url.path == '/stream':
+                    fps = streamer.max_viewer_fps
+                    query = parse_qs(url.query)
+                    if 'fps' in query:
+                        try:
+                            fps = min(fps, float(query['fps'][0]))
+                        except ValueError:
+                            pass
+                    self._stream(max(fps, 0.1))
+                else:
+                    self.send_error(404)
+
+            def _send_bytes(self, body, content_type):
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self, fps):
+                self.send_response(200)
+                self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY.decode()}')
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+
+                min_interval = 1.0 / fps
+                last_seq = 0
+                last_sent = 0.0
+                with streamer.condition:
+                    streamer.viewers += 1
+                try:
+                    while streamer.running:
+                        # Límite de cuadros por visor
+                        wait = min_interval - (time.time() - last_sent)
+                        if wait > 0:
+                            time.sleep(wait)
+
+                        seq, jpeg = streamer.wait_for_frame(last_seq)
+                        if jpeg is None or seq == last_seq:
+                            continue
+
+                        self.wfile.write(b'--' + BOUNDARY + b'\r\n')
+                        self.wfile.write(b'Content-Type: image/jpeg\r\n')
+                        self.wfile.write(f'Content-Length: {len(jpeg)}\r\n\r\n'.encode())
+                        self.wfile.write(jpeg)
+                        self.wfile.write(b'\r\n')
+                        last_seq = seq
+                        last_sent = time.time()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with streamer.condition:
+                        streamer.viewers -= 1
+
+        return MosaicRequestHandler
+
+    def start(self):
+        self.running = True
+        self.server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self.server.daemon_threads = True
+
+        for target, name in ((self._encode_loop, "MosaicEncoder"), (self.server.serve_forever, "MosaicHTTP")):
+            thread = threading.Thread(target=target, name=name)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+        logger.info(f"Mosaic stream available at http://{self.host}:{self.port}/stream")
+
+    def stop(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        for thread in self.threads:
+            thread.join(timeout=2.0)
+        self.threads = []
+
+    def stats(self):
+        return {
+            'frames_encoded': self.frames_encoded,
+            'ticks_skipped': self.ticks_skipped,
+            'viewers': self.viewers
+        }
@@ -0,0 +1,73 @@
+import cv2
+import numpy as np
+
+class GateCounters:
+    def __init__(self):
+        self.inferred = 0
+        self.skipped = 0
+
+    def as_dict(self):
+        total = self.inferred + self.skipped
+        return {
+            'inferred': self.inferred,
+            'skipped': self.skipped,
+            'skip_ratio': self.skipped / total if total else 0.0
+        }
+
+class MotionGate:
+    """
+    Filtro previo a la inferencia por cámara: compara una versión reducida y
+    en grises del frame contra la del último frame que pasó por el detector.
+    Si cambió menos de min_changed_ratio de los pixeles, el frame se salta.
+    Cada refresh_interval segundos se deja pasar uno aunque no haya movimiento,
+    para revalidar a las personas quietas y absorber cambios lentos de luz;
+    debe ser menor que el max_age de los tracks (TrackHistory.keep_alive solo
+    los mantiene hasta max_age después de su última detección real).
+    """
+
+    def __init__(self, width=160, pixel_threshold=25, min_changed_ratio=0.002, refresh_interval=0.5, blur=5):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_ratio = min_changed_ratio
+        self.refresh_interval = refresh_interval
+        self.blur = blur
+
+        # Por cámara: frame de referencia reducido y hora de la última inferencia
+        self.references = {}
+        self.last_inference = {}
+        self.counters = {}
+
+    def _downscale(self, frame):
+        height, width = frame.shape[:2]
+        size = (self.width, max(1, round(height * self.width / width)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (self.blur, self.blur), 0)
+
+    def should_infer(self, camera_id, frame, now):
+        """True si el frame debe pasar por el detector"""
+        counters = self.counters.get(camera_id)
+        if counters is None:
+            counters = self.counters[camera_id] = GateCounters()
+
+        gray = self._downscale(frame)
+        reference = self.references.get(camera_id)
+        if (reference is not None and reference.shape == gray.shape
+                and now - self.last_inference[camera_id] < self.refresh_interval):
+            diff = cv2.absdiff(gray, reference)
+            changed = np.count_nonzero(diff > self.pixel_threshold)
+            if changed < self.min_changed_ratio * diff.size:
+                counters.skipped += 1
+                return False
+
+        self.references[camera_id] = gray
+        self.last_inference[camera_id] = now
+        counters.inferred += 1
+        return True
+
+    def reset(self, camera_id):
+        self.references.pop(camera_id, None)
+        self.last_inference.pop(camera_id, None)
+
+    def stats(self):
+        return {camera_id: counters.as_dict() for camera_id, counters in self.counters.items()}
@@ -0,0 +1,185 @@
+import bisect
+import json
+import threading
+import time
+import logging
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Límites de los histogramas: 96 cubetas logarítmicas de 10 µs a 10 s (~15% de resolución)
+BUCKET_BOUNDS = np.geomspace(1e-5, 10.0, 96).tolist()
+
+# Orden en que se muestran las etapas del pipeline
+STAGES = ('recv', 'wait', 'decode', 'gate', 'resize', 'infer', 'track', 'annotate', 'send', 'post', 'latency')
+
+class Histogram:
+    """Histograma de duraciones en cubetas fijas; registrar cuesta O(log cubetas)"""
+
+    __slots__ = ('counts', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """Límite superior de la cubeta que contiene el percentil q (0-100)"""
+        count = sum(self.counts)
+        if count == 0:
+            return 0.0
+        rank = q / 100.0 * count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return min(BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max, self.max)
+        return self.max
+
+    def describe(self):
+        count = sum(self.counts)
+        return {
+            'count': count,
+            'mean_ms': self.total / count * 1000.0 if count else 0.0,
+            'p50_ms': self.percentile(50) * 1000.0,
+            'p95_ms': self.percentile(95) * 1000.0,
+            'p99_ms': self.percentile(99) * 1000.0,
+            'max_ms': self.max * 1000.0
+        }
+
+class PipelineStats:
+    """
+    Histogramas por stream y etapa (recv, decode, resize, infer, track,
+    annotate, send, ...) y latencia de punta a punta. Los receptores lo
+    reciben como parámetro opcional; si es None no se mide nada.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = defaultdict(dict)  # stream_id -> etapa -> Histogram
+            self.frames = defaultdict(int)
+            self.started = time.time()
+
+    def record(self, stream_id, stage, seconds):
+        with self.lock:
+            stages = self.histograms[stream_id]
+            histogram = stages.get(stage)
+            if histogram is None:
+                histogram = stages[stage] = Histogram()
+            histogram.add(seconds)
+
+    def frame_done(self, stream_id, source_timestamp=None, now=None):
+        """Cuenta un frame terminado; con el timestamp del emisor registra la latencia"""
+        if now is None:
+            now = time.time()
+        with self.lock:
+            self.frames[stream_id] += 1
+        if source_timestamp is not None:
+            self.record(stream_id, 'latency', now - source_timestamp)
+
+    def summary(self):
+        """Cuadros por segundo y percentiles de cada etapa por stream"""
+        with self.lock:
+            elapsed = max(time.time() - self.started, 1e-9)
+            summary = {}
+            for stream_id in set(self.histograms) | set(self.frames):
+                stages = self.histograms.get(stream_id, {})
+                ordered = sorted(stages, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES))
+                summary[stream_id] = {
+                    'frames': self.frames.get(stream_id, 0),
+                    'fps': self.frames.get(stream_id, 0) / elapsed,
+                    'stages': {stage: stages[stage].describe() for stage in ordered}
+                }
+            return summary
+
+    def summary_line(self):
+        """Resumen de una línea: fps y p50/p95 en ms de cada etapa por stream"""
+        parts = []
+        for stream_id, stream in sorted(self.summary().items(), key=lambda item: str(item[0])):
+            stages = ' '.join(f"{stage}={stats['p50_ms']:.1f}/{stats['p95_ms']:.1f}"
+                              for stage, stats in stream['stages'].items())
+            parts.append(f"[{stream_id}] {stream['fps']:.1f}fps {stages}")
+        return ' | '.join(parts)
+
+class PerfMonitor:
+    """
+    Publica un PipelineStats: una línea de resumen en el log cada
+    log_interval segundos y, si se da un puerto, un endpoint HTTP local con
+    el resumen en JSON en /metrics.
+    """
+
+    def __init__(self, stats, port=None, host='127.0.0.1', log_interval=10.0):
+        self.stats = stats
+        self.port = port
+        self.host = host
+        self.log_interval = log_interval
+        self.running = False
+        self.stop_event = threading.Event()
+        self.server = None
+        self.threads = []
+
+    def _log_loop(self):
+        while not self.stop_event.wait(self.log_interval):
+            line = self.stats.summary_line()
+            if line:
+                logger.info(f"Pipeline stats: {line}")
+
+    def _make_handler(self):
+        stats = self.stats
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                summary = {str(stream_id): stream for stream_id, stream in stats.summary().items()}
+                body = json.dumps(summary).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return MetricsRequestHandler
+
+    def start(self):
+        self.running = True
+        self.stop_event.clear()
+        targets = [(self._log_loop, "PerfLog")]
+        if self.port is not None:
+            self.server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+            self.server.daemon_threads = True
+            targets.append((self.server.serve_forever, "PerfHTTP"))
+            logger.info(f"Pipeline metrics available at http://{self.host}:{self.port}/metrics")
+
+        for target, name in targets:
+            thread = threading.Thread(target=target, name=name)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.running = False
+        self.stop_event.set()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        for thread in self.threads:
+            thread.join(timeout=2.0)
+        self.threads = []
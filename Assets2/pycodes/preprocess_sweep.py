@@ -0,0 +1,309 @@
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import cv2
+import numpy as np
+from detectors import BACKENDS, create_detector
+
+logger = logging.getLogger(__name__)
+
+# Clases de interés por defecto: bottle, cup, bowl, vase
+RELEVANT_CLASSES = (39, 41, 44, 75)
+SCALES = (1.0, 1.5, 0.75)
+IMAGE_EXTENSIONS = ('*.png', '*.jpg', '*.jpeg')
+
+def _red_enhanced(img):
+    # Mejorar canal rojo para Coca-Cola (canal 2 en BGR)
+    img = img.copy()
+    img[:, :, 2] = cv2.convertScaleAbs(img[:, :, 2], alpha=1.5, beta=10)
+    return img
+
+# Preprocesamientos sobre la imagen BGR (la entrada de Detector.predict); todos regresan uint8
+VARIANTS = OrderedDict([
+    ('Original', lambda img: img),
+    ('Contraste', lambda img: cv2.convertScaleAbs(img, alpha=1.8, beta=10)),
+    ('Histograma', lambda img: cv2.cvtColor(cv2.equalizeHist(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)),
+                                            cv2.COLOR_GRAY2BGR)),
+    ('Gamma', lambda img: (np.power(img / 255.0, 1.8).clip(0, 1) * 255.0).astype(np.uint8)),
+    ('Sharpen', lambda img: cv2.filter2D(img, -1, np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]]))),
+    ('Red Enhanced', _red_enhanced),
+])
+
+COLUMNS = ('image', 'hash', 'variant', 'scale', 'class_id', 'name', 'confidence', 'xmin', 'ymin', 'xmax', 'ymax')
+
+def image_hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+class SweepCache:
+    """
+    Caché de la búsqueda por hash de la imagen: las versiones preprocesadas
+    en memoria (LRU acotada) y las detecciones en disco, un JSON por imagen
+    con una entrada por configuración del detector. La usan los hilos de
+    preprocesamiento, así que la LRU y los contadores van bajo un lock
+    """
+
+    def __init__(self, directory=None, max_images=64):
+        self.directory = directory
+        self.max_images = max_images
+        self.images = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def get_images(self, digest):
+        with self.lock:
+            images = self.images.get(digest)
+            if images is not None:
+                self.images.move_to_end(digest)
+            return images
+
+    def put_images(self, digest, images):
+        with self.lock:
+            self.images[digest] = images
+            self.images.move_to_end(digest)
+            while len(self.images) > self.max_images:
+                self.images.popitem(last=False)
+
+    def _count(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _path(self, digest):
+        return os.path.join(self.directory, f'{digest}.json')
+
+    def get_results(self, digest, key):
+        if not self.directory or not os.path.exists(self._path(digest)):
+            self._count(False)
+            return None
+        with open(self._path(digest)) as f:
+            rows = json.load(f).get(key)
+        self._count(rows is not None)
+        return rows
+
+    def put_results(self, digest, key, rows):
+        if not self.directory:
+            return
+        path = self._path(digest)
+        entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                entries = json.load(f)
+        entries[key] = rows
+        with open(path, 'w') as f:
+            json.dump(entries, f)
+
+class SweepEngine:
+    """
+    Prueba preprocesamientos y escalas sobre imágenes con un detector ya cargado.
+
+    Por cada escala, todas las variantes van en un solo batch con todas las
+    clases de interés, y las detecciones se separan por clase después: una
+    imagen cuesta len(scales) inferencias en lugar de
+    variantes x escalas x clases. La lectura y el preprocesamiento de un
+    directorio corren en paralelo mientras el detector procesa la imagen
+    anterior.
+    """
+
+    def __init__(self, detector, variants=VARIANTS, scales=SCALES, classes=RELEVANT_CLASSES,
+                 conf=0.25, cache=None, save_dir=None):
+        self.detector = detector
+        self.variants = variants
+        self.scales = tuple(scales)
+        self.classes = list(classes)
+        self.conf = conf
+        self.cache = cache or SweepCache()
+        self.save_dir = save_dir
+        self.failed = []  # Imágenes que no se pudieron leer o procesar en sweep_paths
+
+        # Las detecciones guardadas solo valen para el mismo modelo y configuración
+        model = (getattr(detector, 'weights', None) or getattr(detector, 'model_name', None)
+                 or type(detector).__name__)
+        self.cache_key = (f"{detector.backend}|{model}|conf={conf}|classes={self.classes}|"
+                          f"variants={list(variants)}|scales={list(self.scales)}|bgr")
+
+    def prepare(self, path):
+        """Lee la imagen y regresa (ruta, hash, filas en caché o None, {(variante, escala): imagen})"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = image_hash(data)
+        rows = self.cache.get_results(digest, self.cache_key)
+        if rows is not None:
+            return path, digest, rows, None
+
+        images = self.cache.get_images(digest)
+        if images is None:
+            image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError(f"Could not decode {path}")
+            height, width = image.shape[:2]
+            images = {}
+            for name, transform in self.variants.items():
+                variant = np.ascontiguousarray(transform(image), dtype=np.uint8)
+                for scale in self.scales:
+                    images[name, scale] = variant if scale == 1.0 else cv2.resize(
+                        variant, (int(width * scale), int(height * scale)))
+            self.cache.put_images(digest, images)
+        return path, digest, None, images
+
+    def detect(self, path, digest, images):
+        """Un batch por escala con todas las variantes; regresa las filas del reporte"""
+        rows = []
+        for scale in self.scales:
+            names = list(self.variants)
+            results = self.detector.predict([images[name, scale] for name in names],
+                                            classes=self.classes, conf=self.conf)
+            for name, result in zip(names, results):
+                data = result.boxes.data.cpu().numpy()
+                for x1, y1, x2, y2, confidence, class_id in data[:, :6]:
+                    rows.append({
+                        'image': path,
+                        'hash': digest,
+                        'variant': name,
+                        'scale': scale,
+                        'class_id': int(class_id),
+                        'name': result.names[int(class_id)],
+                        'confidence': float(confidence),
+                        # Coordenadas en la imagen original
+                        'xmin': float(x1 / scale),
+                        'ymin': float(y1 / scale),
+                        'xmax': float(x2 / scale),
+                        'ymax': float(y2 / scale)
+                    })
+                if self.save_dir and len(data):
+                    self._save_plot(path, name, scale, result)
+        self.cache.put_results(digest, self.cache_key, rows)
+        return rows
+
+    def _save_plot(self, path, variant, scale, result):
+        os.makedirs(self.save_dir, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        output_path = os.path.join(self.save_dir, f'detection_{stem}_{variant}_scale{scale}.png')
+        # plot() dibuja sobre la imagen tal como entró (BGR)
+        cv2.imwrite(output_path, result.plot())
+
+    def sweep_image(self, path):
+        path, digest, rows, images = self.prepare(path)
+        if rows is None:
+            rows = self.detect(path, digest, images)
+        return rows
+
+    def sweep_paths(self, paths, workers=4):
+        """
+        Barre varias imágenes; el preprocesamiento corre en workers hilos por
+        adelantado, a lo más 2 * workers imágenes preparadas en memoria. Una
+        imagen que falla se registra en self.failed y el barrido sigue
+        """
+        rows = []
+        start = time.perf_counter()
+        workers = max(1, workers)
+        window = deque()
+        remaining = iter(paths)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Sweep") as executor:
+            for index in range(1, len(paths) + 1):
+                # Rellena la ventana; el detector serial marca el ritmo
+                for path in islice(remaining, 2 * workers - len(window)):
+                    window.append((path, executor.submit(self.prepare, path)))
+                path, future = window.popleft()
+                try:
+                    path, digest, cached, images = future.result()
+                    rows.extend(cached if cached is not None else self.detect(path, digest, images))
+                except Exception as e:
+                    self.failed.append(path)
+                    logger.error(f"Skipping {path}: {e}")
+                if index % 50 == 0:
+                    logger.info(f"Swept {index}/{len(paths)} images")
+        logger.info(f"Swept {len(paths)} images in {time.perf_counter() - start:.1f}s "
+                    f"(cache hits {self.cache.hits}, misses {self.cache.misses}, failed {len(self.failed)})")
+        return rows
+
+    def sweep_directory(self, directory, workers=4, recursive=False):
+        return self.sweep_paths(list_images(directory, recursive), workers=workers)
+
+def list_images(directory, recursive=False):
+    pattern = os.path.join('**', '') if recursive else ''
+    return sorted(path for ext in IMAGE_EXTENSIONS
+                  for path in glob.glob(os.path.join(directory, pattern + ext), recursive=recursive))
+
+def best_detection(rows):
+    """La fila con la confianza más alta, o None"""
+    return max(rows, key=lambda row: row['confidence'], default=None)
+
+def summarize(rows, num_images=None):
+    """Por variante y escala: imágenes con detección, detecciones y confianza media/máxima"""
+    groups = defaultdict(list)
+    for row in rows:
+        groups[f"{row['variant']}@{row['scale']}"].append(row)
+    summary = {}
+    for key, group in sorted(groups.items()):
+        confidences = [row['confidence'] for row in group]
+        images = len({row['hash'] for row in group})
+        summary[key] = {
+            'images_with_detections': images,
+            'hit_rate': images / num_images if num_images else None,
+            'detections': len(group),
+            'mean_confidence': float(np.mean(confidences)),
+            'max_confidence': float(np.max(confidences))
+        }
+    return summary
+
+def write_report(rows, path, num_images=None):
+    """Reporte en CSV (una fila por detección) o JSON (detecciones y resumen) según la extensión"""
+    if path.endswith('.json'):
+        with open(path, 'w') as f:
+            json.dump({'summary': summarize(rows, num_images), 'detections': rows}, f, indent=2)
+        return
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep preprocessing variants and scales over images")
+    parser.add_argument('source', help="Image file or directory")
+    parser.add_argument('--model', default='yolov5s')
+    parser.add_argument('--backend', default='torch-hub', choices=BACKENDS)
+    parser.add_argument('--classes', type=int, nargs='+', default=list(RELEVANT_CLASSES))
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--recursive', action='store_true')
+    parser.add_argument('--cache-dir', default='.sweep_cache')
+    parser.add_argument('--save-dir', default=None, help="Save annotated images of every hit here")
+    parser.add_argument('--report', default='sweep_report.csv', help="Report path (.csv or .json)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    engine = SweepEngine(
+        create_detector(args.model, backend=args.backend),
+        classes=args.classes,
+        conf=args.conf,
+        cache=SweepCache(args.cache_dir),
+        save_dir=args.save_dir
+    )
+    paths = list_images(args.source, args.recursive) if os.path.isdir(args.source) else [args.source]
+    rows = engine.sweep_paths(paths, workers=args.workers)
+    num_images = len(paths) - len(engine.failed)
+
+    write_report(rows, args.report, num_images)
+    for key, stats in summarize(rows, num_images).items():
+        print(f"{key:20s} {stats['images_with_detections']:6d} images  {stats['detections']:6d} det  "
+              f"mean {stats['mean_confidence']:.3f}  max {stats['max_confidence']:.3f}")
+    if engine.failed:
+        logger.warning(f"{len(engine.failed)} images could not be processed: {engine.failed[:10]}")
+    logger.info(f"Report written to {args.report}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import socket
+import struct
+import threading
+import time
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Paquete de control de tasa (versión 1), de Python hacia el emisor de Unity, little-endian:
+#   magic 'RC' | version u8 | quality u8 | camera_id i32 | capture_interval f32 | width u16 | height u16
+# Debe coincidir con Codes/RateFeedback.cs
+MAGIC = b'RC'
+VERSION = 1
+PACKET = struct.Struct('<2sBBifHH')
+
+RateSettings = namedtuple('RateSettings', 'capture_interval quality width height')
+
+# Niveles de mayor a menor costo: cámaras con detecciones, presión de backlog y cámaras sin actividad
+DEFAULT_LEVELS = (
+    RateSettings(0.033, 75, 640, 480),
+    RateSettings(0.1, 60, 640, 480),
+    RateSettings(0.5, 50, 320, 240),
+)
+
+def encode_settings(camera_id, settings):
+    return PACKET.pack(MAGIC, VERSION, settings.quality, camera_id, settings.capture_interval,
+                       settings.width, settings.height)
+
+def decode_settings(data):
+    """Regresa (camera_id, RateSettings)"""
+    if len(data) < PACKET.size or data[:2] != MAGIC:
+        raise ValueError("Not a rate control packet")
+    magic, version, quality, camera_id, capture_interval, width, height = PACKET.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"Unsupported rate control version: {version}")
+    return camera_id, RateSettings(capture_interval, quality, width, height)
+
+class CameraRateState:
+    def __init__(self):
+        self.level = None
+        self.last_sent = 0.0
+        self.last_detection = 0.0
+        self.last_received = 0
+        self.last_dropped = 0
+        self.last_submitted = 0
+        self.last_replaced = 0
+
+class RateController:
+    """
+    Ajusta la tasa de captura, la calidad JPEG y la resolución de cada emisor.
+
+    Cada interval segundos revisa por cámara los contadores de FrameIngest y,
+    con scheduler, los del InferenceScheduler: si la fracción de frames
+    descartados por no alcanzar a decodificarlos o reemplazados antes de llegar
+    al detector supera backlog_high, la cámara baja un nivel. Las cámaras con
+    detecciones en los últimos active_hold segundos van a tasa completa y las
+    demás al nivel más bajo. El paquete se envía a la dirección desde la que
+    llegan los frames, solo cuando cambia el nivel o cada resend_interval
+    segundos.
+    """
+
+    def __init__(self, ingest, levels=DEFAULT_LEVELS, interval=1.0, active_hold=3.0,
+                 backlog_high=0.2, resend_interval=5.0, scheduler=None):
+        self.ingest = ingest
+        self.scheduler = scheduler
+        self.levels = levels
+        self.interval = interval
+        self.active_hold = active_hold
+        self.backlog_high = backlog_high
+        self.resend_interval = resend_interval
+
+        self.states = {stream_id: CameraRateState() for stream_id in ingest.ports}
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        # Estadísticas
+        self.packets_sent = 0
+        self.level_changes = 0
+
+    def note_detections(self, stream_id, now=None):
+        """Marca que la cámara tiene detecciones activas"""
+        state = self.states.get(stream_id)
+        if state is not None:
+            state.last_detection = time.time() if now is None else now
+
+    def _backlog(self, stream_id, state, counters):
+        """Fracción de frames perdidos por backlog desde la revisión anterior"""
+        received = counters.received - state.last_received
+        dropped = counters.dropped - state.last_dropped
+        state.last_received = counters.received
+        state.last_dropped = counters.dropped
+        backlog = dropped / received if received else 0.0
+
+        if self.scheduler is not None:
+            # La saturación de la inferencia se ve como frames reemplazados en el planificador
+            submitted, replaced = self.scheduler.stream_counters(stream_id)
+            new_submitted = submitted - state.last_submitted
+            new_replaced = replaced - state.last_replaced
+            state.last_submitted = submitted
+            state.last_replaced = replaced
+            if new_submitted:
+                backlog = max(backlog, new_replaced / new_submitted)
+        return backlog
+
+    def _target_level(self, stream_id, state, counters, now):
+        level = 0 if now - state.last_detection < self.active_hold else len(self.levels) - 1
+        if self._backlog(stream_id, state, counters) > self.backlog_high:
+            level = min(level + 1, len(self.levels) - 1)
+        return level
+
+    def tick(self, now=None):
+        if now is None:
+            now = time.time()
+        for stream_id, state in self.states.items():
+            level = self._target_level(stream_id, state, self.ingest.counters[stream_id], now)
+            address = self.ingest.sender_address(stream_id)
+            if address is None:
+                continue
+            if level == state.level and now - state.last_sent < self.resend_interval:
+                continue
+
+            if level != state.level:
+                logger.info("Stream %s rate level %s -> %s: %s", stream_id, state.level, level, self.levels[level])
+                self.level_changes += 1
+            try:
+                self.socket.sendto(encode_settings(stream_id, self.levels[level]), address)
+                self.packets_sent += 1
+                state.level = level
+                state.last_sent = now
+            except OSError as e:
+                logger.error("Error sending rate control to stream %s: %s", stream_id, e)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.tick()
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="RateController")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        self.socket.close()
+
+    def stats(self):
+        return {
+            'packets_sent': self.packets_sent,
+            'level_changes': self.level_changes,
+            'levels': {stream_id: state.level for stream_id, state in self.states.items()}
+        }
@@ -0,0 +1,144 @@
+import json
+from types import SimpleNamespace
+import cv2
+import numpy as np
+from ultralytics.engine.results import Boxes
+
+class CameraROI:
+    """
+    Región de interés de una cámara fija.
+
+    polygons son polígonos en coordenadas normalizadas (0-1) con las zonas
+    transitables; lo demás (paredes, techo) se pinta de negro y el frame se
+    recorta al rectángulo que los contiene. Con tile_size, un recorte más
+    grande que eso se divide en mosaicos con traslape que se infieren en el
+    mismo batch y cuyas cajas se juntan después con NMS entre mosaicos.
+    """
+
+    def __init__(self, polygons=None, tile_size=None, overlap=0.2, iou_threshold=0.5, containment=0.8):
+        self.polygons = [np.asarray(polygon, dtype=np.float32) for polygon in (polygons or [])]
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.iou_threshold = iou_threshold
+        self.containment = containment
+
+        # Máscara y recorte por tamaño de frame (se calculan una vez)
+        self._masks = {}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            polygons=config.get('polygons'),
+            tile_size=config.get('tile_size'),
+            overlap=config.get('overlap', 0.2),
+            iou_threshold=config.get('iou_threshold', 0.5),
+            containment=config.get('containment', 0.8)
+        )
+
+    def _mask_for(self, shape):
+        """Regresa (máscara completa, rectángulo x0, y0, x1, y1, máscara recortada)"""
+        cached = self._masks.get(shape)
+        if cached is not None:
+            return cached
+
+        height, width = shape
+        if not self.polygons:
+            cached = (None, (0, 0, width, height), None)
+        else:
+            mask = np.zeros((height, width), dtype=np.uint8)
+            scale = np.array([width, height], dtype=np.float32)
+            cv2.fillPoly(mask, [np.round(polygon * scale).astype(np.int32) for polygon in self.polygons], 255)
+            x, y, w, h = cv2.boundingRect(mask)
+            if w == 0 or h == 0:
+                x, y, w, h = 0, 0, width, height
+            rect = (x, y, x + w, y + h)
+            cached = (mask, rect, np.ascontiguousarray(mask[y:y + h, x:x + w]))
+        self._masks[shape] = cached
+        return cached
+
+    def _tile_spans(self, length):
+        """Intervalos (inicio, fin) de los mosaicos a lo largo de un eje, repartidos parejo"""
+        if not self.tile_size or length <= self.tile_size * (1.0 + self.overlap):
+            return [(0, length)]
+        stride = self.tile_size * (1.0 - self.overlap)
+        count = int(np.ceil((length - self.tile_size) / stride)) + 1
+        starts = np.linspace(0, length - self.tile_size, count).round().astype(int)
+        return [(start, start + self.tile_size) for start in starts.tolist()]
+
+    def prepare(self, frame):
+        """Regresa (imágenes a inferir, offsets x, y de cada una en el frame)"""
+        _, (x0, y0, x1, y1), crop_mask = self._mask_for(frame.shape[:2])
+        crop = frame[y0:y1, x0:x1]
+        if crop_mask is not None:
+            crop = cv2.bitwise_and(crop, crop, mask=crop_mask)
+
+        height, width = crop.shape[:2]
+        inputs, offsets = [], []
+        for ty0, ty1 in self._tile_spans(height):
+            for tx0, tx1 in self._tile_spans(width):
+                inputs.append(crop[ty0:ty1, tx0:tx1])
+                offsets.append((x0 + tx0, y0 + ty0))
+        return inputs, offsets
+
+    def merge(self, results, offsets, shape):
+        """
+        Junta los resultados de los mosaicos en un solo resultado con .boxes en
+        coordenadas del frame completo, listo para TrackerPool.update
+        """
+        parts = []
+        for result, (dx, dy) in zip(results, offsets):
+            if result is None or result.boxes is None or len(result.boxes) == 0:
+                continue
+            data = result.boxes.data.cpu().numpy().astype(np.float32)
+            data[:, [0, 2]] += dx
+            data[:, [1, 3]] += dy
+            parts.append(data)
+
+        data = np.concatenate(parts) if parts else np.zeros((0, 6), dtype=np.float32)
+        if len(data):
+            data = data[self._suppress(data)]
+            data = data[self._inside_mask(data, shape)]
+        return SimpleNamespace(boxes=Boxes(data, shape[:2]))
+
+    def _suppress(self, data):
+        """NMS por clase; también quita cajas contenidas casi por completo en otra (cortes de mosaico)"""
+        boxes, scores, classes = data[:, :4], data[:, 4], data[:, 5]
+        areas = np.maximum(boxes[:, 2] - boxes[:, 0], 0) * np.maximum(boxes[:, 3] - boxes[:, 1], 0)
+        order = np.argsort(-scores)
+        keep = []
+        while len(order):
+            best, rest = order[0], order[1:]
+            keep.append(best)
+            xx1 = np.maximum(boxes[best, 0], boxes[rest, 0])
+            yy1 = np.maximum(boxes[best, 1], boxes[rest, 1])
+            xx2 = np.minimum(boxes[best, 2], boxes[rest, 2])
+            yy2 = np.minimum(boxes[best, 3], boxes[rest, 3])
+            inter = np.maximum(xx2 - xx1, 0) * np.maximum(yy2 - yy1, 0)
+            iou = inter / np.maximum(areas[best] + areas[rest] - inter, 1e-6)
+            contained = inter / np.maximum(np.minimum(areas[best], areas[rest]), 1e-6)
+            same_class = classes[rest] == classes[best]
+            duplicate = same_class & ((iou > self.iou_threshold) | (contained > self.containment))
+            order = rest[~duplicate]
+        return np.array(keep, dtype=np.int64)
+
+    def _inside_mask(self, data, shape):
+        """Solo cajas cuyo punto inferior central (los pies) cae en la zona transitable"""
+        mask = self._mask_for(shape[:2])[0]
+        if mask is None:
+            return np.ones(len(data), dtype=bool)
+        height, width = mask.shape
+        x = np.clip(((data[:, 0] + data[:, 2]) / 2).astype(np.int64), 0, width - 1)
+        y = np.clip(data[:, 3].astype(np.int64), 0, height - 1)
+        return mask[y, x] > 0
+
+def load_rois(rois):
+    """
+    Acepta {camera_id: config} o la ruta a un JSON con ese formato y regresa
+    {camera_id: CameraROI}
+    """
+    if rois is None:
+        return {}
+    if isinstance(rois, str):
+        with open(rois) as f:
+            rois = json.load(f)
+    return {int(camera_id): CameraROI.from_config(config) for camera_id, config in rois.items()}
@@ -0,0 +1,78 @@
+import argparse
+import importlib
+import logging
+from werkzeug.serving import make_server
+
+try:
+    from waitress import create_server
+except ImportError:
+    create_server = None
+
+logger = logging.getLogger(__name__)
+
+# Production serving for the Flask controllers (Controller, Controller2, WealthTransfer_Flask).
+#
+# The model is a module global, so there is exactly one process: requests are
+# served by a pool of threads in the process that owns the model (the
+# modules serialize model access themselves) instead of forked workers with
+# diverging copies of the model. controller3/controller4 do not need this,
+# ControllerCore already serves them from a single asyncio loop.
+#
+# The module must define app; if it defines channel (a ChannelServer) it is
+# started alongside, and shutdown() is called when the server stops.
+#
+#   python serve.py Controller2 --threads 8
+
+def serve(module_name, host='0.0.0.0', port=5000, threads=8, connection_limit=100, channel_timeout=60,
+          backlog=64):
+    module = importlib.import_module(module_name)
+    channel = getattr(module, 'channel', None)
+    if channel is not None:
+        channel.start()
+
+    if create_server is not None:
+        server = create_server(module.app, host=host, port=port, threads=threads,
+                               connection_limit=connection_limit, channel_timeout=channel_timeout,
+                               backlog=backlog, ident=module_name)
+        run = server.run
+        close = server.close
+        logger.info(f"Serving {module_name} with waitress on http://{host}:{port} ({threads} threads)")
+    else:
+        # Thread per connection, with no thread or connection limit. Werkzeug answers
+        # HTTP/1.1 but sends Connection: close, so every request opens a new connection
+        server = make_server(host, port, module.app, threaded=True)
+        run = server.serve_forever
+        close = server.server_close
+        logger.warning(f"waitress is not installed, serving {module_name} with the threaded Werkzeug "
+                       f"server on http://{host}:{port} (no keep-alive, --threads and --connection-limit "
+                       f"are ignored)")
+
+    try:
+        run()
+    except KeyboardInterrupt:
+        logger.info("Server stopped by user")
+    finally:
+        close()
+        if channel is not None:
+            channel.stop()
+        shutdown = getattr(module, 'shutdown', None)
+        if shutdown is not None:
+            shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a Flask controller without the development server")
+    parser.add_argument('module', help="Controller module, e.g. Controller2")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=8, help="Request threads (waitress)")
+    parser.add_argument('--connection-limit', type=int, default=100, help="Open connections (waitress)")
+    parser.add_argument('--keep-alive', type=int, default=60, help="Seconds an idle connection is kept (waitress)")
+    parser.add_argument('--backlog', type=int, default=64)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    serve(args.module, host=args.host, port=args.port, threads=args.threads,
+          connection_limit=args.connection_limit, channel_timeout=args.keep_alive, backlog=args.backlog)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import numpy as np
+
+class TrackHistory:
+    """
+    Registro de los tracks de una cámara en arreglos de tamaño fijo.
+
+    Cada track ocupa un slot con un ring de las últimas history_length
+    posiciones normalizadas; la validación (movimiento máximo y tiempo mínimo
+    de detección) se calcula para todas las cajas del frame a la vez.
+
+    La expiración usa una rueda de tiempo: cada track se agenda en la cubeta
+    del tick en que se vio por última vez y expire() solo revisa las cubetas
+    cuyo tick ya venció, así tocar y expirar cuestan O(1) por track sin barrer
+    todo el registro. max_tracks limita los tracks vivos por cámara; al
+    llenarse se desaloja el que lleva más tiempo sin verse.
+    """
+
+    def __init__(self, min_detection_time=0.1, max_position_change=1000, history_length=10,
+                 max_age=1.0, max_tracks=256, tick=0.05, capacity=64):
+        self.min_detection_time = min_detection_time
+        self.max_position_change = max_position_change
+        self.history_length = history_length
+        self.max_age = max_age
+        self.max_tracks = max_tracks
+        self.tick = tick
+
+        self.slot_of = {}  # track_id -> slot
+        self.track_of = np.full(capacity, -1, dtype=np.int64)
+        self.free_slots = list(range(capacity - 1, -1, -1))
+
+        self.positions = np.zeros((capacity, history_length, 2), dtype=np.float32)
+        self.head = np.zeros(capacity, dtype=np.int64)  # Índice de la última posición escrita
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.first_seen = np.zeros(capacity, dtype=np.float64)
+        self.last_seen = np.zeros(capacity, dtype=np.float64)
+        self.last_detected = np.zeros(capacity, dtype=np.float64)  # Último frame que pasó por el detector
+        self.confirmed = np.zeros(capacity, dtype=bool)
+
+        # Rueda de tiempo: cubre más de max_age para que una cubeta se vacíe antes de reutilizarse
+        self.num_buckets = int(np.ceil(max_age / tick)) + 2
+        self.wheel = [[] for _ in range(self.num_buckets)]
+        self.bucket_tick = np.full(capacity, -1, dtype=np.int64)  # Tick en que se agendó cada slot
+        self.expired_tick = None  # Último tick ya procesado
+
+        # Estadísticas
+        self.expired_total = 0
+        self.evicted_total = 0
+
+    @property
+    def capacity(self):
+        return len(self.track_of)
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def _grow(self):
+        old = self.capacity
+        new = old * 2
+        for name in ('positions', 'head', 'count', 'first_seen', 'last_seen', 'last_detected', 'confirmed'):
+            array = getattr(self, name)
+            grown = np.zeros((new,) + array.shape[1:], dtype=array.dtype)
+            grown[:old] = array
+            setattr(self, name, grown)
+        for name in ('track_of', 'bucket_tick'):
+            array = getattr(self, name)
+            grown = np.full(new, -1, dtype=np.int64)
+            grown[:old] = array
+            setattr(self, name, grown)
+        self.free_slots.extend(range(new - 1, old - 1, -1))
+
+    def _release(self, slot):
+        del self.slot_of[int(self.track_of[slot])]
+        self.track_of[slot] = -1
+        self.bucket_tick[slot] = -1
+        self.free_slots.append(slot)
+
+    def _evict_oldest(self, protected):
+        """Desaloja el track que lleva más tiempo sin verse (fuera de los del frame actual)"""
+        active = np.flatnonzero(self.track_of >= 0)
+        active = active[~np.isin(active, protected)]
+        if len(active) == 0:
+            return
+        self._release(int(active[np.argmin(self.last_seen[active])]))
+        self.evicted_total += 1
+
+    def _slots_for(self, track_ids):
+        """Regresa los slots de los tracks y una máscara de los que son nuevos"""
+        slots = np.empty(len(track_ids), dtype=np.int64)
+        is_new = np.zeros(len(track_ids), dtype=bool)
+        for i, track_id in enumerate(track_ids.tolist()):
+            slot = self.slot_of.get(track_id)
+            if slot is None:
+                if len(self.slot_of) >= self.max_tracks:
+                    self._evict_oldest(slots[:i])
+                if not self.free_slots:
+                    self._grow()
+                slot = self.free_slots.pop()
+                self.slot_of[track_id] = slot
+                self.track_of[slot] = track_id
+                is_new[i] = True
+            slots[i] = slot
+        return slots, is_new
+
+    def update(self, track_ids, positions, current_time):
+        """
+        Registra las posiciones (N, 2) de los tracks del frame.
+        Regresa (válidas, tiempo_de_tracking) como arreglos de tamaño N.
+        """
+        track_ids = np.asarray(track_ids, dtype=np.int64)
+        positions = np.asarray(positions, dtype=np.float32)
+        if len(track_ids) == 0:
+            return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.float64)
+
+        slots, is_new = self._slots_for(track_ids)
+        self.last_seen[slots] = current_time
+        self.last_detected[slots] = current_time
+        self._schedule(slots, current_time)
+
+        # Verificar si el movimiento es realista respecto a la última posición
+        last_positions = self.positions[slots, self.head[slots]]
+        position_change = np.hypot(*(positions - last_positions).T)
+        jumped = ~is_new & (position_change > self.max_position_change)
+
+        # Tracks nuevos o con un salto muy grande reinician su historia
+        reset = is_new | jumped
+        reset_slots = slots[reset]
+        self.head[reset_slots] = 0
+        self.count[reset_slots] = 1
+        self.positions[reset_slots, 0] = positions[reset]
+        self.first_seen[reset_slots] = current_time
+        self.confirmed[reset_slots] = False
+
+        # Los demás agregan la posición a su ring
+        keep = ~reset
+        keep_slots = slots[keep]
+        self.head[keep_slots] = (self.head[keep_slots] + 1) % self.history_length
+        self.positions[keep_slots, self.head[keep_slots]] = positions[keep]
+        self.count[keep_slots] = np.minimum(self.count[keep_slots] + 1, self.history_length)
+
+        # Confirmar los que cumplen el tiempo mínimo de detección continua
+        tracking_time = current_time - self.first_seen[slots]
+        self.confirmed[keep_slots] |= tracking_time[keep] >= self.min_detection_time
+        valid = keep & self.confirmed[slots]
+        return valid, tracking_time
+
+    def keep_alive(self, current_time):
+        """
+        Marca como vistos a los tracks confirmados (frames que no pasaron por
+        el detector), solo hasta max_age después de su última detección real
+        para que una escena quieta no los mantenga vivos para siempre;
+        regresa cuántos siguen vivos
+        """
+        slots = np.flatnonzero(self.confirmed & (self.track_of >= 0)
+                               & (current_time - self.last_detected < self.max_age))
+        self.last_seen[slots] = current_time
+        self._schedule(slots, current_time)
+        return len(slots)
+
+    def _schedule(self, slots, current_time):
+        """Agenda los slots en la cubeta del tick actual (solo si cambiaron de tick)"""
+        tick = int(current_time // self.tick)
+        moved = slots[self.bucket_tick[slots] != tick]
+        if len(moved):
+            self.bucket_tick[moved] = tick
+            self.wheel[tick % self.num_buckets].extend(moved.tolist())
+
+    def expire(self, current_time):
+        """Elimina los tracks que no se han visto en max_age segundos; regresa cuántos"""
+        last_due = int((current_time - self.max_age) // self.tick) - 1
+        if self.expired_tick is None:
+            self.expired_tick = last_due
+            return 0
+        if last_due <= self.expired_tick:
+            return 0
+
+        # Después de mucho tiempo sin llamar basta con recorrer la rueda una vez
+        first = max(self.expired_tick + 1, last_due - self.num_buckets + 1)
+        expired = 0
+        for tick in range(first, last_due + 1):
+            index = tick % self.num_buckets
+            remaining = []
+            for slot in self.wheel[index]:
+                scheduled = self.bucket_tick[slot]
+                if scheduled < 0:
+                    continue  # El slot ya se liberó
+                if scheduled <= tick:
+                    self._release(slot)
+                    expired += 1
+                elif scheduled % self.num_buckets == index:
+                    remaining.append(slot)  # Reagendado en una vuelta posterior de la rueda
+            self.wheel[index] = remaining
+
+        self.expired_tick = last_due
+        self.expired_total += expired
+        return expired
+
+    def stats(self):
+        return {
+            'live': len(self.slot_of),
+            'expired': self.expired_total,
+            'evicted': self.evicted_total,
+            'capacity': self.capacity
+        }
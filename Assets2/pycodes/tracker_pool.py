@@ -0,0 +1,72 @@
+import threading
+import logging
+import numpy as np
+from ultralytics.trackers.byte_tracker import BYTETracker
+from ultralytics.trackers.bot_sort import BOTSORT
+from ultralytics.utils import IterableSimpleNamespace, yaml_load
+from ultralytics.utils.checks import check_yaml
+
+logger = logging.getLogger(__name__)
+
+TRACKER_MAP = {'bytetrack': BYTETracker, 'botsort': BOTSORT}
+
+# Columnas del arreglo que regresa update(): x1, y1, x2, y2, track_id, conf, cls, idx
+EMPTY_TRACKS = np.zeros((0, 8), dtype=np.float32)
+
+class TrackerPool:
+    """
+    Pool de trackers independientes, uno por cámara/agente.
+
+    El detector se comparte (y puede correr en batch) mientras que la asociación
+    de IDs se mantiene separada por stream, así los IDs de una cámara no se
+    mezclan con los de otra.
+    """
+
+    def __init__(self, tracker='bytetrack.yaml', frame_rate=30):
+        self.cfg = IterableSimpleNamespace(**yaml_load(check_yaml(tracker)))
+        if self.cfg.tracker_type not in TRACKER_MAP:
+            raise ValueError(f"Unsupported tracker type: {self.cfg.tracker_type}")
+        self.tracker_class = TRACKER_MAP[self.cfg.tracker_type]
+        self.frame_rate = frame_rate
+        self.trackers = {}
+        self.lock = threading.Lock()
+
+    def get(self, stream_id):
+        """Regresa el tracker del stream, creándolo si no existe"""
+        with self.lock:
+            tracker = self.trackers.get(stream_id)
+            if tracker is None:
+                tracker = self.tracker_class(args=self.cfg, frame_rate=self.frame_rate)
+                self.trackers[stream_id] = tracker
+                logger.info(f"Created {self.cfg.tracker_type} tracker for stream {stream_id}")
+            return tracker
+
+    def update(self, stream_id, result, frame):
+        """
+        Asocia el resultado del detector con el tracker del stream.
+        Debe llamarse en cada frame procesado (aun sin detecciones) para que los
+        tracks envejezcan correctamente.
+        """
+        tracker = self.get(stream_id)
+        if result is None or result.boxes is None:
+            return EMPTY_TRACKS
+
+        tracks = tracker.update(result.boxes.cpu().numpy(), frame)
+        if len(tracks) == 0:
+            return EMPTY_TRACKS
+        return tracks
+
+    def reset(self, stream_id):
+        """Reinicia el estado de asociación de un stream"""
+        with self.lock:
+            tracker = self.trackers.get(stream_id)
+        if tracker is not None:
+            tracker.reset()
+
+    def remove(self, stream_id):
+        with self.lock:
+            self.trackers.pop(stream_id, None)
+
+    def streams(self):
+        with self.lock:
+            return list(self.trackers.keys())
@@ -0,0 +1,286 @@
+import argparse
+import json
+import selectors
+import socket
+import struct
+import threading
+import time
+import logging
+from frame_transport import parse_datagram, restamp_datagram
+from perf_stats import PipelineStats
+
+logger = logging.getLogger(__name__)
+
+# Archivo de grabación: encabezado 'UDPR' | version u8, luego un registro por datagrama:
+#   tiempo desde el inicio f64 | puerto destino u16 | longitud u32 | datagrama
+FILE_MAGIC = b'UDPR'
+FILE_VERSION = 1
+FILE_HEADER = struct.Struct('<4sB')
+RECORD = struct.Struct('<dHI')
+
+def record(ports, path, duration=None, host='0.0.0.0', rcvbuf=1 << 20):
+    """Graba los datagramas que llegan a los puertos hasta duration segundos o Ctrl+C"""
+    selector = selectors.DefaultSelector()
+    for port in ports:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        sock.bind((host, port))
+        sock.setblocking(False)
+        selector.register(sock, selectors.EVENT_READ, port)
+
+    counts = {port: 0 for port in ports}
+    start = time.time()
+    logger.info(f"Recording ports {list(ports)} to {path}")
+    try:
+        with open(path, 'wb') as out:
+            out.write(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION))
+            while duration is None or time.time() - start < duration:
+                for key, _ in selector.select(timeout=0.5):
+                    try:
+                        data = key.fileobj.recv(65535)
+                    except BlockingIOError:
+                        continue
+                    out.write(RECORD.pack(time.time() - start, key.data, len(data)))
+                    out.write(data)
+                    counts[key.data] += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+        selector.close()
+    logger.info(f"Recorded datagrams per port: {counts}")
+    return counts
+
+def read_recording(path):
+    """Regresa la lista de (tiempo, puerto, datagrama) de una grabación"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version = FILE_HEADER.unpack_from(data)
+    if magic != FILE_MAGIC or version != FILE_VERSION:
+        raise ValueError(f"Not a UDP recording (version {FILE_VERSION}): {path}")
+
+    records = []
+    offset = FILE_HEADER.size
+    while offset + RECORD.size <= len(data):
+        timestamp, port, length = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        records.append((timestamp, port, data[offset:offset + length]))
+        offset += length
+    return records
+
+def _header(datagram):
+    try:
+        return parse_datagram(datagram)[0]
+    except ValueError:
+        return None
+
+def _starts_frame(datagram):
+    """True para el primer trozo de un frame (o un datagrama del formato anterior)"""
+    header = _header(datagram)
+    return header is not None and header.chunk_index == 0
+
+class Replayer:
+    """
+    Reenvía una grabación a los receptores. speed=1 respeta los tiempos
+    originales, speed>1 los acelera y speed<=0 envía lo más rápido posible.
+    Con restamp los frames llevan la hora de reenvío para medir la latencia.
+    """
+
+    def __init__(self, records, host='127.0.0.1', port_offset=0, speed=1.0, restamp=True, loops=1):
+        self.records = records
+        self.host = host
+        self.port_offset = port_offset
+        self.speed = speed
+        self.restamp = restamp
+        self.loops = loops
+        self.running = False
+
+        # Cada vuelta continúa la secuencia de la anterior; si repitiera los mismos
+        # números el receptor descartaría las vueltas 2..N como frames atrasados
+        seqs = [header.seq for header in map(_header, (datagram for _, _, datagram in records))
+                if header is not None and header.seq is not None]
+        self.seq_span = max(seqs) - min(seqs) + 1 if seqs else 0
+
+        # Frames enviados por puerto destino
+        self.frames_sent = {}
+        self.datagrams_sent = 0
+
+    def run(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.running = True
+        frame_times = {}  # (puerto, camera_id, seq) del frame en curso -> timestamp nuevo
+        try:
+            for loop in range(self.loops):
+                seq_offset = loop * self.seq_span
+                start = time.time()
+                for offset, port, datagram in self.records:
+                    if not self.running:
+                        return
+                    if self.speed > 0:
+                        delay = offset / self.speed - (time.time() - start)
+                        if delay > 0:
+                            time.sleep(delay)
+
+                    target_port = port + self.port_offset
+                    first_chunk = _starts_frame(datagram)
+                    if self.restamp or seq_offset:
+                        header = _header(datagram)
+                        if header is not None and header.seq is not None:
+                            timestamp = None
+                            if self.restamp:
+                                key = (target_port, header.camera_id)
+                                frame = frame_times.get(key)
+                                if frame is None or frame[0] != header.seq + seq_offset:
+                                    frame = frame_times[key] = (header.seq + seq_offset, time.time())
+                                timestamp = frame[1]
+                            datagram = restamp_datagram(datagram, timestamp, seq_offset)
+
+                    sock.sendto(datagram, (self.host, target_port))
+                    self.datagrams_sent += 1
+                    if first_chunk:
+                        self.frames_sent[target_port] = self.frames_sent.get(target_port, 0) + 1
+        finally:
+            self.running = False
+            sock.close()
+
+    def stop(self):
+        self.running = False
+
+def _start_pipeline(pipeline, num_streams, base_port, perf):
+    """Arranca el receptor en este proceso; regresa la función para detenerlo"""
+    if pipeline == 'static':
+        from StaticCameras import SecurityCameraSystem
+        system = SecurityCameraSystem(num_cameras=num_streams, base_port=base_port, perf=perf)
+        stop_event = threading.Event()
+        thread = threading.Thread(target=system.run_until, args=(stop_event,), name="BenchPipeline")
+        thread.daemon = True
+        thread.start()
+
+        def stop():
+            stop_event.set()
+            thread.join(timeout=5.0)
+            stats = {'ingest': system.ingest.stats(), 'scheduler': system.scheduler.stats()}
+            system.stop()
+            return stats
+        return stop
+
+    from CameraController import AgentVisionReceiver
+    receiver = AgentVisionReceiver(num_agents=num_streams, base_port=base_port, headless=True, perf=perf)
+    receiver.ingest.start()
+
+    def stop():
+        receiver.ingest.stop()
+        stats = {'ingest': receiver.ingest.stats()}
+        receiver.stop()
+        return stats
+    return stop
+
+def run_benchmark(path, pipeline='static', speed=1.0, loops=1, base_port=None, settle=2.0, drain=2.0):
+    """
+    Reproduce la grabación contra el receptor en este mismo proceso y regresa
+    el reporte por stream: frames enviados/procesados/perdidos, fps y
+    percentiles de decode, infer, post y latencia.
+    """
+    records = read_recording(path)
+    ports = sorted({port for _, port, _ in records})
+    if not ports:
+        raise ValueError(f"Empty recording: {path}")
+    if base_port is None:
+        base_port = ports[0]
+    port_offset = base_port - ports[0]
+    num_streams = ports[-1] - ports[0] + 1
+
+    perf = PipelineStats()
+    stop_pipeline = _start_pipeline(pipeline, num_streams, base_port, perf)
+    try:
+        # Tiempo para abrir los sockets antes de empezar a medir
+        time.sleep(settle)
+        perf.reset()
+        replayer = Replayer(records, port_offset=port_offset, speed=speed, loops=loops)
+        replayer.run()
+        time.sleep(drain)
+        summary = perf.summary()
+    finally:
+        pipeline_stats = stop_pipeline()
+
+    streams = {}
+    for port, sent in sorted(replayer.frames_sent.items()):
+        stream_id = port - base_port
+        stream = summary.get(stream_id, {'frames': 0, 'fps': 0.0, 'stages': {}})
+        streams[stream_id] = {
+            'frames_sent': sent,
+            'frames_processed': stream['frames'],
+            'frames_dropped': max(0, sent - stream['frames']),
+            'fps': stream['fps'],
+            'stages': stream['stages']
+        }
+    return {
+        'pipeline': pipeline,
+        'speed': speed,
+        'streams': streams,
+        'shared': {str(key): value for key, value in summary.items() if key not in streams},
+        'pipeline_stats': pipeline_stats
+    }
+
+def format_report(report):
+    lines = [f"Pipeline: {report['pipeline']} (speed {report['speed']})"]
+    for stream_id, stream in report['streams'].items():
+        lines.append(f"  stream {stream_id}: {stream['frames_processed']}/{stream['frames_sent']} frames, "
+                     f"{stream['frames_dropped']} dropped, {stream['fps']:.1f} fps")
+        for stage, stats in stream['stages'].items():
+            lines.append(f"    {stage:8s} mean {stats['mean_ms']:7.2f} ms  p50 {stats['p50_ms']:7.2f}  "
+                         f"p95 {stats['p95_ms']:7.2f}  p99 {stats['p99_ms']:7.2f}")
+    for name, shared in report['shared'].items():
+        for stage, stats in shared['stages'].items():
+            lines.append(f"  {name} {stage}: mean {stats['mean_ms']:.2f} ms, p95 {stats['p95_ms']:.2f} ms "
+                         f"over {stats['count']} calls")
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Record, replay and benchmark the UDP camera streams")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = commands.add_parser('record', help="Record camera datagrams to a file")
+    record_parser.add_argument('path')
+    record_parser.add_argument('--ports', type=int, nargs='+', required=True)
+    record_parser.add_argument('--duration', type=float, default=None)
+
+    replay_parser = commands.add_parser('replay', help="Send a recording to the receivers")
+    replay_parser.add_argument('path')
+    replay_parser.add_argument('--host', default='127.0.0.1')
+    replay_parser.add_argument('--port-offset', type=int, default=0)
+    replay_parser.add_argument('--speed', type=float, default=1.0, help="0 = as fast as possible")
+    replay_parser.add_argument('--loops', type=int, default=1)
+
+    bench_parser = commands.add_parser('bench', help="Replay against an in-process receiver and report")
+    bench_parser.add_argument('path')
+    bench_parser.add_argument('--pipeline', choices=('static', 'drone'), default='static')
+    bench_parser.add_argument('--speed', type=float, default=1.0, help="0 = as fast as possible")
+    bench_parser.add_argument('--loops', type=int, default=1)
+    bench_parser.add_argument('--base-port', type=int, default=None)
+    bench_parser.add_argument('--json', default=None, help="Write the report to this file")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == 'record':
+        record(args.ports, args.path, duration=args.duration)
+    elif args.command == 'replay':
+        replayer = Replayer(read_recording(args.path), host=args.host, port_offset=args.port_offset,
+                            speed=args.speed, loops=args.loops)
+        try:
+            replayer.run()
+        except KeyboardInterrupt:
+            replayer.stop()
+        logger.info(f"Frames sent per port: {replayer.frames_sent}")
+    else:
+        report = run_benchmark(args.path, pipeline=args.pipeline, speed=args.speed,
+                               loops=args.loops, base_port=args.base_port)
+        print(format_report(report))
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(report, f, indent=2, default=str)
+
+if __name__ == "__main__":
+    main()
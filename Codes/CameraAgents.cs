@@ -1,5 +1,6 @@
 using UnityEngine;
 using System;
+using System.Net;
 using System.Net.Sockets;
 using System.Threading;
 using System.Collections;
@@ -13,6 +14,8 @@ public class AgentVisionController : MonoBehaviour
     [SerializeField] private int streamPort = 5123; // Cambiado para coincidir con Python
     [SerializeField] private int quality = 75;
     [SerializeField] private float captureInterval = 0.033f;
+    [SerializeField] private int maxChunkSize = FramePacketizer.DefaultChunkSize;
+    [SerializeField] private bool acceptRateFeedback = true; // Python puede ajustar tasa, calidad y resolución
 
     private Camera agentCamera;
     private RenderTexture renderTexture;
@@ -25,6 +28,13 @@ public class AgentVisionController : MonoBehaviour
     private Thread streamThread;
     private bool isStreaming = true;
     private ConcurrentQueue<byte[]> frameQueue = new ConcurrentQueue<byte[]>();
+    private uint frameSeq = 0;
+
+    // Ajustes recibidos de Python, se aplican en el hilo principal antes de la siguiente captura
+    private Thread feedbackThread;
+    private readonly object settingsLock = new object();
+    private RateSettings pendingSettings;
+    private bool hasPendingSettings = false;
 
     void Start()
     {
@@ -65,9 +75,15 @@ public class AgentVisionController : MonoBehaviour
     {
         try
         {
-            udpClient = new UdpClient();
+            // Puerto local fijo desde el inicio: Python responde a la dirección de donde llegan los frames
+            udpClient = new UdpClient(0);
             streamThread = new Thread(StreamFrames);
             streamThread.Start();
+            if (acceptRateFeedback)
+            {
+                feedbackThread = new Thread(ReceiveFeedback);
+                feedbackThread.Start();
+            }
             Debug.Log($"Drone {agentId}: Started UDP streaming on port {streamPort + agentId}"); // Debug log
         }
         catch (Exception e)
@@ -83,6 +99,11 @@ public class AgentVisionController : MonoBehaviour
 
         while (isStreaming)
         {
+            if (ApplyPendingSettings())
+            {
+                waitInterval = new WaitForSeconds(captureInterval);
+            }
+
             if (isCapturing)
             {
                 RenderTexture.active = renderTexture;
@@ -92,12 +113,10 @@ public class AgentVisionController : MonoBehaviour
                 RenderTexture.active = null;
 
                 byte[] frameData = screenShot.EncodeToJPG(quality);
-                byte[] header = BitConverter.GetBytes(agentId);
-                byte[] packetData = new byte[header.Length + frameData.Length];
-                header.CopyTo(packetData, 0);
-                frameData.CopyTo(packetData, header.Length);
-
-                frameQueue.Enqueue(packetData);
+                foreach (byte[] packetData in FramePacketizer.Packetize(agentId, frameSeq++, frameData, maxChunkSize))
+                {
+                    frameQueue.Enqueue(packetData);
+                }
                 
                 frameCount++;
                 if (frameCount % 10000 == 0) // Log cada 10000 frames
@@ -110,6 +129,70 @@ public class AgentVisionController : MonoBehaviour
         }
     }
 
+    void ReceiveFeedback()
+    {
+        IPEndPoint remote = new IPEndPoint(IPAddress.Any, 0);
+        while (isStreaming)
+        {
+            try
+            {
+                byte[] data = udpClient.Receive(ref remote);
+                if (RateFeedback.TryParse(data, agentId, out RateSettings settings))
+                {
+                    lock (settingsLock)
+                    {
+                        pendingSettings = settings;
+                        hasPendingSettings = true;
+                    }
+                }
+            }
+            catch (ObjectDisposedException)
+            {
+                break;
+            }
+            catch (SocketException)
+            {
+                // En Windows un envío a un puerto cerrado reporta ConnectionReset en el siguiente Receive
+                if (!isStreaming) break;
+                Thread.Sleep(10);
+            }
+        }
+    }
+
+    private bool ApplyPendingSettings()
+    {
+        RateSettings settings;
+        lock (settingsLock)
+        {
+            if (!hasPendingSettings) return false;
+            settings = pendingSettings;
+            hasPendingSettings = false;
+        }
+
+        captureInterval = settings.CaptureInterval;
+        quality = settings.Quality;
+        if (settings.Width != captureWidth || settings.Height != captureHeight)
+        {
+            captureWidth = settings.Width;
+            captureHeight = settings.Height;
+            ResizeCapture();
+        }
+        Debug.Log($"Drone {agentId}: rate settings interval={captureInterval}s quality={quality} size={captureWidth}x{captureHeight}");
+        return true;
+    }
+
+    private void ResizeCapture()
+    {
+        agentCamera.targetTexture = null;
+        renderTexture.Release();
+        Destroy(renderTexture);
+        Destroy(screenShot);
+
+        renderTexture = new RenderTexture(captureWidth, captureHeight, 24);
+        screenShot = new Texture2D(captureWidth, captureHeight, TextureFormat.RGB24, false);
+        agentCamera.targetTexture = renderTexture;
+    }
+
     void StreamFrames()
     {
         int sentCount = 0;
@@ -150,6 +233,10 @@ public class AgentVisionController : MonoBehaviour
         {
             udpClient.Close();
         }
+        if (feedbackThread != null && feedbackThread.IsAlive)
+        {
+            feedbackThread.Join(1000);
+        }
         if (renderTexture != null)
         {
             renderTexture.Release();
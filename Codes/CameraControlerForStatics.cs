@@ -1,5 +1,6 @@
 using UnityEngine;
 using System;
+using System.Net;
 using System.Net.Sockets;
 using System.Threading;
 using System.Collections;
@@ -12,6 +13,8 @@ public class StaticSecurityCamera : MonoBehaviour
     [SerializeField] private int streamPort = 5124;
     [SerializeField] private int quality = 75;
     [SerializeField] private float captureInterval = 0.033f;
+    [SerializeField] private int maxChunkSize = FramePacketizer.DefaultChunkSize;
+    [SerializeField] private bool acceptRateFeedback = true; // Python puede ajustar tasa, calidad y resolución
     [SerializeField] private float rotationSpeed = 30f; // Velocidad de rotación en grados por segundo
     [SerializeField] private float maxRotationAngle = 45f; // Ángulo máximo de rotación a cada lado
 
@@ -24,6 +27,13 @@ public class StaticSecurityCamera : MonoBehaviour
     private Thread streamThread;
     private bool isStreaming = true;
     private ConcurrentQueue<byte[]> frameQueue = new ConcurrentQueue<byte[]>();
+    private uint frameSeq = 0;
+
+    // Ajustes recibidos de Python, se aplican en el hilo principal antes de la siguiente captura
+    private Thread feedbackThread;
+    private readonly object settingsLock = new object();
+    private RateSettings pendingSettings;
+    private bool hasPendingSettings = false;
 
     // Variables para el control de movimiento
     private bool isRotatingRight = true;
@@ -62,9 +72,15 @@ public class StaticSecurityCamera : MonoBehaviour
     {
         try
         {
-            udpClient = new UdpClient();
+            // Puerto local fijo desde el inicio: Python responde a la dirección de donde llegan los frames
+            udpClient = new UdpClient(0);
             streamThread = new Thread(StreamFrames);
             streamThread.Start();
+            if (acceptRateFeedback)
+            {
+                feedbackThread = new Thread(ReceiveFeedback);
+                feedbackThread.Start();
+            }
             Debug.Log($"Camera {cameraId}: Started UDP streaming on port {streamPort + cameraId}");
         }
         catch (Exception e)
@@ -131,6 +147,11 @@ public class StaticSecurityCamera : MonoBehaviour
         WaitForSeconds waitInterval = new WaitForSeconds(captureInterval);
         while (isStreaming)
         {
+            if (ApplyPendingSettings())
+            {
+                waitInterval = new WaitForSeconds(captureInterval);
+            }
+
             if (isCapturing)
             {
                 RenderTexture.active = renderTexture;
@@ -140,17 +161,79 @@ public class StaticSecurityCamera : MonoBehaviour
                 RenderTexture.active = null;
 
                 byte[] frameData = screenShot.EncodeToJPG(quality);
-                byte[] header = BitConverter.GetBytes(cameraId);
-                byte[] packetData = new byte[header.Length + frameData.Length];
-                header.CopyTo(packetData, 0);
-                frameData.CopyTo(packetData, header.Length);
-
-                frameQueue.Enqueue(packetData);
+                foreach (byte[] packetData in FramePacketizer.Packetize(cameraId, frameSeq++, frameData, maxChunkSize))
+                {
+                    frameQueue.Enqueue(packetData);
+                }
             }
             yield return waitInterval;
         }
     }
 
+    void ReceiveFeedback()
+    {
+        IPEndPoint remote = new IPEndPoint(IPAddress.Any, 0);
+        while (isStreaming)
+        {
+            try
+            {
+                byte[] data = udpClient.Receive(ref remote);
+                if (RateFeedback.TryParse(data, cameraId, out RateSettings settings))
+                {
+                    lock (settingsLock)
+                    {
+                        pendingSettings = settings;
+                        hasPendingSettings = true;
+                    }
+                }
+            }
+            catch (ObjectDisposedException)
+            {
+                break;
+            }
+            catch (SocketException)
+            {
+                // En Windows un envío a un puerto cerrado reporta ConnectionReset en el siguiente Receive
+                if (!isStreaming) break;
+                Thread.Sleep(10);
+            }
+        }
+    }
+
+    private bool ApplyPendingSettings()
+    {
+        RateSettings settings;
+        lock (settingsLock)
+        {
+            if (!hasPendingSettings) return false;
+            settings = pendingSettings;
+            hasPendingSettings = false;
+        }
+
+        captureInterval = settings.CaptureInterval;
+        quality = settings.Quality;
+        if (settings.Width != captureWidth || settings.Height != captureHeight)
+        {
+            captureWidth = settings.Width;
+            captureHeight = settings.Height;
+            ResizeCapture();
+        }
+        Debug.Log($"Camera {cameraId}: rate settings interval={captureInterval}s quality={quality} size={captureWidth}x{captureHeight}");
+        return true;
+    }
+
+    private void ResizeCapture()
+    {
+        securityCamera.targetTexture = null;
+        renderTexture.Release();
+        Destroy(renderTexture);
+        Destroy(screenShot);
+
+        renderTexture = new RenderTexture(captureWidth, captureHeight, 24);
+        screenShot = new Texture2D(captureWidth, captureHeight, TextureFormat.RGB24, false);
+        securityCamera.targetTexture = renderTexture;
+    }
+
     void StreamFrames()
     {
         while (isStreaming)
@@ -185,6 +268,10 @@ public class StaticSecurityCamera : MonoBehaviour
         {
             udpClient.Close();
         }
+        if (feedbackThread != null && feedbackThread.IsAlive)
+        {
+            feedbackThread.Join(1000);
+        }
         if (renderTexture != null)
         {
             renderTexture.Release();
@@ -0,0 +1,119 @@
+using System;
+using System.IO;
+using System.Net.Sockets;
+using System.Text;
+//this is the persistent connection to the python decision server, its called DecisionChannel
+//the python side (decision_channel.py in pycodes) serves it, both must use the same frame layout
+public class DecisionChannel : IDisposable
+{
+    // magic 'DM' | version u8 | codec u8 | kind u8 | method u8 | seq u32 | length u32 | body (JSON)
+    public const byte Version = 1;
+    public const int HeaderSize = 14;
+    public const byte CodecJson = 0;
+    public const byte KindRequest = 0;
+    public const byte KindError = 2;
+
+    // Same order as METHODS in decision_channel.py
+    public const byte GetDecisions = 0;
+    public const byte Step = 1;
+    public const byte GetMetrics = 2;
+    public const byte Setup = 3;
+    public const byte Session = 4;
+
+    private readonly TcpClient client;
+    private readonly NetworkStream stream;
+    private uint seq = 0;
+
+    public DecisionChannel(string host, int port, int timeoutMs = 5000)
+    {
+        client = new TcpClient();
+        client.NoDelay = true;
+        client.ReceiveTimeout = timeoutMs;
+        client.SendTimeout = timeoutMs;
+        client.Connect(host, port);
+        stream = client.GetStream();
+    }
+
+    public bool Connected
+    {
+        get { return client != null && client.Connected; }
+    }
+
+    // Sends one JSON request and blocks until its response
+    public string Call(byte method, string json)
+    {
+        seq++;
+        byte[] body = Encoding.UTF8.GetBytes(json);
+        byte[] frame = new byte[HeaderSize + body.Length];
+        frame[0] = (byte)'D';
+        frame[1] = (byte)'M';
+        frame[2] = Version;
+        frame[3] = CodecJson;
+        frame[4] = KindRequest;
+        frame[5] = method;
+        WriteUInt32(frame, 6, seq);
+        WriteUInt32(frame, 10, (uint)body.Length);
+        Array.Copy(body, 0, frame, HeaderSize, body.Length);
+        stream.Write(frame, 0, frame.Length);
+
+        byte[] header = ReadExactly(HeaderSize);
+        if (header[0] != (byte)'D' || header[1] != (byte)'M' || header[2] != Version)
+        {
+            throw new IOException("Not a decision channel frame");
+        }
+        uint responseSeq = ReadUInt32(header, 6);
+        string response = Encoding.UTF8.GetString(ReadExactly((int)ReadUInt32(header, 10)));
+        if (responseSeq != seq)
+        {
+            throw new IOException($"Out of order response {responseSeq} != {seq}");
+        }
+        if (header[4] == KindError)
+        {
+            throw new IOException($"Decision channel error: {response}");
+        }
+        return response;
+    }
+
+    private byte[] ReadExactly(int length)
+    {
+        byte[] data = new byte[length];
+        int offset = 0;
+        while (offset < length)
+        {
+            int read = stream.Read(data, offset, length - offset);
+            if (read <= 0)
+            {
+                throw new IOException("Connection closed");
+            }
+            offset += read;
+        }
+        return data;
+    }
+
+    private static void WriteUInt32(byte[] data, int offset, uint value)
+    {
+        byte[] bytes = BitConverter.GetBytes(value);
+        if (!BitConverter.IsLittleEndian)
+        {
+            Array.Reverse(bytes);
+        }
+        Array.Copy(bytes, 0, data, offset, 4);
+    }
+
+    private static uint ReadUInt32(byte[] data, int offset)
+    {
+        byte[] bytes = new byte[4];
+        Array.Copy(data, offset, bytes, 0, 4);
+        if (!BitConverter.IsLittleEndian)
+        {
+            Array.Reverse(bytes);
+        }
+        return BitConverter.ToUInt32(bytes, 0);
+    }
+
+    public void Dispose()
+    {
+        stream?.Close();
+        client?.Close();
+    }
+}
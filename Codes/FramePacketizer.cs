@@ -0,0 +1,55 @@
+using System;
+using System.Collections.Generic;
+//this splits a JPEG frame into UDP datagrams with a versioned header, its called FramePacketizer
+//the python side (frame_transport.py in pycodes) reassembles them, both must use the same layout
+public static class FramePacketizer
+{
+    // magic 'VF' | version u8 | flags u8 | camera_id i32 | frame_seq u32 |
+    // chunk_index u16 | chunk_count u16 | timestamp f64 | payload
+    public const byte Version = 1;
+    public const int HeaderSize = 24;
+    public const int DefaultChunkSize = 60000;
+
+    public static List<byte[]> Packetize(int cameraId, uint frameSeq, byte[] frameData, int chunkSize = DefaultChunkSize)
+    {
+        int chunkCount = Math.Max(1, (frameData.Length + chunkSize - 1) / chunkSize);
+        if (chunkCount > ushort.MaxValue)
+        {
+            throw new ArgumentException($"Frame too large: {frameData.Length} bytes");
+        }
+
+        double timestamp = DateTimeOffset.UtcNow.ToUnixTimeMilliseconds() / 1000.0;
+        List<byte[]> packets = new List<byte[]>(chunkCount);
+
+        for (int index = 0; index < chunkCount; index++)
+        {
+            int offset = index * chunkSize;
+            int length = Math.Min(chunkSize, frameData.Length - offset);
+            byte[] packet = new byte[HeaderSize + length];
+
+            packet[0] = (byte)'V';
+            packet[1] = (byte)'F';
+            packet[2] = Version;
+            packet[3] = 0;
+            WriteLittleEndian(BitConverter.GetBytes(cameraId), packet, 4);
+            WriteLittleEndian(BitConverter.GetBytes(frameSeq), packet, 8);
+            WriteLittleEndian(BitConverter.GetBytes((ushort)index), packet, 12);
+            WriteLittleEndian(BitConverter.GetBytes((ushort)chunkCount), packet, 14);
+            WriteLittleEndian(BitConverter.GetBytes(timestamp), packet, 16);
+            Buffer.BlockCopy(frameData, offset, packet, HeaderSize, length);
+
+            packets.Add(packet);
+        }
+
+        return packets;
+    }
+
+    private static void WriteLittleEndian(byte[] bytes, byte[] target, int offset)
+    {
+        if (!BitConverter.IsLittleEndian)
+        {
+            Array.Reverse(bytes);
+        }
+        bytes.CopyTo(target, offset);
+    }
+}
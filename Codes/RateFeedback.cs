@@ -0,0 +1,62 @@
+using System;
+//this parses the rate control packets that the python receivers send back to the cameras, its called RateFeedback
+//the python side (rate_control.py in pycodes) builds them, both must use the same layout
+public struct RateSettings
+{
+    public float CaptureInterval;
+    public int Quality;
+    public int Width;
+    public int Height;
+}
+
+public static class RateFeedback
+{
+    // magic 'RC' | version u8 | quality u8 | camera_id i32 | capture_interval f32 | width u16 | height u16
+    public const byte Version = 1;
+    public const int PacketSize = 16;
+
+    public static bool TryParse(byte[] data, int cameraId, out RateSettings settings)
+    {
+        settings = new RateSettings();
+        if (data == null || data.Length < PacketSize || data[0] != (byte)'R' || data[1] != (byte)'C' || data[2] != Version)
+        {
+            return false;
+        }
+        if (ReadInt32(data, 4) != cameraId)
+        {
+            return false;
+        }
+
+        settings.Quality = Math.Max(1, Math.Min(100, (int)data[3]));
+        settings.CaptureInterval = Math.Max(0.001f, ReadSingle(data, 8));
+        settings.Width = Math.Max(16, (int)ReadUInt16(data, 12));
+        settings.Height = Math.Max(16, (int)ReadUInt16(data, 14));
+        return true;
+    }
+
+    private static byte[] ReadLittleEndian(byte[] data, int offset, int length)
+    {
+        byte[] bytes = new byte[length];
+        Array.Copy(data, offset, bytes, 0, length);
+        if (!BitConverter.IsLittleEndian)
+        {
+            Array.Reverse(bytes);
+        }
+        return bytes;
+    }
+
+    private static int ReadInt32(byte[] data, int offset)
+    {
+        return BitConverter.ToInt32(ReadLittleEndian(data, offset, 4), 0);
+    }
+
+    private static float ReadSingle(byte[] data, int offset)
+    {
+        return BitConverter.ToSingle(ReadLittleEndian(data, offset, 4), 0);
+    }
+
+    private static ushort ReadUInt16(byte[] data, int offset)
+    {
+        return BitConverter.ToUInt16(ReadLittleEndian(data, offset, 2), 0);
+    }
+}
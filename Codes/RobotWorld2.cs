@@ -3,6 +3,7 @@ using System.Collections;
 using System.Collections.Generic;
 using UnityEngine.Networking;
 using System.Text;
+using System.Threading.Tasks;
 //this is for controlling the robot agent the drone in the simulation its called RobotWorld2
 //this code is in folder Codes in the Assets
 public class RobotWorld : MonoBehaviour
@@ -11,6 +12,22 @@ public class RobotWorld : MonoBehaviour
     private List<RobotAgent> robots = new List<RobotAgent>();
     private int nextRobotId = 0; // Add counter for unique IDs
 
+    // Persistent binary connection instead of one HTTP request per tick (DecisionChannel.cs)
+    public bool useDecisionChannel = false;
+    public int decisionChannelPort = 5001;
+    private DecisionChannel channel;
+
+    // Delta session (/session): only robots that moved are sent and only changed decisions come back
+    public bool useDeltaUpdates = false;
+    public int fullSnapshotEvery = 100;
+    public float positionEpsilon = 0.01f;
+    private int sessionSeq = 0;
+    private int ackedSeq = 0; // Last response received; the server diffs decisions against it
+    private int ticksSinceFull = 0;
+    private Dictionary<string, Vector3> ackedPositions = null;
+    private Dictionary<string, Vector3> pendingPositions = new Dictionary<string, Vector3>();
+    private bool pendingFull = false;
+
     [System.Serializable]
     public class Target
     {
@@ -44,6 +61,7 @@ public class RobotWorld : MonoBehaviour
     [System.Serializable]
     public class Decision
     {
+        public string id;
         public string decision;
         public Target target;
 
@@ -55,6 +73,25 @@ public class RobotWorld : MonoBehaviour
         public List<Decision> decisions;
     }
 
+    [System.Serializable]
+    public class SessionRequest
+    {
+        public string session = "unity";
+        public int seq;
+        public int ack;
+        public bool full;
+        public List<AgentStateEntry> agentStates = new List<AgentStateEntry>();
+    }
+
+    [System.Serializable]
+    public class SessionResponse
+    {
+        public int seq;
+        public bool full;
+        public bool resync;
+        public List<Decision> decisions;
+    }
+
     void CreateInitialSetup()
     {
 
@@ -97,15 +134,103 @@ public class RobotWorld : MonoBehaviour
     }
 
 
+    // Full snapshot after a resync and every fullSnapshotEvery ticks, otherwise only the robots that moved
+    SessionRequest GetSessionRequest(WorldState state)
+    {
+        SessionRequest request = new SessionRequest();
+        request.seq = ++sessionSeq;
+        request.ack = ackedSeq;
+        request.full = ackedPositions == null || ticksSinceFull >= fullSnapshotEvery;
+        ticksSinceFull = request.full ? 1 : ticksSinceFull + 1;
+
+        pendingFull = request.full;
+        pendingPositions = new Dictionary<string, Vector3>();
+        foreach (AgentStateEntry entry in state.agentStates)
+        {
+            Vector3 acked;
+            if (request.full || !ackedPositions.TryGetValue(entry.id, out acked)
+                || Vector3.Distance(acked, entry.state.position) > positionEpsilon)
+            {
+                request.agentStates.Add(entry);
+                pendingPositions[entry.id] = entry.state.position;
+            }
+        }
+        return request;
+    }
+
+    void HandleSessionResponse(string responseText)
+    {
+        SessionResponse response = JsonUtility.FromJson<SessionResponse>(responseText);
+        if (response.resync)
+        {
+            ackedPositions = null;
+            return;
+        }
+        if (response.seq == sessionSeq)
+        {
+            ackedSeq = response.seq;
+            // The server now has the positions that were sent in this tick
+            if (ackedPositions == null || pendingFull)
+            {
+                ackedPositions = new Dictionary<string, Vector3>();
+            }
+            foreach (KeyValuePair<string, Vector3> sent in pendingPositions)
+            {
+                ackedPositions[sent.Key] = sent.Value;
+            }
+        }
+        ExecuteDecisions(response.decisions);
+    }
+
+    void HandleResponse(string responseText)
+    {
+        if (useDeltaUpdates)
+        {
+            HandleSessionResponse(responseText);
+            return;
+        }
+        PythonResponse response = JsonUtility.FromJson<PythonResponse>(responseText);
+        ExecuteDecisions(response.decisions);
+    }
+
      IEnumerator DecisionLoop()
     {
         while (true)
         {
             WorldState currentState = GetCurrentWorldState();
-            string jsonState = JsonUtility.ToJson(currentState);
+            string jsonState = useDeltaUpdates ? JsonUtility.ToJson(GetSessionRequest(currentState))
+                                               : JsonUtility.ToJson(currentState);
             Debug.Log($"Sending state: {jsonState}"); // Add logging for debugging
 
-            using (UnityWebRequest www = new UnityWebRequest("http://localhost:5000/get_decisions", "POST"))
+            if (useDecisionChannel)
+            {
+                // The call blocks on the socket, so it runs off the main thread
+                Task<string> call = Task.Run(() =>
+                {
+                    if (channel == null || !channel.Connected)
+                    {
+                        channel?.Dispose();
+                        channel = new DecisionChannel("localhost", decisionChannelPort);
+                    }
+                    return channel.Call(useDeltaUpdates ? DecisionChannel.Session : DecisionChannel.GetDecisions, jsonState);
+                });
+                yield return new WaitUntil(() => call.IsCompleted);
+
+                if (call.Status == TaskStatus.RanToCompletion)
+                {
+                    HandleResponse(call.Result);
+                }
+                else
+                {
+                    Debug.LogError($"Decision channel error: {call.Exception?.GetBaseException().Message}");
+                    channel?.Dispose();
+                    channel = null;
+                }
+                yield return new WaitForSeconds(3f);
+                continue;
+            }
+
+            using (UnityWebRequest www = new UnityWebRequest(useDeltaUpdates ? "http://localhost:5000/session" : "http://localhost:5000/get_decisions", "POST"))
             {
                 byte[] bodyRaw = Encoding.UTF8.GetBytes(jsonState);
                 www.uploadHandler = new UploadHandlerRaw(bodyRaw);
@@ -118,8 +243,7 @@ public class RobotWorld : MonoBehaviour
                 {
                     string responseText = www.downloadHandler.text;
                     Debug.Log($"Received response: {responseText}"); // Add logging for debugging
-                    PythonResponse response = JsonUtility.FromJson<PythonResponse>(responseText);
-                    ExecuteDecisions(response.decisions);
+                    HandleResponse(responseText);
 
                 }
                 else
@@ -136,7 +260,12 @@ public class RobotWorld : MonoBehaviour
         for (int i = 0; i < decisions.Count && i < robots.Count; i++)
         {
             Decision decision = decisions[i];
-            RobotAgent robot = robots[i];
+            // Delta responses carry the robot id and only the robots whose decision changed
+            RobotAgent robot = string.IsNullOrEmpty(decision.id) ? robots[i] : robots.Find(r => r.id.ToString() == decision.id);
+            if (robot == null)
+            {
+                continue;
+            }
 
             switch (decision.decision)
             {
@@ -188,5 +317,10 @@ public class RobotWorld : MonoBehaviour
     {
         CreateInitialSetup();
     }
+
+    void OnDestroy()
+    {
+        channel?.Dispose();
+    }
 }
 